@@ -0,0 +1,93 @@
+"""
+Availability responses for SeknuTo.cz
+
+GET /api/availability is served from an in-process cache holding the
+rendered JSON body and its strong ETag. The entry is keyed by the current
+date (so it rolls over at midnight UTC), dropped whenever slot capacity
+changes in this process, and expires after `ttl` seconds so changes made
+by other workers show up within the same bound that Cache-Control gives
+downstream caches. Concurrent misses share one rebuild.
+"""
+import asyncio
+import hashlib
+import time
+from dataclasses import dataclass
+from datetime import date, timedelta
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+import orjson
+
+
+def bookable_dates(today: date, days: int) -> List[str]:
+    """The next `days` days after today, excluding Sundays"""
+    return [
+        day.isoformat()
+        for day in (today + timedelta(days=i) for i in range(1, days + 1))
+        if day.weekday() != 6
+    ]
+
+
+@dataclass(frozen=True)
+class CachedResponse:
+    body: bytes
+    etag: str
+
+    @classmethod
+    def render(cls, content: Dict[str, Any]) -> "CachedResponse":
+        body = orjson.dumps(content)
+        return cls(body, '"' + hashlib.blake2b(body, digest_size=16).hexdigest() + '"')
+
+    def matches(self, if_none_match: Optional[str]) -> bool:
+        """If-None-Match comparison (weak, per RFC 9110)"""
+        if not if_none_match:
+            return False
+        tags = [tag.strip() for tag in if_none_match.split(",")]
+        return "*" in tags or any(tag.removeprefix("W/") == self.etag for tag in tags)
+
+
+class AvailabilityCache:
+    """Single-entry cache of the rendered availability response"""
+
+    def __init__(self, ttl: float):
+        self.ttl = ttl
+        self._key: Optional[date] = None
+        self._entry: Optional[CachedResponse] = None
+        self._expires_at = 0.0
+        self._generation = 0
+        self._building: Optional[asyncio.Task] = None
+        self._building_generation = 0
+        self.hits = 0
+        self.misses = 0
+
+    def invalidate(self) -> None:
+        self._generation += 1
+        self._entry = None
+
+    async def get(self, today: date, build: Callable[[], Awaitable[Dict[str, Any]]]) -> CachedResponse:
+        if self._entry is not None and self._key == today and time.monotonic() < self._expires_at:
+            self.hits += 1
+            return self._entry
+        self.misses += 1
+        if self._building is None or self._key != today or self._building_generation != self._generation:
+            self._key = today
+            self._building_generation = self._generation
+            # A task rather than the caller's coroutine, so one client
+            # disconnecting doesn't fail everyone waiting on the rebuild
+            self._building = asyncio.ensure_future(self._rebuild(today, self._generation, build))
+        return await asyncio.shield(self._building)
+
+    async def _rebuild(self, today: date, generation: int, build: Callable[[], Awaitable[Dict[str, Any]]]) -> CachedResponse:
+        task = asyncio.current_task()
+        try:
+            entry = CachedResponse.render(await build())
+        finally:
+            if self._building is task:
+                self._building = None
+        # A reservation that landed while we were reading makes this entry stale
+        if generation == self._generation and self._key == today:
+            self._entry = entry
+            self._expires_at = time.monotonic() + self.ttl
+        return entry
+
+    def stats(self) -> Dict[str, int]:
+        return {"hits": self.hits, "misses": self.misses}
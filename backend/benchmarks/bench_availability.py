@@ -0,0 +1,60 @@
+"""
+GET /api/availability benchmark: uncached vs cached vs conditional (304)
+
+Drives the app in-process through httpx's ASGI transport against the
+MongoDB at MONGO_URL (a local mongod by default). "uncached" drops the
+cache before every request, which is what every request cost before the
+cache existed; "cached" serves the stored body; "304" sends the ETag back
+the way a browser or CDN revalidates.
+
+    cd backend && python benchmarks/bench_availability.py --requests 2000
+"""
+import argparse
+import asyncio
+import logging
+import os
+import sys
+import time
+from pathlib import Path
+
+import httpx
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+os.environ.setdefault("MONGO_URL", "mongodb://localhost:27017")
+os.environ.setdefault("DB_NAME", "benchmark")
+
+import server  # noqa: E402
+
+logging.getLogger("httpx").setLevel(logging.WARNING)
+
+
+async def _drive(client: httpx.AsyncClient, requests: int, headers=None, before=None) -> float:
+    started = time.perf_counter()
+    for _ in range(requests):
+        if before:
+            before()
+        response = await client.get("/api/availability", headers=headers)
+        assert response.status_code in (200, 304)
+    return requests / (time.perf_counter() - started)
+
+
+async def main(requests: int) -> None:
+    transport = httpx.ASGITransport(app=server.app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        etag = (await client.get("/api/availability")).headers["etag"]
+        cases = [
+            ("uncached", {}, server.availability_cache.invalidate),
+            ("cached", {}, None),
+            ("304", {"If-None-Match": etag}, None),
+        ]
+        for name, headers, before in cases:
+            await _drive(client, min(requests, 100), headers, before)  # warm up
+            rate = await _drive(client, requests, headers, before)
+            print(f"{name:>9}: {rate:9.0f} req/s")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Availability endpoint benchmark")
+    parser.add_argument("--requests", type=int, default=2000)
+    args = parser.parse_args()
+    asyncio.run(main(args.requests))
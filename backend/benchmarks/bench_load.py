@@ -0,0 +1,358 @@
+"""
+Offline load test of the /api endpoints
+
+Boots server.app under uvicorn in a child process against a local
+mongod (or in-memory mongomock-motor with --mock) and the local Resend
+stub, then drives each endpoint in turn with an async load generator:
+closed-loop with --concurrency workers, or open-loop at a fixed --rate
+(latency measured from the scheduled send time, so a stalled server
+cannot hide its queueing delay). Reports throughput and latency
+percentiles and saves them as JSON named after the current commit;
+--compare prints the change against an earlier result file.
+
+    cd backend && python benchmarks/bench_load.py --mock --duration 10 --concurrency 32
+    cd backend && python benchmarks/bench_load.py --endpoints booking,subscribe --rate 200 \
+        --compare benchmarks/results/1683f7b.json
+"""
+import argparse
+import asyncio
+import itertools
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+import uuid
+from collections import Counter
+from contextlib import contextmanager
+from datetime import date, datetime, timedelta, timezone
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import httpx
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(BACKEND_DIR))
+
+from bench_resend_transport import stub_process  # noqa: E402
+from resend_stub import _free_port  # noqa: E402
+
+RESULTS_DIR = Path(__file__).resolve().parent / "results"
+PERCENTILES = (50, 90, 95, 99)
+
+# (method, path, json body) for the i-th request of a scenario
+RequestFactory = Callable[[int], Tuple[str, str, Optional[dict]]]
+
+
+def _booking_body(i: int, run_id: str) -> dict:
+    return {
+        "service": ("lawn_mowing", "spring_package", "garden_work")[i % 3],
+        "property_size": 100 + i % 900,
+        "condition": "normal",
+        "additional_services": ["hnojeni"] if i % 2 else [],
+        "preferred_date": (date.today() + timedelta(days=1 + i % 60)).isoformat(),
+        "preferred_time": ("morning", "afternoon")[i % 2],
+        "customer_name": f"Zátěž {i}",
+        "customer_phone": "+420123456789",
+        "customer_email": f"load-{run_id}-{i % 500}@example.com",
+        "property_address": "Testovací 1, Praha",
+        "notes": "",
+        "estimated_price": 0,
+    }
+
+
+def scenarios(run_id: str, seed: Dict[str, str]) -> Dict[str, RequestFactory]:
+    """Endpoint scenarios by name; `seed` holds ids created before the run"""
+    return {
+        "root": lambda i: ("GET", "/api/", None),
+        "availability": lambda i: ("GET", "/api/availability", None),
+        "pricing": lambda i: ("POST", "/api/pricing/calculate", {
+            "service": ("lawn_mowing", "lawn_with_fertilizer", "spring_package")[i % 3],
+            "property_size": 50 + i % 2000,
+            "condition": ("normal", "overgrown")[i % 2],
+            "additional_services": [],
+        }),
+        "pricing_batch": lambda i: ("POST", "/api/pricing/calculate-batch", {
+            "size_range": {"service": "lawn_mowing", "size_from": 0, "size_to": 1000, "step": 1 + i % 5},
+        }),
+        "coupon": lambda i: ("POST", "/api/coupons/validate", {"code": seed["coupon_code"]}),
+        "booking": lambda i: ("POST", "/api/bookings", _booking_body(i, run_id)),
+        "booking_get": lambda i: ("GET", f"/api/bookings/{seed['booking_id']}", None),
+        "bookings_list": lambda i: ("GET", "/api/bookings?limit=50", None),
+        "contact": lambda i: ("POST", "/api/contact", {
+            "name": f"Zátěž {i}", "email": f"load-{run_id}-{i}@example.com", "phone": "", "message": "Dobrý den",
+        }),
+        "subscribe": lambda i: ("POST", "/api/subscribe", {"email": f"sub-{run_id}-{i}@example.com"}),
+        "stats": lambda i: ("GET", "/api/stats", None),
+    }
+
+
+# ---------- server under test ----------
+
+def serve(port: int, mock: bool) -> None:
+    """Child process entry point: run server.app, optionally on mongomock-motor"""
+    if mock:
+        import motor.motor_asyncio
+        from mongomock_motor import AsyncMongoMockClient
+
+        motor.motor_asyncio.AsyncIOMotorClient = lambda *args, **kwargs: AsyncMongoMockClient()
+    import uvicorn
+
+    import server
+    uvicorn.run(server.app, host="127.0.0.1", port=port, log_level="warning", access_log=False)
+
+
+@contextmanager
+def server_process(args, resend_url: str, db_name: str):
+    port = _free_port()
+    env = dict(
+        os.environ,
+        MONGO_URL=args.mongo_url,
+        DB_NAME=db_name,
+        RESEND_API_KEY="re_load_test",
+        RESEND_API_URL=resend_url,
+        ADMIN_EMAIL="admin@example.com",
+        LOG_LEVEL="WARNING",
+        # Bookings must not run into slot capacity during the run
+        CAPACITY_PER_DAY="1000000000",
+        CAPACITY_PER_HALF_DAY="1000000000",
+    )
+    if args.mock:
+        env["INDEX_PLAN_CHECK"] = "false"  # mongomock has no query planner
+    command = [sys.executable, str(Path(__file__).resolve()), "--serve", "--port", str(port)]
+    if args.mock:
+        command.append("--mock")
+    proc = subprocess.Popen(command, env=env, cwd=str(BACKEND_DIR))
+    url = f"http://127.0.0.1:{port}"
+    try:
+        deadline = time.monotonic() + 30
+        while True:
+            try:
+                httpx.get(f"{url}/api/")
+                break
+            except httpx.TransportError:
+                if proc.poll() is not None or time.monotonic() > deadline:
+                    raise RuntimeError("Server under test did not start")
+                time.sleep(0.1)
+        yield url
+    finally:
+        proc.terminate()
+        proc.wait()
+
+
+# ---------- load generator ----------
+
+class Recorder:
+    def __init__(self):
+        self.latencies: List[float] = []
+        self.statuses: Counter = Counter()
+        self.errors: Counter = Counter()
+
+    def record(self, latency: float, status: Optional[int] = None, error: Optional[Exception] = None) -> None:
+        self.latencies.append(latency)
+        if error is not None:
+            self.errors[type(error).__name__] += 1
+        else:
+            self.statuses[str(status)] += 1
+
+    def summary(self, elapsed: float) -> Dict[str, Any]:
+        latencies = sorted(self.latencies)
+        ok = sum(count for status, count in self.statuses.items() if status.startswith("2") or status == "304")
+        summary = {
+            "requests": len(latencies),
+            "ok": ok,
+            "throughput_rps": round(ok / elapsed, 1) if elapsed else 0.0,
+            "statuses": dict(self.statuses),
+            "errors": dict(self.errors),
+        }
+        if latencies:
+            summary["latency_ms"] = {
+                "mean": round(sum(latencies) / len(latencies) * 1000, 3),
+                **{f"p{p}": round(_percentile(latencies, p) * 1000, 3) for p in PERCENTILES},
+                "max": round(latencies[-1] * 1000, 3),
+            }
+        return summary
+
+
+def _percentile(ordered: List[float], p: float) -> float:
+    """Nearest-rank percentile of an already sorted list"""
+    index = max(0, min(len(ordered) - 1, int(round(p / 100 * len(ordered) + 0.5)) - 1))
+    return ordered[index]
+
+
+async def _send(client: httpx.AsyncClient, factory: RequestFactory, i: int, recorder: Optional[Recorder],
+                started: float) -> None:
+    method, path, body = factory(i)
+    try:
+        response = await client.request(method, path, json=body)
+        await response.aread()
+    except httpx.HTTPError as e:
+        if recorder is not None:
+            recorder.record(time.perf_counter() - started, error=e)
+        return
+    if recorder is not None:
+        recorder.record(time.perf_counter() - started, response.status_code)
+
+
+async def closed_loop(client, factory: RequestFactory, counter, duration: float, concurrency: int,
+                      recorder: Optional[Recorder]) -> float:
+    """`concurrency` workers each sending the next request as soon as the previous one returns"""
+    deadline = time.perf_counter() + duration
+
+    async def worker():
+        while time.perf_counter() < deadline:
+            await _send(client, factory, next(counter), recorder, time.perf_counter())
+
+    started = time.perf_counter()
+    await asyncio.gather(*[worker() for _ in range(concurrency)])
+    return time.perf_counter() - started
+
+
+async def open_loop(client, factory: RequestFactory, counter, duration: float, rate: float,
+                    recorder: Optional[Recorder]) -> float:
+    """Requests sent on a fixed schedule regardless of how fast responses come back"""
+    started = time.perf_counter()
+    tasks = []
+    for k in range(int(duration * rate)):
+        scheduled = started + k / rate
+        delay = scheduled - time.perf_counter()
+        if delay > 0:
+            await asyncio.sleep(delay)
+        tasks.append(asyncio.create_task(_send(client, factory, next(counter), recorder, scheduled)))
+    await asyncio.gather(*tasks)
+    return time.perf_counter() - started
+
+
+async def seed(client: httpx.AsyncClient, run_id: str) -> Dict[str, str]:
+    """Create the booking and coupon the read scenarios look up"""
+    booking = await client.post("/api/bookings", json=_booking_body(0, run_id))
+    booking.raise_for_status()
+    subscriber = await client.post("/api/subscribe", json={"email": f"seed-{run_id}@example.com"})
+    subscriber.raise_for_status()
+    return {"booking_id": booking.json()["id"], "coupon_code": subscriber.json()["coupon_code"]}
+
+
+async def run_load(url: str, args, run_id: str) -> Dict[str, Any]:
+    limits = httpx.Limits(max_connections=args.concurrency, max_keepalive_connections=args.concurrency)
+    async with httpx.AsyncClient(base_url=url, limits=limits, timeout=args.timeout) as client:
+        table = scenarios(run_id, await seed(client, run_id))
+        names = args.endpoints.split(",") if args.endpoints else list(table)
+        unknown = [name for name in names if name not in table]
+        if unknown:
+            raise SystemExit(f"Unknown endpoints: {', '.join(unknown)} (known: {', '.join(table)})")
+
+        results = {}
+        for name in names:
+            counter = itertools.count(1)
+            recorder = Recorder()
+            if args.warmup:
+                await closed_loop(client, table[name], counter, args.warmup, args.concurrency, None)
+            if args.rate:
+                elapsed = await open_loop(client, table[name], counter, args.duration, args.rate, recorder)
+            else:
+                elapsed = await closed_loop(client, table[name], counter, args.duration, args.concurrency, recorder)
+            results[name] = recorder.summary(elapsed)
+            _print_row(name, results[name])
+        server_stats = (await client.get("/api/stats")).json()
+    return {"endpoints": results, "server_stats": server_stats}
+
+
+# ---------- reporting ----------
+
+def _print_row(name: str, result: Dict[str, Any]) -> None:
+    latency = result.get("latency_ms", {})
+    failed = result["requests"] - result["ok"]
+    print(f"{name:>14}: {result['throughput_rps']:8.1f} req/s  "
+          f"p50 {latency.get('p50', 0):7.2f}  p90 {latency.get('p90', 0):7.2f}  "
+          f"p99 {latency.get('p99', 0):7.2f}  max {latency.get('max', 0):8.2f} ms"
+          + (f"  ({failed} failed: {result['statuses']} {result['errors']})" if failed else ""))
+
+
+def compare(current: Dict[str, Any], baseline: Dict[str, Any]) -> None:
+    print(f"\nvs {baseline['meta']['commit']} ({baseline['meta']['timestamp']})")
+    for name, result in current["endpoints"].items():
+        before = baseline["endpoints"].get(name)
+        if not before or not before.get("latency_ms") or not result.get("latency_ms"):
+            continue
+        changes = [("req/s", before["throughput_rps"], result["throughput_rps"])] + [
+            (key, before["latency_ms"][key], result["latency_ms"][key]) for key in ("p50", "p99")
+        ]
+        print(f"{name:>14}: " + "  ".join(
+            f"{label} {_change(old, new):>+7.1f}%" for label, old, new in changes
+        ))
+
+
+def _change(old: float, new: float) -> float:
+    return (new - old) / old * 100 if old else 0.0
+
+
+def _git_commit() -> str:
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=BACKEND_DIR,
+                                capture_output=True, text=True, check=True).stdout.strip()
+        dirty = subprocess.run(["git", "status", "--porcelain", "--untracked-files=no"], cwd=BACKEND_DIR,
+                               capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+    return f"{commit}-dirty" if dirty else commit
+
+
+def _drop_database(mongo_url: str, name: str) -> None:
+    from pymongo import MongoClient
+    client = MongoClient(mongo_url, serverSelectionTimeoutMS=2000)
+    try:
+        client.drop_database(name)
+    finally:
+        client.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Offline load test of the /api endpoints")
+    parser.add_argument("--endpoints", default="", help="comma separated scenario names (default: all)")
+    parser.add_argument("--duration", type=float, default=10.0, help="measured seconds per endpoint")
+    parser.add_argument("--warmup", type=float, default=1.0, help="unmeasured seconds per endpoint")
+    parser.add_argument("--concurrency", type=int, default=32, help="closed-loop workers / max connections")
+    parser.add_argument("--rate", type=float, default=0.0, help="open-loop requests per second (0: closed loop)")
+    parser.add_argument("--timeout", type=float, default=30.0)
+    parser.add_argument("--mock", action="store_true", help="run the server on in-memory mongomock-motor")
+    parser.add_argument("--mongo-url", default=os.environ.get("TEST_MONGO_URL", "mongodb://localhost:27017"))
+    parser.add_argument("--resend-latency", type=float, default=0.02, help="stub response latency in seconds")
+    parser.add_argument("--output", type=Path, help="result file (default: benchmarks/results/<commit>.json)")
+    parser.add_argument("--compare", type=Path, help="earlier result file to diff against")
+    parser.add_argument("--serve", action="store_true", help=argparse.SUPPRESS)
+    parser.add_argument("--port", type=int, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.serve:
+        serve(args.port, args.mock)
+        return
+
+    run_id = uuid.uuid4().hex[:8]
+    db_name = f"load_seknuto_{run_id}"
+    meta = {
+        "commit": _git_commit(),
+        "timestamp": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "mongo": "mongomock" if args.mock else args.mongo_url,
+        "mode": f"open-loop {args.rate}/s" if args.rate else f"closed-loop x{args.concurrency}",
+        "args": {key: str(value) for key, value in vars(args).items() if key not in ("serve", "port")},
+    }
+    print(f"{meta['commit']}: {meta['mode']}, {args.duration}s per endpoint, mongo {meta['mongo']}")
+    try:
+        with stub_process(args.resend_latency) as resend_url, server_process(args, resend_url, db_name) as url:
+            result = {"meta": meta, **asyncio.run(run_load(url, args, run_id))}
+    finally:
+        if not args.mock:
+            _drop_database(args.mongo_url, db_name)
+
+    output = args.output or RESULTS_DIR / f"{meta['commit']}.json"
+    output.parent.mkdir(parents=True, exist_ok=True)
+    output.write_text(json.dumps(result, indent=2, ensure_ascii=False) + "\n")
+    print(f"results written to {output}")
+    if args.compare:
+        compare(result, json.loads(args.compare.read_text()))
+
+
+if __name__ == "__main__":
+    main()
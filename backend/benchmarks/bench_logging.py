@@ -0,0 +1,97 @@
+"""
+Logging benchmark: synchronous StreamHandler vs the queued JSON pipeline
+
+Measures the cost of one logger.info call as seen by the caller (the
+event loop) for the old basicConfig-style handler and for LogPipeline,
+with eager f-string vs lazy %-style messages, writing to a fast sink
+and to a slow one that stalls on every write (a congested pipe/disk).
+
+    cd backend && python benchmarks/bench_logging.py --records 20000 --stall-ms 1
+"""
+import argparse
+import io
+import logging
+import sys
+import threading
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from log_pipeline import TEXT_FORMAT, LogPipeline  # noqa: E402
+
+
+class SlowStream(io.StringIO):
+    """Sink that blocks for `stall` seconds per write"""
+
+    def __init__(self, stall: float):
+        super().__init__()
+        self.stall = stall
+
+    def write(self, text):
+        time.sleep(self.stall)
+        return len(text)
+
+
+class NullStream(io.StringIO):
+    def write(self, text):
+        return len(text)
+
+
+def _sync_logger(stream) -> logging.Logger:
+    logger = logging.Logger("bench.sync")
+    handler = logging.StreamHandler(stream)
+    handler.setFormatter(logging.Formatter(TEXT_FORMAT))
+    logger.addHandler(handler)
+    logger.setLevel(logging.INFO)
+    return logger
+
+
+def _run(logger: logging.Logger, records: int, lazy: bool) -> float:
+    booking_id, name = "3f2b8c1e-0000-4000-8000-000000000000", "Jan Novák"
+    started = time.perf_counter()
+    if lazy:
+        for _ in range(records):
+            logger.info("New booking created: %s for %s", booking_id, name)
+    else:
+        for _ in range(records):
+            logger.info(f"New booking created: {booking_id} for {name}")
+    return (time.perf_counter() - started) / records * 1e6
+
+
+def bench(label: str, stream_factory, records: int, queue_size: int):
+    sync = _run(_sync_logger(stream_factory()), records, lazy=False)
+
+    pipeline = LogPipeline(queue_size=queue_size, stream=stream_factory())
+    logger = logging.Logger("bench.queued")
+    pipeline.install(logger)
+    queued = _run(logger, records, lazy=True)
+    stats = pipeline.stats()
+    drain_started = time.perf_counter()
+    pipeline.stop()
+    drain = time.perf_counter() - drain_started
+
+    print(f"{label}")
+    print(f"  sync handler, f-string    : {sync:8.2f} µs/call on the caller")
+    print(f"  queued JSON, lazy %-style : {queued:8.2f} µs/call on the caller"
+          f"  (dropped {stats['dropped']}, listener drain {drain:.2f}s)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Logging pipeline benchmark")
+    parser.add_argument("--records", type=int, default=20000)
+    parser.add_argument("--queue-size", type=int, default=10000)
+    parser.add_argument("--stall-ms", type=float, default=1.0, help="per-write stall of the slow sink")
+    args = parser.parse_args()
+
+    bench("fast sink", NullStream, args.records, args.queue_size)
+    slow_records = min(args.records, 2000)
+    bench(
+        f"slow sink ({args.stall_ms} ms per write, {slow_records} records)",
+        lambda: SlowStream(args.stall_ms / 1000), slow_records, args.queue_size,
+    )
+    print(f"threads alive after stop: {threading.active_count()}")
+
+
+if __name__ == "__main__":
+    main()
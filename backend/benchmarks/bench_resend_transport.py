@@ -0,0 +1,98 @@
+"""
+Resend transport benchmark: thread-offloaded SDK vs pooled async client
+
+Runs both against the local Resend stub, so no network or API key is
+needed.
+
+    cd backend && python benchmarks/bench_resend_transport.py --requests 500 --concurrency 50 --latency 0.02
+"""
+import argparse
+import asyncio
+import subprocess
+import sys
+import time
+from contextlib import contextmanager
+from pathlib import Path
+
+import httpx
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from resend_client import AsyncResendClient  # noqa: E402
+from resend_stub import _free_port  # noqa: E402
+
+STUB_SCRIPT = Path(__file__).resolve().parent.parent / "resend_stub.py"
+
+PARAMS = {"from": "rezervace@seknuto.cz", "to": ["zakaznik@example.com"], "subject": "Benchmark", "html": "<p>x</p>"}
+
+
+async def _drive(send, requests: int, concurrency: int) -> float:
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def one():
+        async with semaphore:
+            await send(PARAMS)
+
+    started = time.perf_counter()
+    await asyncio.gather(*[one() for _ in range(requests)])
+    return time.perf_counter() - started
+
+
+async def bench_sdk(url: str, requests: int, concurrency: int, pool: int) -> float:
+    import resend
+    resend.api_key = "re_benchmark"
+    resend.api_url = url
+    return await _drive(lambda params: asyncio.to_thread(resend.Emails.send, params), requests, concurrency)
+
+
+async def bench_async(url: str, requests: int, concurrency: int, pool: int) -> float:
+    client = AsyncResendClient("re_benchmark", url, max_connections=pool, max_keepalive_connections=pool)
+    try:
+        return await _drive(client.send_email, requests, concurrency)
+    finally:
+        await client.close()
+
+
+@contextmanager
+def stub_process(latency: float):
+    """Run the stub in its own process so it does not share the GIL with the client"""
+    port = _free_port()
+    proc = subprocess.Popen(
+        [sys.executable, str(STUB_SCRIPT), "--port", str(port), "--latency", str(latency)],
+        stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+    url = f"http://127.0.0.1:{port}"
+    try:
+        deadline = time.monotonic() + 10
+        while True:
+            try:
+                httpx.get(f"{url}/_stats")
+                break
+            except httpx.TransportError:
+                if time.monotonic() > deadline:
+                    raise RuntimeError("Resend stub did not start")
+                time.sleep(0.05)
+        yield url
+    finally:
+        proc.terminate()
+        proc.wait()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--requests", type=int, default=500)
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--pool", type=int, default=10, help="async client max connections")
+    parser.add_argument("--latency", type=float, default=0.02, help="stub response latency in seconds")
+    args = parser.parse_args()
+
+    for name, bench in (("sdk+to_thread", bench_sdk), ("httpx async", bench_async)):
+        with stub_process(args.latency) as url:
+            elapsed = asyncio.run(bench(url, args.requests, args.concurrency, args.pool))
+            connections = httpx.get(f"{url}/_stats").json()["connections"]
+            print(f"{name:>14}: {args.requests / elapsed:8.1f} req/s  "
+                  f"({elapsed:.2f}s, {connections} TCP connections)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,106 @@
+"""
+Booking serialization benchmark: model round-trips vs the direct/orjson path
+
+"before" replays what the booking endpoints did per request: build a
+Booking from the validated BookingCreate, dump it for Mongo, then let
+FastAPI validate it again against response_model and render it with
+json.dumps. "after" is the current path: dump BookingCreate once into
+the stored document and render it with orjson. Request-body validation
+is identical in both and included in the single-booking numbers.
+
+    cd backend && python benchmarks/bench_serialization.py
+"""
+import argparse
+import json
+import os
+import sys
+import timeit
+import uuid
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import List
+
+import orjson
+from pydantic import TypeAdapter
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+os.environ.setdefault("MONGO_URL", "mongodb://localhost:27017")
+os.environ.setdefault("DB_NAME", "benchmark")
+
+from server import Booking, BookingCreate  # noqa: E402
+
+PAYLOAD = {
+    "service": "spring_package",
+    "property_size": 300,
+    "condition": "normal",
+    "additional_services": ["mulching"],
+    "preferred_date": "2026-04-10",
+    "preferred_time": "morning",
+    "customer_name": "Jan Novák",
+    "customer_phone": "+420777888999",
+    "customer_email": "jan@example.com",
+    "property_address": "Zahradní 123, Dvůr Králové",
+    "notes": "Pes na zahradě",
+    "estimated_price": 3150,
+    "gdpr_consent": True,
+}
+
+BOOKING_ADAPTER = TypeAdapter(Booking)
+BOOKING_LIST_ADAPTER = TypeAdapter(List[Booking])
+
+
+def _render_json(content) -> bytes:
+    # starlette.responses.JSONResponse.render
+    return json.dumps(content, ensure_ascii=False, allow_nan=False, indent=None, separators=(",", ":")).encode()
+
+
+def create_before():
+    booking_data = BookingCreate(**PAYLOAD)
+    booking = Booking(**booking_data.model_dump())
+    booking.model_dump()  # document for insert_one
+    validated = BOOKING_ADAPTER.validate_python(booking)
+    return _render_json(BOOKING_ADAPTER.dump_python(validated, mode="json"))
+
+
+def create_after():
+    booking_data = BookingCreate(**PAYLOAD)
+    doc = booking_data.model_dump(exclude={"gdpr_consent"})
+    doc.update(
+        id=str(uuid.uuid4()),
+        final_price=None,
+        discount_applied=0,
+        status="pending",
+        created_at=datetime.now(timezone.utc).isoformat(),
+    )
+    return orjson.dumps(doc)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Booking serialization benchmark")
+    parser.add_argument("--iterations", type=int, default=5000)
+    parser.add_argument("--list-size", type=int, default=1000)
+    args = parser.parse_args()
+
+    stored = [json.loads(create_after()) for _ in range(args.list_size)]
+
+    def list_before():
+        validated = BOOKING_LIST_ADAPTER.validate_python(stored)
+        return _render_json(BOOKING_LIST_ADAPTER.dump_python(validated, mode="json"))
+
+    def list_after():
+        return orjson.dumps(stored)
+
+    list_iterations = max(1, args.iterations // 100)
+    cases = [
+        ("create booking", create_before, create_after, args.iterations),
+        (f"list {args.list_size} bookings", list_before, list_after, list_iterations),
+    ]
+    for name, before, after, iterations in cases:
+        before_time = min(timeit.repeat(before, number=iterations, repeat=3)) / iterations
+        after_time = min(timeit.repeat(after, number=iterations, repeat=3)) / iterations
+        print(f"{name:>22}: before {before_time * 1e6:9.1f} µs   after {after_time * 1e6:9.1f} µs   "
+              f"({before_time / after_time:.1f}x)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,156 @@
+"""
+Email rendering benchmark: inline f-strings vs precompiled Jinja2 templates
+
+The f-string functions below are the pre-template implementations from
+server.py, kept verbatim as the baseline.
+
+    cd backend && python benchmarks/bench_templates.py --iterations 20000
+"""
+import argparse
+import os
+import sys
+import timeit
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+os.environ.setdefault("MONGO_URL", "mongodb://localhost:27017")
+os.environ.setdefault("DB_NAME", "benchmark")
+
+from server import SERVICE_NAMES_CZ, TIME_NAMES_CZ, Booking, get_admin_email_html, get_customer_email_html  # noqa: E402
+
+
+# ============== BASELINE (inline f-strings) ==============
+
+def legacy_customer_email_html(booking) -> str:
+    service_name = SERVICE_NAMES_CZ.get(booking.service, booking.service)
+    time_name = TIME_NAMES_CZ.get(booking.preferred_time, booking.preferred_time)
+    
+    return f"""
+    <!DOCTYPE html>
+    <html>
+    <head>
+        <meta charset="UTF-8">
+    </head>
+    <body style="font-family: Arial, sans-serif; line-height: 1.6; color: #222222; max-width: 600px; margin: 0 auto; padding: 20px;">
+        <div style="background: linear-gradient(135deg, #3FA34D, #2d7a38); padding: 30px; text-align: center; border-radius: 10px 10px 0 0;">
+            <h1 style="color: white; margin: 0; font-size: 28px;">✓ Potvrzení rezervace</h1>
+            <p style="color: rgba(255,255,255,0.9); margin: 10px 0 0;">SeknuTo.cz</p>
+        </div>
+        
+        <div style="background: #f8fff9; padding: 30px; border: 1px solid #e5e7eb; border-top: none;">
+            <p style="font-size: 16px;">Dobrý den <strong>{booking.customer_name}</strong>,</p>
+            <p>Děkujeme za rezervaci! Vaše objednávka byla úspěšně přijata.</p>
+            
+            <div style="background: white; padding: 20px; border-radius: 8px; margin: 20px 0; border: 1px solid #e5e7eb;">
+                <h3 style="color: #3FA34D; margin-top: 0;">📋 Detaily rezervace</h3>
+                <table style="width: 100%; border-collapse: collapse;">
+                    <tr><td style="padding: 8px 0; border-bottom: 1px solid #eee;"><strong>Služba:</strong></td><td style="padding: 8px 0; border-bottom: 1px solid #eee;">{service_name}</td></tr>
+                    <tr><td style="padding: 8px 0; border-bottom: 1px solid #eee;"><strong>Datum:</strong></td><td style="padding: 8px 0; border-bottom: 1px solid #eee;">{booking.preferred_date}</td></tr>
+                    <tr><td style="padding: 8px 0; border-bottom: 1px solid #eee;"><strong>Čas:</strong></td><td style="padding: 8px 0; border-bottom: 1px solid #eee;">{time_name}</td></tr>
+                    <tr><td style="padding: 8px 0; border-bottom: 1px solid #eee;"><strong>Adresa:</strong></td><td style="padding: 8px 0; border-bottom: 1px solid #eee;">{booking.property_address}</td></tr>
+                    <tr><td style="padding: 8px 0;"><strong>Odhadovaná cena:</strong></td><td style="padding: 8px 0; color: #3FA34D; font-weight: bold;">{booking.estimated_price} Kč</td></tr>
+                </table>
+            </div>
+            
+            <div style="background: #F0FDF4; padding: 15px; border-radius: 8px; margin: 20px 0;">
+                <h4 style="color: #166534; margin: 0 0 10px;">📞 Co dál?</h4>
+                <p style="margin: 0; color: #166534;">Brzy vás budeme kontaktovat na tel. <strong>{booking.customer_phone}</strong> pro finální potvrzení termínu.</p>
+            </div>
+            
+            <p style="margin-top: 20px;">Máte dotaz? Napište nám:</p>
+            <p>💬 WhatsApp: <a href="https://wa.me/420730588372" style="color: #3FA34D;">730 588 372</a><br>
+            📧 Email: info@seknuto.cz</p>
+        </div>
+        
+        <div style="background: #222222; padding: 20px; text-align: center; border-radius: 0 0 10px 10px;">
+            <p style="color: white; margin: 0;">S pozdravem,<br><strong>Tým SeknuTo.cz</strong></p>
+            <p style="color: #3FA34D; margin: 10px 0 0;">🌱 Trávník bez starostí!</p>
+        </div>
+    </body>
+    </html>
+    """
+
+def legacy_admin_email_html(booking) -> str:
+    service_name = SERVICE_NAMES_CZ.get(booking.service, booking.service)
+    time_name = TIME_NAMES_CZ.get(booking.preferred_time, booking.preferred_time)
+    additional = ", ".join(booking.additional_services) if booking.additional_services else "Žádné"
+    
+    return f"""
+    <!DOCTYPE html>
+    <html>
+    <head>
+        <meta charset="UTF-8">
+    </head>
+    <body style="font-family: Arial, sans-serif; line-height: 1.6; color: #222222; max-width: 600px; margin: 0 auto; padding: 20px;">
+        <div style="background: #FF6B35; padding: 20px; text-align: center; border-radius: 10px 10px 0 0;">
+            <h1 style="color: white; margin: 0;">🆕 NOVÁ REZERVACE!</h1>
+        </div>
+        
+        <div style="background: #fff; padding: 25px; border: 2px solid #FF6B35; border-top: none; border-radius: 0 0 10px 10px;">
+            <h2 style="color: #222; margin-top: 0;">Zákazník: {booking.customer_name}</h2>
+            
+            <table style="width: 100%; border-collapse: collapse; margin: 20px 0;">
+                <tr style="background: #f8f9fa;"><td style="padding: 12px; border: 1px solid #dee2e6;"><strong>📞 Telefon:</strong></td><td style="padding: 12px; border: 1px solid #dee2e6;"><a href="tel:{booking.customer_phone}">{booking.customer_phone}</a></td></tr>
+                <tr><td style="padding: 12px; border: 1px solid #dee2e6;"><strong>📧 Email:</strong></td><td style="padding: 12px; border: 1px solid #dee2e6;"><a href="mailto:{booking.customer_email}">{booking.customer_email}</a></td></tr>
+                <tr style="background: #f8f9fa;"><td style="padding: 12px; border: 1px solid #dee2e6;"><strong>📍 Adresa:</strong></td><td style="padding: 12px; border: 1px solid #dee2e6;">{booking.property_address}</td></tr>
+            </table>
+            
+            <h3 style="color: #3FA34D;">Detaily objednávky</h3>
+            <table style="width: 100%; border-collapse: collapse;">
+                <tr><td style="padding: 8px; border-bottom: 1px solid #eee;"><strong>Služba:</strong></td><td style="padding: 8px; border-bottom: 1px solid #eee;">{service_name}</td></tr>
+                <tr><td style="padding: 8px; border-bottom: 1px solid #eee;"><strong>Velikost:</strong></td><td style="padding: 8px; border-bottom: 1px solid #eee;">{booking.property_size} m²</td></tr>
+                <tr><td style="padding: 8px; border-bottom: 1px solid #eee;"><strong>Stav:</strong></td><td style="padding: 8px; border-bottom: 1px solid #eee;">{booking.condition}</td></tr>
+                <tr><td style="padding: 8px; border-bottom: 1px solid #eee;"><strong>Termín:</strong></td><td style="padding: 8px; border-bottom: 1px solid #eee;">{booking.preferred_date} - {time_name}</td></tr>
+                <tr><td style="padding: 8px; border-bottom: 1px solid #eee;"><strong>Doplňkové:</strong></td><td style="padding: 8px; border-bottom: 1px solid #eee;">{additional}</td></tr>
+                <tr><td style="padding: 8px;"><strong>Cena:</strong></td><td style="padding: 8px; color: #3FA34D; font-size: 18px; font-weight: bold;">~{booking.estimated_price} Kč</td></tr>
+            </table>
+            
+            {f'<div style="background: #FFF3CD; padding: 15px; border-radius: 8px; margin: 20px 0;"><strong>📝 Poznámka od zákazníka:</strong><br>{booking.notes}</div>' if booking.notes else ''}
+            
+            <div style="background: #D4EDDA; padding: 15px; border-radius: 8px; margin: 20px 0; text-align: center;">
+                <strong>⚡ AKCE POTŘEBNÁ:</strong><br>
+                → Zavolat zákazníkovi pro potvrzení<br>
+                → Zapsat do kalendáře
+            </div>
+        </div>
+    </body>
+    </html>
+    """
+
+
+# ============== BENCHMARK ==============
+
+BOOKING = Booking(
+    service="spring_package",
+    property_size=300,
+    condition="normal",
+    additional_services=["mulching"],
+    preferred_date="2026-04-10",
+    preferred_time="morning",
+    customer_name="Jan Novák",
+    customer_phone="+420777888999",
+    customer_email="jan@example.com",
+    property_address="Zahradní 123, Dvůr Králové",
+    notes="Pes na zahradě",
+    estimated_price=3150,
+)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Email rendering benchmark")
+    parser.add_argument("--iterations", type=int, default=20000)
+    args = parser.parse_args()
+
+    cases = [
+        ("customer f-string", lambda: legacy_customer_email_html(BOOKING)),
+        ("customer jinja2", lambda: get_customer_email_html(BOOKING)),
+        ("admin f-string", lambda: legacy_admin_email_html(BOOKING)),
+        ("admin jinja2", lambda: get_admin_email_html(BOOKING)),
+    ]
+    for name, fn in cases:
+        best = min(timeit.repeat(fn, number=args.iterations, repeat=3))
+        print(f"{name:>18}: {best / args.iterations * 1e6:7.2f} µs/render")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,109 @@
+"""
+Slot capacity for SeknuTo.cz
+
+One counter document per date in `slot_capacity`:
+    {date, morning, afternoon, anytime, total}
+Bookings reserve a slot with a single conditional `$inc`, so the limits
+hold under concurrent requests, and availability is one range read on
+the unique `date` index instead of an aggregation over `bookings`.
+
+Morning and afternoon each have their own limit; every booking (including
+"anytime") also counts against the day's crew capacity.
+"""
+from dataclasses import dataclass
+from typing import Callable, Dict, Iterable, Optional
+
+from pymongo.errors import DuplicateKeyError
+
+SLOTS = ("morning", "afternoon", "anytime")
+HALF_DAY_SLOTS = ("morning", "afternoon")
+
+
+class SlotFullError(Exception):
+    """The requested date/slot has no capacity left"""
+
+    def __init__(self, date: str, slot: str):
+        super().__init__(f"No capacity left for {slot} on {date}")
+        self.date = date
+        self.slot = slot
+
+
+@dataclass(frozen=True)
+class CapacityLimits:
+    per_day: int = 6
+    per_half_day: int = 3
+
+    def remaining(self, counts: Dict[str, int]) -> Dict[str, int]:
+        """Bookings still possible per slot, given a date's counter document"""
+        day_left = max(self.per_day - counts.get("total", 0), 0)
+        remaining = {slot: min(max(self.per_half_day - counts.get(slot, 0), 0), day_left) for slot in HALF_DAY_SLOTS}
+        remaining["anytime"] = day_left
+        return remaining
+
+
+def normalize_slot(preferred_time: str) -> str:
+    return preferred_time if preferred_time in SLOTS else "anytime"
+
+
+class SlotCapacity:
+    """Atomic per-day slot counters"""
+
+    def __init__(self, collection, limits: CapacityLimits, on_change: Optional[Callable[[], None]] = None):
+        self.collection = collection
+        self.limits = limits
+        self._on_change = on_change
+
+    def _changed(self) -> None:
+        if self._on_change is not None:
+            self._on_change()
+
+    def _reserve_filter(self, date: str, slot: str) -> Dict:
+        query = {"date": date, "total": {"$lt": self.limits.per_day}}
+        if slot in HALF_DAY_SLOTS:
+            query[slot] = {"$lt": self.limits.per_half_day}
+        return query
+
+    async def reserve(self, date: str, preferred_time: str) -> None:
+        """Take one place in the slot or raise SlotFullError"""
+        slot = normalize_slot(preferred_time)
+        query = self._reserve_filter(date, slot)
+        # Every slot counter exists from the first booking on, so a later
+        # booking's {slot: {$lt: limit}} filter has a field to compare against
+        update = {
+            "$inc": {slot: 1, "total": 1},
+            "$setOnInsert": {other: 0 for other in SLOTS if other != slot},
+        }
+        try:
+            # Creates the date's counter on first use. When it exists but the
+            # limits don't match, the upsert collides with the unique date index.
+            await self.collection.find_one_and_update(query, update, upsert=True, projection={"_id": 1})
+        except DuplicateKeyError:
+            # Either the day is full or a concurrent first booking created the
+            # counter between our match and insert; retry as a plain update
+            doc = await self.collection.find_one_and_update(query, update, projection={"_id": 1})
+            if doc is None:
+                raise SlotFullError(date, slot)
+        self._changed()
+
+    async def release(self, date: str, preferred_time: str) -> None:
+        """Give back a place taken by reserve()"""
+        slot = normalize_slot(preferred_time)
+        result = await self.collection.update_one(
+            {"date": date, slot: {"$gt": 0}, "total": {"$gt": 0}},
+            {"$inc": {slot: -1, "total": -1}},
+        )
+        if result.modified_count:
+            self._changed()
+
+    async def remaining(self, dates: Iterable[str]) -> Dict[str, Dict[str, int]]:
+        """Remaining places per slot for each date, from one range query"""
+        dates = sorted(dates)
+        if not dates:
+            return {}
+        counts = {
+            doc["date"]: doc
+            async for doc in self.collection.find(
+                {"date": {"$gte": dates[0], "$lte": dates[-1]}}, {"_id": 0}
+            )
+        }
+        return {date: self.limits.remaining(counts.get(date, {})) for date in dates}
@@ -0,0 +1,201 @@
+"""
+Resend contact registry for SeknuTo.cz
+
+`contacts_synced` holds one document per email (unique index) for every
+contact ever handed to Resend. Bookings and subscriptions register the
+customer's email: emails already in the registry are skipped without
+any I/O through an in-process set warmed from the collection at
+startup, new ones are upserted as pending. A background task pushes
+pending contacts to Resend in periodic batches, so a returning customer
+costs no Resend call at all and a new one costs one, off the request path.
+Each contact is claimed with a lease before it is pushed, so several
+workers (or overlapping sync passes) never create the same contact
+twice; a lease left behind by a crashed worker expires and the contact
+is picked up again.
+"""
+import asyncio
+import logging
+from datetime import datetime, timedelta, timezone
+from typing import Any, Awaitable, Callable, Dict, Optional, Set
+
+from pymongo import ReturnDocument
+from pymongo.errors import DuplicateKeyError
+
+from retries import STATUS_FAILED, STATUS_PENDING, RetryPolicy
+
+logger = logging.getLogger(__name__)
+
+STATUS_SYNCING = "syncing"
+STATUS_SYNCED = "synced"
+
+CreateContactFn = Callable[[Dict[str, Any]], Awaitable[Any]]
+
+
+def normalize_email(email: str) -> str:
+    return email.strip().lower()
+
+
+def split_name(name: str) -> Dict[str, str]:
+    """Resend first_name/last_name from a single name field"""
+    parts = name.split()
+    return {"first_name": parts[0] if parts else "", "last_name": " ".join(parts[1:])}
+
+
+class ContactRegistry:
+    """Deduplicating queue of contacts waiting to be created in Resend"""
+
+    def __init__(
+        self,
+        collection,
+        create_contact: CreateContactFn,
+        *,
+        interval: float = 30.0,
+        batch_size: int = 100,
+        concurrency: int = 4,
+        max_attempts: int = 6,
+        base_delay: float = 30.0,
+        max_delay: float = 3600.0,
+        lease_seconds: float = 120.0,
+    ):
+        self.collection = collection
+        self._create_contact = create_contact
+        self.interval = interval
+        self.batch_size = batch_size
+        self.concurrency = concurrency
+        self.retry = RetryPolicy(max_attempts=max_attempts, base_delay=base_delay, max_delay=max_delay)
+        self.lease_seconds = lease_seconds
+        self._known: Set[str] = set()
+        self._task: Optional[asyncio.Task] = None
+        self.skipped = 0
+        self.queued = 0
+        self.synced = 0
+        self.failed = 0
+
+    async def warm(self) -> int:
+        """Load every registered email into memory; returns how many"""
+        async for doc in self.collection.find({}, {"_id": 0, "email": 1}):
+            self._known.add(doc["email"])
+        return len(self._known)
+
+    async def register(self, email: str, first_name: str = "", last_name: str = "") -> bool:
+        """Queue the contact for sync unless it is already known; True when newly queued"""
+        email = normalize_email(email)
+        if email in self._known:
+            self.skipped += 1
+            return False
+        now = datetime.now(timezone.utc)
+        try:
+            result = await self.collection.update_one(
+                {"email": email},
+                {"$setOnInsert": {
+                    "email": email,
+                    "payload": {"email": email, "first_name": first_name, "last_name": last_name, "unsubscribed": False},
+                    "status": STATUS_PENDING,
+                    "attempts": 0,
+                    "next_attempt_at": now,
+                    "lease_expires_at": None,
+                    "created_at": now,
+                }},
+                upsert=True,
+            )
+            created = result.upserted_id is not None
+        except DuplicateKeyError:
+            created = False  # another worker inserted it first
+        self._known.add(email)
+        if created:
+            self.queued += 1
+        else:
+            self.skipped += 1
+        return created
+
+    # ---------- background sync ----------
+
+    def start(self) -> None:
+        if self._task is None:
+            self._task = asyncio.create_task(self._run(), name="contact-sync")
+
+    async def stop(self) -> None:
+        """Stop the periodic task; pending contacts stay queued in Mongo"""
+        if self._task is None:
+            return
+        self._task.cancel()
+        await asyncio.gather(self._task, return_exceptions=True)
+        self._task = None
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                while await self.sync_pending() == self.batch_size:
+                    pass  # full batch: more may be due
+            except Exception as e:
+                logger.error("Contact sync failed: %s", e)
+            await asyncio.sleep(self.interval)
+
+    async def sync_pending(self) -> int:
+        """Claim and push up to one batch of due contacts to Resend; returns how many were processed"""
+        processed = 0
+
+        async def worker():
+            nonlocal processed
+            while processed < self.batch_size:
+                processed += 1  # reserve a slot of the batch before the claim yields
+                doc = await self._claim()
+                if doc is None:
+                    processed -= 1
+                    return
+                await self._sync(doc)
+
+        await asyncio.gather(*[worker() for _ in range(self.concurrency)])
+        return processed
+
+    async def _claim(self) -> Optional[Dict[str, Any]]:
+        now = datetime.now(timezone.utc)
+        return await self.collection.find_one_and_update(
+            {
+                "$or": [
+                    {"status": STATUS_PENDING, "next_attempt_at": {"$lte": now}},
+                    # Contacts left behind by a crashed or cancelled worker
+                    {"status": STATUS_SYNCING, "lease_expires_at": {"$lte": now}},
+                ]
+            },
+            {
+                "$set": {"status": STATUS_SYNCING, "lease_expires_at": now + timedelta(seconds=self.lease_seconds)},
+                "$inc": {"attempts": 1},
+            },
+            sort=[("next_attempt_at", 1)],
+            return_document=ReturnDocument.AFTER,
+        )
+
+    async def _sync(self, doc: Dict[str, Any]) -> None:
+        try:
+            try:
+                await self._create_contact(doc["payload"])
+            except Exception as e:
+                await self._record_failure(doc, e)
+                return
+            await self.collection.update_one(
+                {"_id": doc["_id"]},
+                {"$set": {"status": STATUS_SYNCED, "lease_expires_at": None, "synced_at": datetime.now(timezone.utc)}},
+            )
+            self.synced += 1
+        except Exception as e:
+            # The contact keeps its lease and is claimed again once it expires
+            logger.error("Contact sync bookkeeping failed for %s: %s", doc["email"], e)
+
+    async def _record_failure(self, doc: Dict[str, Any], error: Exception) -> None:
+        update = self.retry.failure_update(doc["attempts"], error)
+        if update["status"] == STATUS_FAILED:
+            logger.error(
+                "Contact sync for %s failed permanently after %d attempts: %s", doc["email"], doc["attempts"], error
+            )
+            self.failed += 1
+        await self.collection.update_one({"_id": doc["_id"]}, {"$set": update})
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "known": len(self._known),
+            "queued": self.queued,
+            "skipped": self.skipped,
+            "synced": self.synced,
+            "failed": self.failed,
+        }
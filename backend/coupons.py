@@ -0,0 +1,255 @@
+"""
+Coupon redemption and lookup for SeknuTo.cz
+
+A coupon is redeemed with one conditional find_one_and_update on
+{code, used: false}, so concurrent bookings with the same code cannot
+both win: MongoDB applies the update to the document once and every
+other request matches nothing.
+
+CouponCache sits in front of coupon lookups for POST /api/coupons/validate.
+Unknown codes are cached too (for a shorter time), so repeated probes
+with invalid codes don't reach the database. Redemption stays the
+authority: a stale "valid" answer can only make a booking fail cleanly.
+
+CouponCodePool hands out new codes. Codes are drawn with `secrets` in
+bulk and reserved up front as placeholder coupon documents
+({code, reserved: true}) under the unique index on coupons.code, so a
+code in the pool can't collide with any issued coupon. Issuing one
+turns its placeholder into the real coupon; refills run in the
+background once the pool drops below its low watermark.
+"""
+import asyncio
+import logging
+import secrets
+import string
+import time
+from collections import OrderedDict, deque
+from datetime import datetime, timezone
+from typing import Any, Awaitable, Callable, Deque, Dict, List, Optional, Tuple
+
+from pymongo import ReturnDocument
+from pymongo.errors import BulkWriteError
+
+logger = logging.getLogger(__name__)
+
+CODE_PREFIX = "SEKNU"
+CODE_ALPHABET = string.ascii_uppercase + string.digits
+CODE_LENGTH = 5
+
+
+class CouponError(Exception):
+    """Coupon cannot be applied; status_code/detail mirror POST /api/coupons/validate"""
+    status_code = 400
+    detail = "Neplatný slevový kód"
+
+    def __init__(self, code: str):
+        super().__init__(f"{self.detail}: {code}")
+        self.code = code
+
+
+class CouponNotFoundError(CouponError):
+    status_code = 404
+    detail = "Neplatný slevový kód"
+
+
+class CouponUsedError(CouponError):
+    status_code = 400
+    detail = "Tento kupón již byl použit"
+
+
+def normalize_code(code: str) -> str:
+    return code.strip().upper()
+
+
+def apply_discount(price: int, discount_percent: int) -> int:
+    """Discounted price rounded half up, like the booking page's Math.round"""
+    return (price * (100 - discount_percent) + 50) // 100
+
+
+async def redeem_coupon(collection, code: str, booking_id: str) -> Dict[str, Any]:
+    """Mark an unused coupon as used by booking_id and return it"""
+    coupon = await collection.find_one_and_update(
+        {"code": code, "used": False},
+        {"$set": {
+            "used": True,
+            "used_at": datetime.now(timezone.utc).isoformat(),
+            "booking_id": booking_id,
+        }},
+        return_document=ReturnDocument.AFTER,
+    )
+    if coupon is not None:
+        coupon.pop("_id", None)
+        return coupon
+    # Failure path only: tell an unknown code from one that is already used
+    if await collection.find_one({"code": code, "reserved": {"$ne": True}}, {"_id": 1}) is None:
+        raise CouponNotFoundError(code)
+    raise CouponUsedError(code)
+
+
+async def restore_coupon(collection, code: str, booking_id: str) -> None:
+    """Undo redeem_coupon when the booking could not be stored"""
+    await collection.update_one(
+        {"code": code, "booking_id": booking_id},
+        {"$set": {"used": False}, "$unset": {"used_at": "", "booking_id": ""}},
+    )
+
+
+class CouponCache:
+    """Bounded LRU of coupon lookups with separate TTLs for hits and misses"""
+
+    def __init__(self, max_size: int = 10000, ttl: float = 60.0, negative_ttl: float = 10.0):
+        self.max_size = max_size
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        self._entries: "OrderedDict[str, Tuple[float, Optional[Dict[str, Any]]]]" = OrderedDict()
+        self.hits = 0
+        self.negative_hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._generation = 0
+
+    async def get(self, code: str, load: Callable[[str], Awaitable[Optional[Dict[str, Any]]]]) -> Optional[Dict[str, Any]]:
+        """Cached coupon for code (None when it doesn't exist), calling load on a miss"""
+        entry = self._entries.get(code)
+        if entry is not None and entry[0] > time.monotonic():
+            self._entries.move_to_end(code)
+            if entry[1] is None:
+                self.negative_hits += 1
+            else:
+                self.hits += 1
+            return entry[1]
+
+        self.misses += 1
+        generation = self._generation
+        coupon = await load(code)
+        if generation != self._generation:
+            # Invalidated while loading; the result may predate the change
+            return coupon
+        ttl = self.ttl if coupon is not None else self.negative_ttl
+        self._entries[code] = (time.monotonic() + ttl, coupon)
+        self._entries.move_to_end(code)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+        return coupon
+
+    def invalidate(self, code: str) -> None:
+        self._generation += 1
+        self._entries.pop(code, None)
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.negative_hits + self.misses
+        return {
+            "hits": self.hits,
+            "negative_hits": self.negative_hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "size": len(self._entries),
+            "max_size": self.max_size,
+            "hit_rate": round((self.hits + self.negative_hits) / lookups, 4) if lookups else 0.0,
+        }
+
+
+def _log_refill_failure(task: asyncio.Task) -> None:
+    if not task.cancelled() and task.exception() is not None:
+        logger.error("Coupon code pool refill failed: %s", task.exception())
+
+
+def generate_codes(count: int, prefix: str = CODE_PREFIX, length: int = CODE_LENGTH) -> List[str]:
+    """`count` distinct random codes from a CSPRNG"""
+    codes = set()
+    while len(codes) < count:
+        codes.add(prefix + "".join(secrets.choice(CODE_ALPHABET) for _ in range(length)))
+    return list(codes)
+
+
+class CouponCodePool:
+    """In-memory pool of pre-reserved coupon codes"""
+
+    def __init__(self, collection, *, size: int = 500, low_watermark: int = 100):
+        self.collection = collection
+        self.size = size
+        self.low_watermark = low_watermark
+        self._codes: Deque[str] = deque()
+        self._refill_task: Optional[asyncio.Task] = None
+        self.issued = 0
+        self.reserved = 0
+        self.collisions = 0
+        self.refills = 0
+
+    async def issue(self, fields: Dict[str, Any]) -> str:
+        """Turn a reserved code into a coupon with `fields` and return the code"""
+        while True:
+            code = await self.take()
+            if await self.activate(code, fields):
+                return code
+
+    async def take(self) -> str:
+        """Next reserved code, O(1) unless the pool is empty"""
+        if not self._codes:
+            await self._refill_running()
+        if len(self._codes) < self.low_watermark:
+            self._schedule_refill()
+        return self._codes.popleft()
+
+    def give_back(self, code: str) -> None:
+        """Return an unused code taken with take()"""
+        self._codes.appendleft(code)
+
+    async def activate(self, code: str, fields: Dict[str, Any], session=None) -> bool:
+        """Turn the placeholder for `code` into a coupon; False when it no longer exists"""
+        result = await self.collection.update_one(
+            {"code": code, "reserved": True},
+            {"$set": fields, "$unset": {"reserved": ""}},
+            session=session,
+        )
+        if not result.matched_count:
+            logger.warning("Reserved coupon code %s is gone", code)
+            return False
+        self.issued += 1
+        return True
+
+    def _schedule_refill(self) -> None:
+        if self._refill_task is None or self._refill_task.done():
+            self._refill_task = asyncio.get_running_loop().create_task(self.refill())
+            self._refill_task.add_done_callback(_log_refill_failure)
+
+    async def _refill_running(self) -> None:
+        """Wait for a refill, starting one if none is in flight"""
+        while not self._codes:
+            self._schedule_refill()
+            await asyncio.shield(self._refill_task)
+
+    async def refill(self) -> int:
+        """Reserve codes until the pool holds `size`; returns how many were added"""
+        wanted = self.size - len(self._codes)
+        if wanted <= 0:
+            return 0
+        codes = generate_codes(wanted)
+        now = datetime.now(timezone.utc).isoformat()
+        try:
+            await self.collection.insert_many(
+                [{"code": code, "reserved": True, "created_at": now} for code in codes], ordered=False
+            )
+            failed = set()
+        except BulkWriteError as e:
+            # Duplicate keys are codes that already exist; everything else was inserted
+            errors = e.details.get("writeErrors", [])
+            if any(error.get("code") != 11000 for error in errors):
+                raise
+            failed = {error["index"] for error in errors}
+            self.collisions += len(failed)
+        added = [code for index, code in enumerate(codes) if index not in failed]
+        self._codes.extend(added)
+        self.reserved += len(added)
+        self.refills += 1
+        return len(added)
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "available": len(self._codes),
+            "issued": self.issued,
+            "reserved": self.reserved,
+            "collisions": self.collisions,
+            "refills": self.refills,
+        }
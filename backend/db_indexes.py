@@ -0,0 +1,136 @@
+"""
+MongoDB index management for SeknuTo.cz
+
+REQUIRED_INDEXES declares every index the API relies on. At startup
+`ensure_indexes` reconciles them idempotently (creates missing ones,
+rebuilds ones whose definition changed, never touches unmanaged
+indexes) and `check_query_plans` explains the hot queries and warns
+about any that would still scan a whole collection.
+"""
+import logging
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Tuple
+
+from pymongo.errors import OperationFailure
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass(frozen=True)
+class IndexSpec:
+    collection: str
+    keys: Tuple[Tuple[str, int], ...]
+    name: str
+    unique: bool = False
+    options: Dict[str, Any] = field(default_factory=dict)
+
+
+REQUIRED_INDEXES: List[IndexSpec] = [
+    # Lookups by public id / natural key
+    IndexSpec("bookings", (("id", 1),), "bookings_id_unique", unique=True),
+    IndexSpec("subscribers", (("email", 1),), "subscribers_email_unique", unique=True),
+    IndexSpec("coupons", (("code", 1),), "coupons_code_unique", unique=True),
+    # Scheduling
+    IndexSpec("bookings", (("preferred_date", 1), ("status", 1)), "bookings_date_status"),
+    # One counter document per date; reservations rely on the uniqueness
+    IndexSpec("slot_capacity", (("date", 1),), "slot_capacity_date_unique", unique=True),
+    # GET /api/bookings keyset pagination, one index per equality filter
+    IndexSpec("bookings", (("created_at", -1), ("id", -1)), "bookings_created"),
+    IndexSpec("bookings", (("status", 1), ("created_at", -1), ("id", -1)), "bookings_status_created"),
+    IndexSpec("bookings", (("service", 1), ("created_at", -1), ("id", -1)), "bookings_service_created"),
+    IndexSpec("bookings", (("customer_email", 1), ("created_at", -1), ("id", -1)), "bookings_email_created"),
+    # Date-range exports
+    IndexSpec("contact_messages", (("created_at", 1),), "contact_messages_created"),
+    # Outbox dispatcher claim query
+    IndexSpec("email_outbox", (("status", 1), ("next_attempt_at", 1)), "email_outbox_status_due"),
+    # Outbox sweeper: which source documents already have entries
+    IndexSpec("email_outbox", (("ref", 1),), "email_outbox_ref"),
+    # Idempotent enqueue: an entry id is only ever inserted once
+    IndexSpec("email_outbox", (("id", 1),), "email_outbox_id_unique", unique=True),
+    # Resend contact registry: dedupe by email, periodic sync of due entries
+    IndexSpec("contacts_synced", (("email", 1),), "contacts_synced_email_unique", unique=True),
+    IndexSpec("contacts_synced", (("status", 1), ("next_attempt_at", 1)), "contacts_synced_status_due"),
+    # Idempotency records carry their own expiry time
+    IndexSpec("idempotency_keys", (("expires_at", 1),), "idempotency_keys_ttl", options={"expireAfterSeconds": 0}),
+]
+
+# (description, collection, filter) for queries that must be index-backed
+HOT_QUERIES: List[Tuple[str, str, Dict[str, Any]]] = [
+    ("get_booking", "bookings", {"id": "00000000-0000-0000-0000-000000000000"}),
+    ("subscribe_email", "subscribers", {"email": "index-check@example.com"}),
+    ("validate_coupon", "coupons", {"code": "SEKNU00000"}),
+    ("bookings by date/status", "bookings", {"preferred_date": "2026-01-01", "status": "pending"}),
+    ("bookings by customer", "bookings", {"customer_email": "index-check@example.com"}),
+    ("availability", "slot_capacity", {"date": {"$gte": "2026-01-01", "$lte": "2026-01-31"}}),
+]
+
+
+def _matches(spec: IndexSpec, info: Dict[str, Any]) -> bool:
+    if tuple((k, int(d)) for k, d in info["key"]) != spec.keys:
+        return False
+    if bool(info.get("unique")) != spec.unique:
+        return False
+    return all(info.get(option) == value for option, value in spec.options.items())
+
+
+async def ensure_indexes(db, specs: List[IndexSpec] = REQUIRED_INDEXES) -> Dict[str, str]:
+    """Create or rebuild declared indexes; returns {index name: action taken}"""
+    report = {}
+    existing_by_collection: Dict[str, Dict[str, Any]] = {}
+
+    for spec in specs:
+        if spec.collection not in existing_by_collection:
+            existing_by_collection[spec.collection] = await db[spec.collection].index_information()
+        existing = existing_by_collection[spec.collection]
+        current = existing.get(spec.name)
+
+        if current is not None and _matches(spec, current):
+            report[spec.name] = "ok"
+            continue
+
+        try:
+            if current is not None:
+                logger.warning("Index %s.%s definition changed, rebuilding", spec.collection, spec.name)
+                await db[spec.collection].drop_index(spec.name)
+            await db[spec.collection].create_index(
+                list(spec.keys), name=spec.name, unique=spec.unique, **spec.options
+            )
+            report[spec.name] = "rebuilt" if current is not None else "created"
+            logger.info("Index %s.%s %s", spec.collection, spec.name, report[spec.name])
+        except OperationFailure as e:
+            # e.g. duplicate keys already stored under a new unique index
+            report[spec.name] = "failed"
+            logger.error("Could not create index %s.%s: %s", spec.collection, spec.name, e)
+
+    return report
+
+
+def _plan_stages(plan: Dict[str, Any]) -> List[str]:
+    stages = [plan.get("stage", "")]
+    for child_key in ("inputStage", "queryPlan"):
+        if child_key in plan:
+            stages += _plan_stages(plan[child_key])
+    for child in plan.get("inputStages", []):
+        stages += _plan_stages(child)
+    return stages
+
+
+async def explain_stages(db, collection: str, query: Dict[str, Any]) -> List[str]:
+    """Stages of the winning plan for a find on `collection`"""
+    explain = await db.command("explain", {"find": collection, "filter": query}, verbosity="queryPlanner")
+    return _plan_stages(explain["queryPlanner"]["winningPlan"])
+
+
+async def check_query_plans(db, queries=HOT_QUERIES) -> Dict[str, List[str]]:
+    """Explain hot queries and log any that resolve to a COLLSCAN"""
+    plans = {}
+    for description, collection, query in queries:
+        try:
+            stages = await explain_stages(db, collection, query)
+        except Exception as e:
+            logger.debug("Could not explain %s: %s", description, e)
+            continue
+        plans[description] = stages
+        if "COLLSCAN" in stages:
+            logger.warning("Query plan for %s on %s uses COLLSCAN: %s", description, collection, " <- ".join(stages))
+    return plans
@@ -0,0 +1,105 @@
+"""
+Email template engine for SeknuTo.cz
+
+Templates live in templates/emails and are compiled once by Jinja2 with
+autoescaping on. Each email is a static shell (layout, header, footer)
+plus a fragment holding the per-message data. Shells are rendered once
+at startup and split around the fragment slot, so rendering a message
+only fills the fragment.
+"""
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Dict, Mapping, Optional, Tuple
+
+from jinja2 import Environment, FileSystemLoader, StrictUndefined, select_autoescape
+from markupsafe import Markup
+
+TEMPLATES_DIR = Path(__file__).parent / "templates" / "emails"
+
+# email name -> (shell template, fragment template)
+EMAILS: Dict[str, Tuple[str, str]] = {
+    "booking_customer": ("shells/booking_customer.html", "booking_customer.html"),
+    "booking_admin": ("shells/booking_admin.html", "booking_admin.html"),
+    "coupon": ("shells/coupon.html", "coupon.html"),
+    "contact_admin": ("shells/contact_admin.html", "contact_admin.html"),
+}
+
+_SLOT = "\x00content\x00"
+
+
+# ============== CONTEXTS ==============
+
+@dataclass(frozen=True)
+class BookingEmailContext:
+    customer_name: str
+    customer_phone: str
+    customer_email: str
+    property_address: str
+    service_name: str
+    time_name: str
+    preferred_date: str
+    property_size: int
+    condition: str
+    additional_services: str
+    estimated_price: int
+    notes: str = ""
+    final_price: Optional[int] = None
+    coupon_code: Optional[str] = None
+
+    @classmethod
+    def from_booking(cls, booking, service_names: Mapping[str, str], time_names: Mapping[str, str]) -> "BookingEmailContext":
+        return cls(
+            customer_name=booking.customer_name,
+            customer_phone=booking.customer_phone,
+            customer_email=booking.customer_email,
+            property_address=booking.property_address,
+            service_name=service_names.get(booking.service, booking.service),
+            time_name=time_names.get(booking.preferred_time, booking.preferred_time),
+            preferred_date=booking.preferred_date,
+            property_size=booking.property_size,
+            condition=booking.condition,
+            additional_services=", ".join(booking.additional_services),
+            estimated_price=booking.estimated_price,
+            notes=booking.notes or "",
+            final_price=booking.final_price,
+            coupon_code=booking.coupon_code,
+        )
+
+
+@dataclass(frozen=True)
+class CouponEmailContext:
+    coupon_code: str
+    discount_percent: int = 5
+
+
+@dataclass(frozen=True)
+class ContactEmailContext:
+    name: str
+    email: str
+    message: str
+    phone: Optional[str] = ""
+
+
+# ============== ENGINE ==============
+
+class EmailTemplates:
+    """Compiled, cached email templates"""
+
+    def __init__(self, directory: Path = TEMPLATES_DIR, emails: Mapping[str, Tuple[str, str]] = EMAILS):
+        self.env = Environment(
+            loader=FileSystemLoader(str(directory)),
+            autoescape=select_autoescape(("html",)),
+            undefined=StrictUndefined,
+            trim_blocks=True,
+            lstrip_blocks=True,
+            auto_reload=False,
+        )
+        self._compiled = {}
+        for name, (shell_name, fragment_name) in emails.items():
+            shell = self.env.get_template(shell_name).render(content=Markup(_SLOT))
+            head, tail = shell.split(_SLOT)
+            self._compiled[name] = (head, self.env.get_template(fragment_name), tail)
+
+    def render(self, name: str, context) -> str:
+        head, fragment, tail = self._compiled[name]
+        return head + fragment.render(vars(context)) + tail
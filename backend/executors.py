@@ -0,0 +1,137 @@
+"""
+Bounded thread pools for blocking work in SeknuTo.cz
+
+Each BoundedExecutor is a named ThreadPoolExecutor with its own worker
+count and a limit on how many calls may wait for a worker. When the
+queue is full the load-shedding policy decides: "reject" raises
+ExecutorSaturatedError (the endpoint answers 503), "caller_runs" runs
+the call on the event loop instead, which slows that one request down
+but never drops it. Queue wait and execution time are tracked separately
+so a saturated pool is easy to tell from slow work.
+"""
+import asyncio
+import concurrent.futures
+import time
+from typing import Any, Callable, Dict, Optional
+
+POLICY_REJECT = "reject"
+POLICY_CALLER_RUNS = "caller_runs"
+
+
+class ExecutorSaturatedError(Exception):
+    """The executor's queue is full and its policy is to reject"""
+
+    def __init__(self, name: str):
+        super().__init__(f"Executor '{name}' is saturated")
+        self.name = name
+
+
+class _Timing:
+    __slots__ = ("count", "total", "max")
+
+    def __init__(self):
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def add(self, seconds: float) -> None:
+        self.count += 1
+        self.total += seconds
+        self.max = max(self.max, seconds)
+
+    def stats(self) -> Dict[str, float]:
+        return {
+            "avg_ms": round(self.total / self.count * 1000, 3) if self.count else 0.0,
+            "max_ms": round(self.max * 1000, 3),
+        }
+
+
+def _timed(fn: Callable[..., Any], args: tuple, submitted: float):
+    started = time.perf_counter()
+    try:
+        return fn(*args), None, started - submitted, time.perf_counter() - started
+    except Exception as e:
+        return None, e, started - submitted, time.perf_counter() - started
+
+
+def _call_soon(loop: asyncio.AbstractEventLoop, callback: Callable[..., Any], *args: Any) -> None:
+    try:
+        loop.call_soon_threadsafe(callback, *args)
+    except RuntimeError:
+        pass  # loop already closed; nobody is left to read the counters
+
+
+class BoundedExecutor:
+    """Named thread pool with a queue limit and a load-shedding policy"""
+
+    def __init__(self, name: str, *, max_workers: int = 4, max_queue: int = 64, policy: str = POLICY_REJECT):
+        if policy not in (POLICY_REJECT, POLICY_CALLER_RUNS):
+            raise ValueError(f"Unknown executor policy: {policy}")
+        self.name = name
+        self.max_workers = max_workers
+        self.max_queue = max_queue
+        self.policy = policy
+        self._pool: Optional[concurrent.futures.ThreadPoolExecutor] = None
+        self._pending = 0
+        self.completed = 0
+        self.failed = 0
+        self.rejected = 0
+        self.ran_inline = 0
+        self.queue_wait = _Timing()
+        self.execution = _Timing()
+
+    def start(self) -> None:
+        if self._pool is None:
+            self._pool = concurrent.futures.ThreadPoolExecutor(self.max_workers, thread_name_prefix=self.name)
+
+    def shutdown(self, wait: bool = True) -> None:
+        """Finish queued calls (when wait) and stop the worker threads"""
+        if self._pool is not None:
+            self._pool.shutdown(wait=wait, cancel_futures=not wait)
+            self._pool = None
+
+    async def run(self, fn: Callable[..., Any], *args: Any) -> Any:
+        """Call fn(*args) on a worker thread, shedding load when the queue is full"""
+        if self._pending >= self.max_workers + self.max_queue:
+            if self.policy == POLICY_REJECT:
+                self.rejected += 1
+                raise ExecutorSaturatedError(self.name)
+            self.ran_inline += 1
+            return fn(*args)
+
+        self.start()
+        loop = asyncio.get_running_loop()
+        self._pending += 1
+        future = self._pool.submit(_timed, fn, args, time.perf_counter())
+        # Bookkeeping runs on the loop even if the awaiting request is cancelled
+        future.add_done_callback(lambda done: _call_soon(loop, self._finished, done))
+        result, error, _, _ = await asyncio.wrap_future(future)
+        if error is not None:
+            raise error
+        return result
+
+    def _finished(self, future: concurrent.futures.Future) -> None:
+        self._pending -= 1
+        if future.cancelled():
+            return
+        _, error, waited, executed = future.result()
+        self.queue_wait.add(waited)
+        self.execution.add(executed)
+        if error is None:
+            self.completed += 1
+        else:
+            self.failed += 1
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "workers": self.max_workers,
+            "pending": self._pending,
+            "max_queue": self.max_queue,
+            "policy": self.policy,
+            "completed": self.completed,
+            "failed": self.failed,
+            "rejected": self.rejected,
+            "ran_inline": self.ran_inline,
+            "queue_wait": self.queue_wait.stats(),
+            "execution": self.execution.stats(),
+        }
@@ -0,0 +1,66 @@
+"""
+Streaming data exports for SeknuTo.cz
+
+Encoders turn an async Motor cursor into NDJSON or CSV chunks, one chunk
+per cursor batch, so memory use does not grow with the collection size.
+"""
+import csv
+import io
+import json
+import re
+from typing import Any, AsyncIterable, AsyncIterator, Dict, List
+
+# Exportable collections and their columns (also the allowed projections)
+EXPORT_FIELDS: Dict[str, List[str]] = {
+    "bookings": [
+        "id", "created_at", "status", "service", "property_size", "condition",
+        "additional_services", "preferred_date", "preferred_time", "alternative_date",
+        "customer_name", "customer_phone", "customer_email", "property_address", "notes",
+        "estimated_price", "final_price", "discount_applied", "coupon_code",
+    ],
+    "contact_messages": ["id", "created_at", "status", "name", "email", "phone", "message"],
+}
+
+# Leading characters that make spreadsheets evaluate a cell as a formula (OWASP CSV injection)
+FORMULA_PREFIXES = ("=", "+", "-", "@", "\t", "\r")
+# Numbers and phone numbers ("+420 777 123 456", "-150") can't call functions; exported as is
+PLAIN_NUMBER = re.compile(r"[+-]?[\d ().\-/]+")
+
+
+def _csv_value(value: Any) -> Any:
+    if value is None:
+        return ""
+    if isinstance(value, list):
+        value = ";".join(str(item) for item in value)
+    if isinstance(value, str) and value.startswith(FORMULA_PREFIXES) and not PLAIN_NUMBER.fullmatch(value):
+        return "'" + value
+    return value
+
+
+async def stream_ndjson(docs: AsyncIterable[Dict[str, Any]], batch_size: int) -> AsyncIterator[bytes]:
+    lines = []
+    async for doc in docs:
+        lines.append(json.dumps(doc, ensure_ascii=False, default=str))
+        if len(lines) >= batch_size:
+            yield ("\n".join(lines) + "\n").encode()
+            lines = []
+    if lines:
+        yield ("\n".join(lines) + "\n").encode()
+
+
+async def stream_csv(docs: AsyncIterable[Dict[str, Any]], fields: List[str], batch_size: int) -> AsyncIterator[bytes]:
+    buffer = io.StringIO()
+    buffer.write("\ufeff")  # BOM so Excel opens the Czech text as UTF-8
+    writer = csv.writer(buffer)
+    writer.writerow(fields)
+    rows = 0
+    async for doc in docs:
+        writer.writerow([_csv_value(doc.get(field)) for field in fields])
+        rows += 1
+        if rows >= batch_size:
+            yield buffer.getvalue().encode()
+            buffer.seek(0)
+            buffer.truncate()
+            rows = 0
+    if buffer.tell():
+        yield buffer.getvalue().encode()
@@ -0,0 +1,206 @@
+"""
+Idempotency keys for SeknuTo.cz
+
+POST endpoints that create things accept an `Idempotency-Key` header.
+The first request with a key claims it by inserting a pending record
+into `idempotency_keys` (the key is the _id, so the claim is atomic),
+runs the handler and stores the response; retries with the same key get
+that response replayed instead of creating another booking or sending
+more email. A duplicate that arrives while the first is still running
+waits for its result: in-process through a shared future, across
+processes by polling the record. The owner renews its lease while the
+handler runs, so only a request whose process died can be taken over.
+Records expire through a TTL index on `expires_at`.
+"""
+import asyncio
+import hashlib
+import logging
+import time
+import uuid
+from datetime import datetime, timedelta, timezone
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple
+
+import orjson
+from fastapi import HTTPException, Response
+from fastapi.responses import ORJSONResponse
+from pymongo import ReturnDocument
+from pymongo.errors import DuplicateKeyError
+
+STATUS_PENDING = "pending"
+STATUS_DONE = "done"
+MAX_KEY_LENGTH = 255
+REPLAYED_HEADER = "Idempotent-Replayed"
+
+logger = logging.getLogger(__name__)
+
+
+def fingerprint(payload: Any) -> str:
+    return hashlib.sha256(orjson.dumps(payload, option=orjson.OPT_SORT_KEYS)).hexdigest()
+
+
+def _error(status_code: int, detail: str) -> ORJSONResponse:
+    return ORJSONResponse({"detail": detail}, status_code=status_code)
+
+
+class IdempotencyStore:
+    """Claim/replay of idempotent requests backed by a TTL-indexed collection"""
+
+    def __init__(
+        self,
+        collection,
+        *,
+        ttl: float = 24 * 3600,
+        lease_seconds: float = 30.0,
+        wait_timeout: float = 10.0,
+        poll_interval: float = 0.05,
+    ):
+        self.collection = collection
+        self.ttl = ttl
+        self.lease_seconds = lease_seconds
+        self.wait_timeout = wait_timeout
+        self.poll_interval = poll_interval
+        self._inflight: Dict[str, asyncio.Future] = {}
+        self.replays = 0
+        self.coalesced = 0
+
+    async def run(
+        self,
+        key: Optional[str],
+        scope: str,
+        payload: Any,
+        handler: Callable[[], Awaitable[Any]],
+    ) -> Response:
+        """Run handler once per (scope, key); without a key just run it"""
+        if key is None:
+            return _to_response(await handler())
+        if not key or len(key) > MAX_KEY_LENGTH:
+            return _error(400, f"Idempotency-Key musí mít 1 až {MAX_KEY_LENGTH} znaků")
+
+        record_id = f"{scope}:{key}"
+        request_fingerprint = fingerprint(payload)
+        owner = uuid.uuid4().hex
+        deadline = time.monotonic() + self.wait_timeout
+
+        while True:
+            local = self._inflight.get(record_id)
+            if local is not None:
+                self.coalesced += 1
+                try:
+                    stored = await asyncio.shield(local)
+                except Exception:
+                    continue  # the first attempt failed and released the key
+                return self._replay(stored, request_fingerprint)
+
+            claimed, record = await self._claim(record_id, request_fingerprint, owner)
+            if claimed:
+                return await self._execute(record_id, request_fingerprint, owner, handler)
+            if record is None:
+                continue  # expired between our insert and read
+            if record["status"] == STATUS_DONE or record["fingerprint"] != request_fingerprint:
+                return self._replay(record, request_fingerprint)
+            if time.monotonic() >= deadline:
+                return _error(409, "Požadavek se stejným Idempotency-Key se stále zpracovává")
+            await asyncio.sleep(self.poll_interval)
+
+    async def _claim(self, record_id: str, request_fingerprint: str, owner: str) -> Tuple[bool, Optional[Dict[str, Any]]]:
+        now = datetime.now(timezone.utc)
+        lease = now + timedelta(seconds=self.lease_seconds)
+        try:
+            await self.collection.insert_one({
+                "_id": record_id,
+                "status": STATUS_PENDING,
+                "fingerprint": request_fingerprint,
+                "owner": owner,
+                "lease_expires_at": lease,
+                "created_at": now,
+                "expires_at": now + timedelta(seconds=self.ttl),
+            })
+            return True, None
+        except DuplicateKeyError:
+            pass
+        # Take over a pending record whose owner died without finishing
+        record = await self.collection.find_one_and_update(
+            {"_id": record_id, "status": STATUS_PENDING, "fingerprint": request_fingerprint,
+             "lease_expires_at": {"$lt": now}},
+            {"$set": {"owner": owner, "lease_expires_at": lease}},
+            return_document=ReturnDocument.AFTER,
+        )
+        if record is not None:
+            return True, None
+        return False, await self.collection.find_one({"_id": record_id})
+
+    async def _execute(self, record_id: str, request_fingerprint: str, owner: str, handler) -> Response:
+        future = asyncio.get_running_loop().create_future()
+        self._inflight[record_id] = future
+        heartbeat = asyncio.create_task(self._renew_lease(record_id, owner))
+        try:
+            try:
+                response = _to_response(await handler())
+            except HTTPException as e:
+                response = ORJSONResponse({"detail": e.detail}, status_code=e.status_code, headers=e.headers)
+            finally:
+                heartbeat.cancel()
+
+            if response.status_code >= 500:
+                raise _ServerError(response)
+            stored = {
+                "status": STATUS_DONE,
+                "fingerprint": request_fingerprint,
+                "status_code": response.status_code,
+                "media_type": response.media_type,
+                "body": bytes(response.body),
+            }
+            await self.collection.update_one({"_id": record_id}, {"$set": stored})
+            future.set_result(stored)
+            return response
+        except BaseException as e:
+            # Release the key so a retry can run the request again
+            await asyncio.shield(self.collection.delete_one({"_id": record_id, "status": STATUS_PENDING}))
+            # Waiters retry the claim; retrieve the exception so an unawaited future doesn't warn
+            future.set_exception(RuntimeError(f"Idempotent request {record_id} failed"))
+            future.exception()
+            if isinstance(e, _ServerError):
+                return e.response
+            raise
+        finally:
+            self._inflight.pop(record_id, None)
+
+    async def _renew_lease(self, record_id: str, owner: str) -> None:
+        """Extend the lease every third of its length until cancelled, while we still own the record"""
+        while True:
+            await asyncio.sleep(self.lease_seconds / 3)
+            try:
+                await self.collection.update_one(
+                    {"_id": record_id, "status": STATUS_PENDING, "owner": owner},
+                    {"$set": {"lease_expires_at": datetime.now(timezone.utc) + timedelta(seconds=self.lease_seconds)}},
+                )
+            except Exception as e:
+                logger.warning("Could not renew idempotency lease for %s: %s", record_id, e)
+
+    def _replay(self, record: Dict[str, Any], request_fingerprint: str) -> Response:
+        if record["fingerprint"] != request_fingerprint:
+            return _error(422, "Idempotency-Key už byl použit pro jiný požadavek")
+        self.replays += 1
+        return Response(
+            content=bytes(record["body"]),
+            status_code=record["status_code"],
+            media_type=record["media_type"],
+            headers={REPLAYED_HEADER: "true"},
+        )
+
+    def stats(self) -> Dict[str, int]:
+        return {"replays": self.replays, "coalesced": self.coalesced, "inflight": len(self._inflight)}
+
+
+class _ServerError(Exception):
+    """A 5xx response from the handler: returned to the caller, never stored"""
+
+    def __init__(self, response: Response):
+        super().__init__(response.status_code)
+        self.response = response
+
+
+def _to_response(result: Any) -> Response:
+    if isinstance(result, Response):
+        return result
+    return ORJSONResponse(result)
@@ -0,0 +1,106 @@
+"""
+Non-blocking logging for SeknuTo.cz
+
+Log calls on the event loop only put the LogRecord on a bounded
+in-memory queue; a QueueListener thread formats it (as one JSON object
+per line, or the classic text line) and writes it to stderr. Records
+keep their msg/args until then, so `logger.info("... %s", value)`
+formats on the listener thread, never on the loop. When the queue is
+full the record is dropped and counted instead of blocking the request.
+"""
+import logging
+import logging.handlers
+import queue
+import sys
+from datetime import datetime, timezone
+from typing import Any, Dict, Optional, TextIO, Union
+
+import orjson
+
+# Attributes every LogRecord has; anything else came in through `extra=`
+_RECORD_ATTRS = frozenset(vars(logging.LogRecord("", 0, "", 0, "", None, None))) | {"message", "asctime"}
+
+TEXT_FORMAT = '%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per record: ts, level, logger, message, extra fields, exc"""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry: Dict[str, Any] = {
+            "ts": datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+        for key, value in record.__dict__.items():
+            if key not in _RECORD_ATTRS and not key.startswith("_"):
+                entry[key] = value
+        if record.exc_info:
+            entry["exc"] = self.formatException(record.exc_info)
+        if record.stack_info:
+            entry["stack"] = self.formatStack(record.stack_info)
+        return orjson.dumps(entry, default=str).decode()
+
+
+class DroppingQueueHandler(logging.handlers.QueueHandler):
+    """QueueHandler that never blocks: a full queue drops the record"""
+
+    def __init__(self, log_queue: queue.Queue):
+        super().__init__(log_queue)
+        self.dropped = 0
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # The queue stays in-process, so the record needs no pickling:
+        # skip the base class's eager self.format() and leave it to the listener
+        return record
+
+    def enqueue(self, record: logging.LogRecord) -> None:
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
+class LogPipeline:
+    """Root logger -> bounded queue -> listener thread -> stream"""
+
+    def __init__(
+        self,
+        *,
+        level: Union[int, str] = logging.INFO,
+        json_format: bool = True,
+        queue_size: int = 10000,
+        stream: Optional[TextIO] = None,
+    ):
+        self.queue: queue.Queue = queue.Queue(maxsize=queue_size)
+        self.handler = DroppingQueueHandler(self.queue)
+        output = logging.StreamHandler(stream or sys.stderr)
+        output.setFormatter(JsonFormatter() if json_format else logging.Formatter(TEXT_FORMAT))
+        self.listener = logging.handlers.QueueListener(self.queue, output, respect_handler_level=True)
+        self.level = level
+        self._running = False
+
+    def install(self, logger: Optional[logging.Logger] = None) -> "LogPipeline":
+        """Route `logger` (root by default) through the queue and start the listener"""
+        logger = logger or logging.getLogger()
+        for handler in list(logger.handlers):
+            logger.removeHandler(handler)
+        logger.addHandler(self.handler)
+        logger.setLevel(self.level)
+        self.start()
+        return self
+
+    def start(self) -> None:
+        if not self._running:
+            self.listener.start()
+            self._running = True
+
+    def stop(self) -> None:
+        """Write out everything still queued and stop the listener thread"""
+        if self._running:
+            self.listener.stop()
+            self._running = False
+
+    def stats(self) -> Dict[str, int]:
+        return {"queued": self.queue.qsize(), "max_queue": self.queue.maxsize, "dropped": self.handler.dropped}
@@ -0,0 +1,295 @@
+"""
+Durable email outbox for SeknuTo.cz
+
+Request handlers only insert outbox entries into MongoDB. A background
+dispatcher claims up to `batch_size` due entries at a time and delivers
+them together, one batch in flight, with per-entry retries and
+exponential backoff, so API latency no longer depends on Resend
+round-trips and a burst of bookings costs a few batch requests.
+
+OutboxSweeper covers producers that cannot write their source document
+and its outbox entries in one transaction: it periodically looks for
+recent source documents without outbox entries and enqueues them.
+Enqueueing is an upsert on the entry id (unique index), and producers
+derive the id from the source document, so a booking swept by several
+workers, or again after a restart, still gets each email once.
+"""
+import asyncio
+import logging
+import uuid
+from datetime import datetime, timedelta, timezone
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Sequence
+
+from pymongo import UpdateOne
+
+from retries import STATUS_FAILED, STATUS_PENDING, RetryPolicy
+
+logger = logging.getLogger(__name__)
+
+STATUS_SENDING = "sending"
+STATUS_SENT = "sent"
+
+# Delivers claimed entries; returns, in order, None or the exception per entry
+DeliverFn = Callable[[List[Dict[str, Any]]], Awaitable[Sequence[Optional[Exception]]]]
+
+
+class PermanentDeliveryError(Exception):
+    """Delivery failed in a way that retrying cannot fix (e.g. invalid recipient)"""
+
+
+def outbox_entry(
+    kind: str, payload: Dict[str, Any], ref: Optional[str] = None, entry_id: Optional[str] = None
+) -> Dict[str, Any]:
+    """Build an outbox document ready for insertion; pass a stable `entry_id` to make its enqueue idempotent"""
+    now = datetime.now(timezone.utc)
+    return {
+        "id": entry_id or str(uuid.uuid4()),
+        "kind": kind,
+        "payload": payload,
+        "ref": ref,
+        "status": STATUS_PENDING,
+        "attempts": 0,
+        "next_attempt_at": now,
+        "lease_expires_at": None,
+        "last_error": None,
+        "created_at": now,
+    }
+
+
+class EmailOutbox:
+    """Mongo-backed outbox with a background dispatcher task"""
+
+    def __init__(
+        self,
+        collection,
+        deliver: DeliverFn,
+        *,
+        batch_size: int = 50,
+        max_attempts: int = 6,
+        base_delay: float = 2.0,
+        max_delay: float = 300.0,
+        poll_interval: float = 5.0,
+        lease_seconds: float = 120.0,
+    ):
+        self.collection = collection
+        self._deliver = deliver
+        self.batch_size = batch_size
+        self.retry = RetryPolicy(max_attempts=max_attempts, base_delay=base_delay, max_delay=max_delay)
+        self.poll_interval = poll_interval
+        self.lease_seconds = lease_seconds
+
+        self._wakeup = asyncio.Event()
+        self._stopping = False
+        self._task: Optional[asyncio.Task] = None
+        self._inflight: List[Dict[str, Any]] = []
+
+    # ---------- producer side ----------
+
+    async def enqueue(self, entries: List[Dict[str, Any]], session=None) -> int:
+        """Persist entries built by `outbox_entry` (inside `session`'s transaction if given) and wake the dispatcher
+
+        Entries whose id is already queued are left alone; returns how many were new.
+        """
+        if not entries:
+            return 0
+        result = await self.collection.bulk_write(
+            [UpdateOne({"id": entry["id"]}, {"$setOnInsert": entry}, upsert=True) for entry in entries],
+            session=session,
+        )
+        if result.upserted_count:
+            self._wakeup.set()
+        return result.upserted_count
+
+    # ---------- dispatcher ----------
+
+    def start(self) -> None:
+        if self._task is None:
+            self._stopping = False
+            self._task = asyncio.create_task(self._run(), name="email-outbox-dispatcher")
+
+    async def stop(self, drain_timeout: float = 10.0) -> None:
+        """Stop claiming and finish the batch in flight; everything else stays queued in Mongo"""
+        if self._task is None:
+            return
+        self._stopping = True
+        self._wakeup.set()
+        try:
+            await asyncio.wait_for(asyncio.shield(self._task), timeout=drain_timeout)
+        except asyncio.TimeoutError:
+            inflight = self._inflight
+            logger.warning("Outbox drain timed out after %ss, %d deliveries cancelled", drain_timeout, len(inflight))
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            await self._release(inflight)
+        self._task = None
+
+    async def _run(self) -> None:
+        while not self._stopping:
+            try:
+                batch = await self._claim()
+            except Exception as e:
+                logger.error("Outbox claim failed: %s", e)
+                await self._wait_for_work()
+                continue
+
+            if not batch:
+                await self._wait_for_work()
+                continue
+
+            self._inflight = batch
+            try:
+                await self._process(batch)
+            finally:
+                self._inflight = []
+
+    async def _wait_for_work(self) -> None:
+        try:
+            await asyncio.wait_for(self._wakeup.wait(), timeout=self.poll_interval)
+        except asyncio.TimeoutError:
+            pass
+        self._wakeup.clear()
+
+    async def _claim(self) -> List[Dict[str, Any]]:
+        """Lease up to batch_size due entries; entries another worker leased in between are skipped"""
+        now = datetime.now(timezone.utc)
+        due = {
+            "$or": [
+                {"status": STATUS_PENDING, "next_attempt_at": {"$lte": now}},
+                # Entries left behind by a crashed or cancelled worker
+                {"status": STATUS_SENDING, "lease_expires_at": {"$lte": now}},
+            ]
+        }
+        candidates = await self.collection.find(due, {"_id": 1}) \
+            .sort("next_attempt_at", 1) \
+            .limit(self.batch_size) \
+            .to_list(self.batch_size)
+        if not candidates:
+            return []
+        ids = [doc["_id"] for doc in candidates]
+        claim = uuid.uuid4().hex
+        await self.collection.update_many(
+            {"_id": {"$in": ids}, **due},
+            {
+                "$set": {
+                    "status": STATUS_SENDING,
+                    "lease_expires_at": now + timedelta(seconds=self.lease_seconds),
+                    "claim": claim,
+                },
+                "$inc": {"attempts": 1},
+            },
+        )
+        return await self.collection.find({"_id": {"$in": ids}, "claim": claim}) \
+            .sort("next_attempt_at", 1) \
+            .to_list(len(ids))
+
+    async def _process(self, batch: List[Dict[str, Any]]) -> None:
+        try:
+            errors = list(await self._deliver(batch))
+        except Exception as e:
+            errors = [e] * len(batch)
+        try:
+            sent = [entry["_id"] for entry, error in zip(batch, errors) if error is None]
+            if sent:
+                await self.collection.update_many(
+                    {"_id": {"$in": sent}},
+                    {"$set": {
+                        "status": STATUS_SENT,
+                        "lease_expires_at": None,
+                        "sent_at": datetime.now(timezone.utc),
+                    }},
+                )
+            for entry, error in zip(batch, errors):
+                if error is not None:
+                    await self._record_failure(entry, error)
+        except Exception as e:
+            # Entries keep their lease and are picked up again once it expires
+            logger.error("Outbox bookkeeping failed for a batch of %d: %s", len(batch), e)
+
+    async def _release(self, batch: List[Dict[str, Any]]) -> None:
+        """Hand back entries whose delivery was cancelled, due now, without waiting for their lease"""
+        if not batch:
+            return
+        try:
+            await self.collection.update_many(
+                {"_id": {"$in": [entry["_id"] for entry in batch]}, "status": STATUS_SENDING},
+                {
+                    "$set": {"status": STATUS_PENDING, "next_attempt_at": datetime.now(timezone.utc), "lease_expires_at": None},
+                    "$inc": {"attempts": -1},
+                },
+            )
+        except Exception as e:
+            logger.error("Could not release %d cancelled outbox entries: %s", len(batch), e)
+
+    async def _record_failure(self, entry: Dict[str, Any], error: Exception) -> None:
+        attempts = entry["attempts"]
+        update = self.retry.failure_update(attempts, error, permanent=isinstance(error, PermanentDeliveryError))
+        if update["status"] == STATUS_FAILED:
+            logger.error("Outbox %s %s failed permanently after %d attempts: %s", entry["kind"], entry["id"], attempts, error)
+        else:
+            logger.warning(
+                "Outbox %s %s attempt %d failed, retrying at %s: %s",
+                entry["kind"], entry["id"], attempts, update["next_attempt_at"].isoformat(timespec="seconds"), error,
+            )
+        await self.collection.update_one({"_id": entry["_id"]}, {"$set": update})
+
+
+class OutboxSweeper:
+    """Enqueues outbox entries for recent source documents that have none"""
+
+    def __init__(
+        self,
+        outbox: EmailOutbox,
+        source,
+        build_entries: Callable[[Dict[str, Any]], List[Dict[str, Any]]],
+        *,
+        interval: float = 60.0,
+        grace: float = 60.0,
+        lookback: float = 86400.0,
+    ):
+        self.outbox = outbox
+        self.source = source
+        self._build_entries = build_entries
+        self.interval = interval
+        self.grace = grace
+        self.lookback = lookback
+        self._swept_until: Optional[datetime] = None
+        self._task: Optional[asyncio.Task] = None
+        self.requeued = 0
+
+    async def sweep(self) -> int:
+        """Enqueue entries for documents created since the last sweep; returns how many documents"""
+        # Documents younger than `grace` may still have their enqueue in flight
+        until = datetime.now(timezone.utc) - timedelta(seconds=self.grace)
+        since = self._swept_until - timedelta(seconds=self.grace) if self._swept_until else until - timedelta(seconds=self.lookback)
+        docs = await self.source.find(
+            {"created_at": {"$gte": since.isoformat(), "$lt": until.isoformat()}}, {"_id": 0}
+        ).to_list(None)
+        requeued = 0
+        if docs:
+            queued = set(await self.outbox.collection.distinct("ref", {"ref": {"$in": [doc["id"] for doc in docs]}}))
+            for doc in docs:
+                if doc["id"] not in queued and await self.outbox.enqueue(self._build_entries(doc)):
+                    logger.warning("Outbox entries for %s were missing and have been queued", doc["id"])
+                    requeued += 1
+        self._swept_until = until
+        self.requeued += requeued
+        return requeued
+
+    def start(self) -> None:
+        if self._task is None:
+            self._task = asyncio.create_task(self._run(), name="email-outbox-sweeper")
+
+    async def stop(self) -> None:
+        if self._task is None:
+            return
+        self._task.cancel()
+        await asyncio.gather(self._task, return_exceptions=True)
+        self._task = None
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                await self.sweep()
+            except Exception as e:
+                logger.error("Outbox sweep failed: %s", e)
+            await asyncio.sleep(self.interval)
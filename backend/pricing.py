@@ -0,0 +1,354 @@
+"""
+Pricing rules for SeknuTo.cz
+
+`calculate_quote` is the reference implementation of the pricing rules.
+At import the config dicts are compiled into an immutable RuleTable;
+`PricingEngine` prices single requests from it (memoized, serves
+POST /api/pricing/calculate) and `calculate_quotes_batch` prices many
+configurations at once with NumPy. Both return results identical to
+`calculate_quote`.
+"""
+from bisect import bisect_left
+from dataclasses import dataclass
+from functools import lru_cache
+from types import MappingProxyType
+from typing import Any, Callable, Dict, List, Mapping, Optional, Sequence, Tuple
+
+import numpy as np
+
+SERVICE_PRICES = {
+    # Sekání trávy (základní služby)
+    "lawn_mowing": 2,              # Kč/m² - bez hnojení
+    "lawn_with_fertilizer": 3.33,  # Kč/m² - s hnojením
+    "overgrown": 3.5,              # Kč/m² - přerostlá tráva (3-4 Kč)
+    
+    # Fixní ceny
+    "garden_work": 350,            # Zahradnické práce - 300-450 Kč/hod (průměr)
+    "debris_hourly": 400,          # Odvoz odpadu - 400 Kč/hod
+    
+    "other": 0
+}
+
+# Odstupňované ceny balíčků podle velikosti plochy
+PACKAGE_TIERED_PRICING = {
+    "spring_package": {  # Jarní balíček
+        "small": 12,     # do 200 m²
+        "medium": 10,    # 200-500 m²
+        "large": 8.5,    # 500+ m²
+    },
+    "summer_package": {  # Letní balíček (měsíčně)
+        "small": 4,
+        "medium": 3.5,
+        "large": 3,
+    },
+    "autumn_package": {  # Podzimní balíček
+        "small": 14,
+        "medium": 12,
+        "large": 10,
+    },
+    "winter_snow": {     # Zimní balíček
+        "small": 10,
+        "medium": 8,
+        "large": 8,
+    },
+    "vip_annual": {      # Celoroční VIP (roční cena za m²)
+        "small": 22,
+        "medium": 20,
+        "large": 18,
+    },
+}
+
+def get_size_tier(size):
+    """Determine pricing tier based on property size"""
+    if size <= 200:
+        return "small"
+    elif size <= 500:
+        return "medium"
+    else:
+        return "large"
+
+CONDITION_MULTIPLIERS = {
+    "normal": 1.0,
+    "overgrown": 1.5,
+    "very_neglected": 2.0
+}
+
+# Příplatky za m²
+ADDITIONAL_SERVICE_PRICES_PER_M2 = {
+    "mulching": 0.5,               # Mulčování +0,5 Kč/m²
+    "salting": 0.5,                # Solení +0,5 Kč/m²
+    "snow_clearing": 2,            # Dočištění sněhu 2 Kč/m²
+}
+
+# Fixní příplatky
+ADDITIONAL_SERVICE_PRICES = {
+    "debris_removal": 400,         # Odvoz odpadu - 400 Kč/hod
+    "vertikutace": 500,            # Vertikutace extra
+    "hnojeni": 200,                # Hnojení extra
+}
+
+HOURLY_SERVICES = ("garden_work", "debris_hourly")
+
+TIER_NAMES = ("small", "medium", "large")
+TIER_UPPER_BOUNDS = (200, 500)  # m², inclusive upper bounds of small and medium
+TIER_LABELS = {"small": "do 200 m²", "medium": "200-500 m²", "large": "500+ m²"}
+
+# Above this the float64 kernel could lose integer precision
+MAX_BATCH_PROPERTY_SIZE = 10 ** 9
+
+
+def calculate_quote(service: str, property_size: int, condition: str, additional_services: Sequence[str]) -> Dict:
+    """Price one service configuration"""
+    # Check if it's a tiered package
+    if service in PACKAGE_TIERED_PRICING:
+        tier = get_size_tier(property_size)
+        base_price = PACKAGE_TIERED_PRICING[service][tier]
+        total = int(base_price * property_size)
+    elif service in HOURLY_SERVICES:
+        # Hodinová sazba × počet hodin (property_size = hodiny)
+        base_price = SERVICE_PRICES.get(service, 350)
+        total = int(base_price * max(property_size, 1))
+    elif service in SERVICE_PRICES:
+        base_price = SERVICE_PRICES.get(service, 2)
+        multiplier = CONDITION_MULTIPLIERS.get(condition, 1.0)
+        total = int(base_price * property_size * multiplier)
+    else:
+        base_price = 2
+        total = int(base_price * property_size)
+
+    # Příplatky za m² (mulčování, solení)
+    additional_cost = 0
+    for extra in additional_services:
+        if extra in ADDITIONAL_SERVICE_PRICES_PER_M2:
+            additional_cost += int(ADDITIONAL_SERVICE_PRICES_PER_M2[extra] * property_size)
+        elif extra in ADDITIONAL_SERVICE_PRICES:
+            additional_cost += ADDITIONAL_SERVICE_PRICES[extra]
+
+    total += additional_cost
+
+    # Get tier info for packages
+    tier_info = None
+    if service in PACKAGE_TIERED_PRICING:
+        tier = get_size_tier(property_size)
+        tier_info = {
+            "tier": tier,
+            "tier_label": TIER_LABELS[tier],
+            "price_per_m2": PACKAGE_TIERED_PRICING[service][tier]
+        }
+
+    return {
+        "estimated_price": total,
+        "base_price_per_unit": base_price,
+        "property_size": property_size,
+        "condition_multiplier": CONDITION_MULTIPLIERS.get(condition, 1.0),
+        "additional_services_cost": additional_cost,
+        "tier_info": tier_info
+    }
+
+
+# ============== COMPILED RULE TABLE ==============
+
+@dataclass(frozen=True)
+class ServiceRule:
+    """How one service is priced; base_prices and tier_infos hold one entry per tier"""
+    base_prices: Tuple[float, ...]
+    tier_infos: Tuple[Optional[Mapping[str, Any]], ...]
+    hourly: bool = False
+    uses_condition: bool = False
+
+    @property
+    def tiered(self) -> bool:
+        return self.tier_infos[0] is not None
+
+
+@dataclass(frozen=True)
+class RuleTable:
+    """Immutable pricing config, compiled once by compile_rules"""
+    services: Mapping[str, ServiceRule]
+    fallback: ServiceRule
+    condition_multipliers: Mapping[str, float]
+    addon_costs: Mapping[str, Callable[[int], int]]
+
+    def rule_for(self, service: str) -> ServiceRule:
+        return self.services.get(service, self.fallback)
+
+
+def _flat_rule(base_price, **flags) -> ServiceRule:
+    return ServiceRule((base_price,) * len(TIER_NAMES), (None,) * len(TIER_NAMES), **flags)
+
+
+def _per_m2_cost(price: float) -> Callable[[int], int]:
+    return lambda size: int(price * size)
+
+
+def _fixed_cost(price: int) -> Callable[[int], int]:
+    return lambda size: price
+
+
+def compile_rules(
+    service_prices: Mapping[str, float] = SERVICE_PRICES,
+    tiered_pricing: Mapping[str, Mapping[str, float]] = PACKAGE_TIERED_PRICING,
+    condition_multipliers: Mapping[str, float] = CONDITION_MULTIPLIERS,
+    addon_prices_per_m2: Mapping[str, float] = ADDITIONAL_SERVICE_PRICES_PER_M2,
+    addon_prices: Mapping[str, int] = ADDITIONAL_SERVICE_PRICES,
+) -> RuleTable:
+    """Resolve the pricing dicts into per-service rules, following calculate_quote's precedence"""
+    services = {}
+    for service, price in service_prices.items():
+        if service in HOURLY_SERVICES:
+            continue
+        services[service] = _flat_rule(price, uses_condition=True)
+    for service in HOURLY_SERVICES:
+        services[service] = _flat_rule(service_prices.get(service, 350), hourly=True)
+    for service, prices in tiered_pricing.items():
+        services[service] = ServiceRule(
+            base_prices=tuple(prices[tier] for tier in TIER_NAMES),
+            tier_infos=tuple(
+                MappingProxyType({"tier": tier, "tier_label": TIER_LABELS[tier], "price_per_m2": prices[tier]})
+                for tier in TIER_NAMES
+            ),
+        )
+
+    addon_costs = {name: _fixed_cost(price) for name, price in addon_prices.items()}
+    addon_costs.update({name: _per_m2_cost(price) for name, price in addon_prices_per_m2.items()})
+
+    return RuleTable(
+        services=MappingProxyType(services),
+        fallback=_flat_rule(2),
+        condition_multipliers=MappingProxyType(dict(condition_multipliers)),
+        addon_costs=MappingProxyType(addon_costs),
+    )
+
+
+PRICING_RULES = compile_rules()
+
+
+class PricingEngine:
+    """calculate_quote over a compiled RuleTable, memoized in a bounded LRU cache"""
+
+    def __init__(self, rules: RuleTable = PRICING_RULES, cache_size: int = 4096):
+        self.rules = rules
+        self._quote = lru_cache(maxsize=cache_size)(self._compute)
+
+    def quote(self, service: str, property_size: int, condition: str, additional_services: Sequence[str]) -> Dict:
+        rules = self.rules
+        # Normalize so requests that must price the same share one cache entry
+        key = (
+            service if service in rules.services else None,
+            property_size,
+            rules.condition_multipliers.get(condition, 1.0),
+            tuple(sorted(extra for extra in additional_services if extra in rules.addon_costs)),
+        )
+        result = self._quote(*key)
+        # Callers get their own dicts; the cached one is shared
+        tier_info = result["tier_info"]
+        return {**result, "tier_info": dict(tier_info) if tier_info is not None else None}
+
+    def _compute(self, service: Optional[str], property_size: int, multiplier: float, additional_services: Tuple[str, ...]) -> Dict:
+        rule = self.rules.rule_for(service)
+        tier = bisect_left(TIER_UPPER_BOUNDS, property_size)
+        base_price = rule.base_prices[tier]
+        if rule.hourly:
+            total = int(base_price * max(property_size, 1))
+        elif rule.uses_condition:
+            total = int(base_price * property_size * multiplier)
+        else:
+            total = int(base_price * property_size)
+
+        addon_costs = self.rules.addon_costs
+        additional_cost = sum(addon_costs[extra](property_size) for extra in additional_services)
+
+        return {
+            "estimated_price": total + additional_cost,
+            "base_price_per_unit": base_price,
+            "property_size": property_size,
+            "condition_multiplier": multiplier,
+            "additional_services_cost": additional_cost,
+            "tier_info": rule.tier_infos[tier],
+        }
+
+    def cache_info(self) -> Dict[str, int]:
+        info = self._quote.cache_info()
+        return {"hits": info.hits, "misses": info.misses, "size": info.currsize, "maxsize": info.maxsize}
+
+    def cache_clear(self) -> None:
+        self._quote.cache_clear()
+
+
+# ============== VECTORIZED KERNEL ==============
+
+_PER_M2_NAMES = tuple(ADDITIONAL_SERVICE_PRICES_PER_M2)
+_PER_M2_PRICES = np.array([ADDITIONAL_SERVICE_PRICES_PER_M2[name] for name in _PER_M2_NAMES], dtype=np.float64)
+_PER_M2_INDEX = {name: i for i, name in enumerate(_PER_M2_NAMES)}
+
+
+def _rule_row(service: str, condition: str, additional_services: Sequence[str]) -> Tuple:
+    """Kernel parameters for one (service, condition, add-ons) combination"""
+    rule = PRICING_RULES.rule_for(service)
+    multiplier = PRICING_RULES.condition_multipliers.get(condition, 1.0) if rule.uses_condition else 1.0
+
+    per_m2_counts = [0] * len(_PER_M2_NAMES)
+    fixed_cost = 0
+    for extra in additional_services:
+        if extra in _PER_M2_INDEX:
+            per_m2_counts[_PER_M2_INDEX[extra]] += 1
+        elif extra in ADDITIONAL_SERVICE_PRICES:
+            fixed_cost += ADDITIONAL_SERVICE_PRICES[extra]
+    return rule.base_prices, rule.hourly, multiplier, per_m2_counts, fixed_cost, rule.tier_infos
+
+
+def calculate_quotes_batch(
+    services: Sequence[str],
+    sizes: Sequence[int],
+    conditions: Sequence[str],
+    additional_services: Sequence[Sequence[str]],
+) -> List[Dict]:
+    """Price many configurations in one pass; element i equals calculate_quote(services[i], ...)
+
+    Sizes must stay within MAX_BATCH_PROPERTY_SIZE so every intermediate
+    value is an exactly representable float64.
+    """
+    n = len(sizes)
+    if n == 0:
+        return []
+
+    # Resolve the rules once per distinct combination, then gather per row
+    rule_ids: Dict[Tuple, int] = {}
+    row_rule_ids = [
+        rule_ids.setdefault(key, len(rule_ids))
+        for key in zip(services, conditions, map(tuple, additional_services))
+    ]
+    rules = [_rule_row(*key) for key in rule_ids]
+    row_rule = np.array(row_rule_ids, dtype=np.intp)
+
+    base_table = np.array([rule[0] for rule in rules], dtype=np.float64)
+    hourly = np.array([rule[1] for rule in rules], dtype=bool)[row_rule]
+    multiplier = np.array([rule[2] for rule in rules], dtype=np.float64)[row_rule]
+    per_m2_counts = np.array([rule[3] for rule in rules], dtype=np.float64)[row_rule]
+    fixed_cost = np.array([rule[4] for rule in rules], dtype=np.float64)[row_rule]
+
+    size = np.array(sizes, dtype=np.float64)
+    tier_index = np.searchsorted(np.array(TIER_UPPER_BOUNDS, dtype=np.float64), size, side="left")
+    base = base_table[row_rule, tier_index]
+    effective_size = np.where(hourly, np.maximum(size, 1.0), size)
+
+    service_total = np.trunc(base * effective_size * multiplier)
+    additional = (per_m2_counts * np.trunc(size[:, None] * _PER_M2_PRICES[None, :])).sum(axis=1) + fixed_cost
+    estimated = service_total + additional
+
+    # Back to Python objects; prices come from the config so ints stay ints in JSON
+    results = []
+    for rule_id, tier, condition, property_size, estimated_price, additional_cost in zip(
+        row_rule_ids, tier_index.tolist(), conditions, sizes, estimated.tolist(), additional.tolist()
+    ):
+        base_prices, tier_infos = rules[rule_id][0], rules[rule_id][5]
+        tier_info = dict(tier_infos[tier]) if tier_infos[tier] is not None else None
+        results.append({
+            "estimated_price": int(estimated_price),
+            "base_price_per_unit": base_prices[tier],
+            "property_size": property_size,
+            "condition_multiplier": CONDITION_MULTIPLIERS.get(condition, 1.0),
+            "additional_services_cost": int(additional_cost),
+            "tier_info": tier_info,
+        })
+    return results
@@ -0,0 +1,258 @@
+"""
+Opt-in sampling profiler for SeknuTo.cz requests
+
+A background thread wakes every `interval` seconds and records the stack
+of each asyncio task registered with it: the live stack of the event
+loop thread while the task is running, or the chain of suspended
+coroutines (ending in "[await]") while it waits on Mongo, Resend or a
+worker pool. Profiles are therefore wall-clock and show where a slow
+request spends its time, not only its CPU. Stacks are kept in the
+folded format ("frame;frame;frame count" per line) that flamegraph.pl,
+speedscope and inferno read directly. Work handed off to executor
+threads shows up as the awaiting frame, not as the thread's own stack.
+
+ProfilingMiddleware profiles a request when `on_demand` is switched on
+and it carries `X-Profile: 1` together with the admin token, and a
+random `continuous_rate` fraction of requests to `continuous_routes`,
+aggregated per route. The middleware is only installed when one of the
+two is enabled (an admin token alone does not enable it), and the
+sampler thread sleeps on an event while nothing is registered.
+"""
+import asyncio
+import hmac
+import random
+import sys
+import threading
+import time
+import uuid
+from collections import Counter, OrderedDict
+from pathlib import Path
+from types import FrameType
+from typing import Dict, Iterable, List, Optional
+
+AWAIT_FRAME = "[await]"
+
+
+def _label(frame: FrameType) -> str:
+    code = frame.f_code
+    return f"{Path(code.co_filename).name}:{code.co_name}"
+
+
+def _await_chain(coro) -> List[FrameType]:
+    """Frames of a suspended coroutine and everything it awaits, outermost first"""
+    frames = []
+    while coro is not None:
+        frame = getattr(coro, "cr_frame", None) or getattr(coro, "gi_frame", None) or getattr(coro, "ag_frame", None)
+        if frame is None:
+            break
+        frames.append(frame)
+        coro = getattr(coro, "cr_await", None) or getattr(coro, "gi_yieldfrom", None) or getattr(coro, "ag_await", None)
+    return frames
+
+
+def _thread_stack(frame: Optional[FrameType], root: Optional[FrameType]) -> List[FrameType]:
+    """Live stack of a thread, outermost first, starting at `root` when it is on the stack"""
+    frames = []
+    while frame is not None:
+        frames.append(frame)
+        if frame is root:
+            break
+        frame = frame.f_back
+    frames.reverse()
+    return frames
+
+
+class Profile:
+    """Folded stack samples of one request, or of all sampled requests to one route"""
+
+    def __init__(self, profile_id: str, route: str, interval: float, continuous: bool = False):
+        self.id = profile_id
+        self.route = route
+        self.interval = interval
+        self.continuous = continuous
+        self.started = time.time()
+        self.finished: Optional[float] = None
+        self.requests = 0
+        self.stacks: Counter = Counter()
+
+    def add(self, stack: str) -> None:
+        self.stacks[stack] += 1
+
+    def folded(self) -> str:
+        return "".join(f"{stack} {count}\n" for stack, count in self.stacks.most_common())
+
+    def summary(self) -> Dict:
+        return {
+            "id": self.id,
+            "route": self.route,
+            "continuous": self.continuous,
+            "requests": self.requests,
+            "samples": sum(self.stacks.values()),
+            "interval_ms": self.interval * 1000,
+            "started": self.started,
+            "finished": self.finished,
+        }
+
+
+class TaskSampler:
+    """Background thread sampling the stacks of registered asyncio tasks"""
+
+    def __init__(self, interval: float = 0.005):
+        self.interval = interval
+        self._targets: Dict[asyncio.Task, Profile] = {}
+        self._wake = threading.Event()
+        self._stopping = False
+        self._thread: Optional[threading.Thread] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._loop_thread: Optional[int] = None
+        self.samples = 0
+
+    def start(self) -> None:
+        """Sample tasks of the running event loop, starting the thread if needed; call from the loop"""
+        self._loop = asyncio.get_running_loop()
+        self._loop_thread = threading.get_ident()
+        if self._thread is not None:
+            return
+        self._stopping = False
+        self._thread = threading.Thread(target=self._run, name="profiler", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        if self._thread is None:
+            return
+        self._stopping = True
+        self._wake.set()
+        self._thread.join()
+        self._thread = None
+
+    def add(self, task: asyncio.Task, profile: Profile) -> None:
+        self._targets[task] = profile
+        self._wake.set()
+
+    def remove(self, task: asyncio.Task) -> None:
+        self._targets.pop(task, None)
+
+    def _run(self) -> None:
+        while not self._stopping:
+            if not self._targets:
+                # Idle: block until a task is registered instead of polling
+                self._wake.wait()
+                self._wake.clear()
+                continue
+            time.sleep(self.interval)
+            self.sample()
+
+    def sample(self) -> None:
+        """Record one stack for every registered task"""
+        targets = list(self._targets.items())
+        if not targets:
+            return
+        running = asyncio.current_task(self._loop)
+        loop_frame = sys._current_frames().get(self._loop_thread)
+        for task, profile in targets:
+            root = task.get_coro()
+            if task is running:
+                frames = _thread_stack(loop_frame, getattr(root, "cr_frame", None))
+                leaf = ()
+            else:
+                frames = _await_chain(root)
+                leaf = (AWAIT_FRAME,)
+            if frames:
+                profile.add(";".join([_label(frame) for frame in frames] + list(leaf)))
+                self.samples += 1
+
+
+class Profiler:
+    """Decides which requests to profile and keeps the finished profiles"""
+
+    def __init__(
+        self,
+        *,
+        admin_token: str = "",
+        on_demand: bool = False,
+        interval: float = 0.005,
+        continuous_rate: float = 0.0,
+        continuous_routes: Iterable[str] = (),
+        max_profiles: int = 50,
+    ):
+        self.admin_token = admin_token
+        self.on_demand = on_demand
+        self.continuous_rate = continuous_rate
+        self.continuous_routes = frozenset(continuous_routes)
+        self.max_profiles = max_profiles
+        self.sampler = TaskSampler(interval)
+        self._profiles: "OrderedDict[str, Profile]" = OrderedDict()
+        self._continuous: Dict[str, Profile] = {}
+
+    @property
+    def enabled(self) -> bool:
+        return (self.on_demand and bool(self.admin_token)) or (self.continuous_rate > 0 and bool(self.continuous_routes))
+
+    def is_admin(self, token: Optional[str]) -> bool:
+        return bool(self.admin_token) and token is not None and hmac.compare_digest(token.encode(), self.admin_token.encode())
+
+    def profile_for(self, method: str, path: str, headers: Dict[bytes, bytes]) -> Optional[Profile]:
+        """The profile this request should be sampled into, or None"""
+        route = f"{method} {path}"
+        if self.on_demand and headers.get(b"x-profile") == b"1" and self.is_admin(headers.get(b"x-admin-token", b"").decode("latin-1")):
+            profile = Profile(uuid.uuid4().hex[:12], route, self.sampler.interval)
+            self._profiles[profile.id] = profile
+            while len(self._profiles) > self.max_profiles:
+                self._profiles.popitem(last=False)
+            return profile
+        if route in self.continuous_routes and random.random() < self.continuous_rate:
+            profile = self._continuous.get(route)
+            if profile is None:
+                profile_id = "-".join(["continuous", *route.lower().replace("/", " ").split()])
+                profile = self._continuous[route] = Profile(profile_id, route, self.sampler.interval, continuous=True)
+            return profile
+        return None
+
+    def get(self, profile_id: str) -> Optional[Profile]:
+        profile = self._profiles.get(profile_id)
+        if profile is None:
+            profile = next((p for p in self._continuous.values() if p.id == profile_id), None)
+        return profile
+
+    def summaries(self) -> List[Dict]:
+        return [p.summary() for p in self._continuous.values()] + [p.summary() for p in reversed(self._profiles.values())]
+
+    def stats(self) -> Dict:
+        return {
+            "enabled": self.enabled,
+            "stored": len(self._profiles),
+            "continuous_routes": sorted(self.continuous_routes) if self.continuous_rate > 0 else [],
+            "samples": self.sampler.samples,
+        }
+
+
+class ProfilingMiddleware:
+    """ASGI middleware running selected requests under the Profiler's sampler"""
+
+    def __init__(self, app, profiler: Profiler):
+        self.app = app
+        self.profiler = profiler
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        profile = self.profiler.profile_for(scope["method"], scope["path"], dict(scope["headers"]))
+        if profile is None:
+            await self.app(scope, receive, send)
+            return
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start" and not profile.continuous:
+                message["headers"] = list(message.get("headers", [])) + [(b"x-profile-id", profile.id.encode())]
+            await send(message)
+
+        task = asyncio.current_task()
+        profile.requests += 1
+        self.profiler.sampler.start()
+        self.profiler.sampler.add(task, profile)
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            self.profiler.sampler.remove(task)
+            profile.finished = time.time()
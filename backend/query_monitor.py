@@ -0,0 +1,215 @@
+"""
+MongoDB command monitoring for SeknuTo.cz
+
+CommandMonitor is a pymongo CommandListener registered on the Motor
+client. Every CRUD command is timed per collection and operation into
+Prometheus metrics. Commands slower than `slow_threshold` are logged
+with their filter shape: values replaced by "?", operators and field
+names kept, so no customer data ends up in the log. The first time a
+new filter shape is seen it is explained once in the background, and
+shapes whose winning plan is a COLLSCAN are logged, listed in stats()
+and counted on every later execution. An unindexed lookup is caught
+the first time it runs, even while the collection is small and fast.
+
+pymongo calls the listener on Motor's worker threads, so the listener
+only stashes the event and hands the recording to the event loop.
+"""
+import asyncio
+import logging
+import threading
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+import orjson
+from pymongo import monitoring
+
+from db_indexes import explain_stages
+from metrics import Registry
+
+logger = logging.getLogger(__name__)
+
+# command name -> where its filter lives (None: the command has no filter)
+MONITORED_COMMANDS: Dict[str, Optional[Tuple[str, ...]]] = {
+    "find": ("filter",),
+    "count": ("query",),
+    "distinct": ("query",),
+    "findAndModify": ("query",),
+    "update": ("updates", 0, "q"),
+    "delete": ("deletes", 0, "q"),
+    "aggregate": ("pipeline", 0, "$match"),
+    "insert": None,
+    "getMore": None,
+}
+
+PENDING = "pending"
+
+
+def filter_shape(value: Any) -> Any:
+    """The filter with every value replaced by "?" (operators and field names kept)"""
+    if isinstance(value, dict):
+        return {key: filter_shape(item) for key, item in value.items()}
+    if isinstance(value, (list, tuple)) and value and all(isinstance(item, dict) for item in value):
+        return [filter_shape(item) for item in value]  # $or / $and branches
+    return "?"
+
+
+def _dig(document: Any, path: Tuple) -> Optional[Dict[str, Any]]:
+    for step in path:
+        try:
+            document = document[step]
+        except (KeyError, IndexError, TypeError):
+            return None
+    return document if isinstance(document, dict) else None
+
+
+class CommandMonitor(monitoring.CommandListener):
+    """Command latency metrics, slow-command log and COLLSCAN detection"""
+
+    def __init__(
+        self,
+        *,
+        slow_threshold: float = 0.1,
+        explain_shapes: bool = True,
+        max_shapes: int = 1000,
+        registry: Optional[Registry] = None,
+    ):
+        self.slow_threshold = slow_threshold
+        self.explain_shapes = explain_shapes
+        self.max_shapes = max_shapes
+        self._inflight: Dict[Tuple[Any, int], Tuple[str, str, Optional[Dict[str, Any]]]] = {}
+        self._plans: Dict[Tuple[str, str, str], Any] = {}
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._loop_thread: Optional[int] = None
+        self._db = None
+        self._explains: Set[asyncio.Task] = set()
+        self.commands = 0
+        self.slow = 0
+        self.errors = 0
+
+        registry = registry if registry is not None else Registry()
+        self.latency = registry.histogram(
+            "seknuto_mongo_command_duration_seconds", "MongoDB command latency by collection and command",
+            ("collection", "command"),
+        )
+        self.slow_commands = registry.counter(
+            "seknuto_mongo_slow_commands_total", "MongoDB commands over the slow-query threshold",
+            ("collection", "command"),
+        )
+        self.failures = registry.counter(
+            "seknuto_mongo_command_failures_total", "MongoDB commands that returned an error",
+            ("collection", "command"),
+        )
+        self.collscans = registry.counter(
+            "seknuto_mongo_collscan_commands_total", "MongoDB commands whose filter shape is planned as a COLLSCAN",
+            ("collection", "command"),
+        )
+
+    def start(self, db) -> None:
+        """Record on the running loop from now on and explain new shapes against `db`"""
+        self._loop = asyncio.get_running_loop()
+        self._loop_thread = threading.get_ident()
+        self._db = db
+
+    # ---------- pymongo listener callbacks (any thread) ----------
+
+    def started(self, event) -> None:
+        path = MONITORED_COMMANDS.get(event.command_name, ())
+        if path == ():
+            return  # handshake, explain, index management, ...
+        command = event.command
+        collection = command.get("collection") if event.command_name == "getMore" else command.get(event.command_name)
+        query = _dig(command, path) if path else None
+        self._inflight[(event.connection_id, event.request_id)] = (str(collection), event.command_name, query)
+
+    def succeeded(self, event) -> None:
+        entry = self._inflight.pop((event.connection_id, event.request_id), None)
+        if entry is not None:
+            self._dispatch(entry, event.duration_micros / 1e6, False)
+
+    def failed(self, event) -> None:
+        entry = self._inflight.pop((event.connection_id, event.request_id), None)
+        if entry is not None:
+            self._dispatch(entry, event.duration_micros / 1e6, True)
+
+    def _dispatch(self, entry, duration: float, failed: bool) -> None:
+        loop = self._loop
+        if loop is None or threading.get_ident() == self._loop_thread:
+            self.record(entry, duration, failed)
+            return
+        try:
+            loop.call_soon_threadsafe(self.record, entry, duration, failed)
+        except RuntimeError:
+            pass  # loop closed during shutdown
+
+    # ---------- recording (event loop) ----------
+
+    def record(self, entry: Tuple[str, str, Optional[Dict[str, Any]]], duration: float, failed: bool) -> None:
+        collection, command, query = entry
+        self.commands += 1
+        self.latency.observe(duration, collection, command)
+        if failed:
+            self.errors += 1
+            self.failures.inc(collection, command)
+        if query is None:
+            if duration >= self.slow_threshold:
+                self._log_slow(collection, command, None, duration)
+            return
+
+        shape = orjson.dumps(filter_shape(query), option=orjson.OPT_SORT_KEYS).decode()
+        key = (collection, command, shape)
+        if duration >= self.slow_threshold:
+            self._log_slow(collection, command, shape, duration)
+        plan = self._plans.get(key)
+        if plan is None:
+            self._explain_later(key, query)
+        elif plan != PENDING and "COLLSCAN" in plan:
+            self.collscans.inc(collection, command)
+
+    def _log_slow(self, collection: str, command: str, shape: Optional[str], duration: float) -> None:
+        self.slow += 1
+        self.slow_commands.inc(collection, command)
+        plan = self._plans.get((collection, command, shape)) if shape else None
+        logger.warning(
+            "Slow MongoDB %s on %s: %.1f ms, filter %s%s",
+            command, collection, duration * 1000, shape or "-",
+            " (COLLSCAN)" if plan and plan != PENDING and "COLLSCAN" in plan else "",
+        )
+
+    def _explain_later(self, key: Tuple[str, str, str], query: Dict[str, Any]) -> None:
+        if not self.explain_shapes or self._db is None or key[1] == "aggregate" or len(self._plans) >= self.max_shapes:
+            return
+        self._plans[key] = PENDING
+        task = asyncio.get_running_loop().create_task(self._explain(key, query))
+        self._explains.add(task)
+        task.add_done_callback(self._explains.discard)
+
+    async def _explain(self, key: Tuple[str, str, str], query: Dict[str, Any]) -> None:
+        collection, command, shape = key
+        try:
+            stages = await explain_stages(self._db, collection, query)
+        except Exception as e:
+            logger.debug("Could not explain %s on %s: %s", command, collection, e)
+            self._plans[key] = []
+            return
+        self._plans[key] = stages
+        if "COLLSCAN" in stages:
+            self.collscans.inc(collection, command)
+            logger.warning(
+                "MongoDB %s on %s with filter %s uses COLLSCAN: %s", command, collection, shape, " <- ".join(stages)
+            )
+
+    def collscan_shapes(self) -> List[str]:
+        return sorted(
+            f"{collection}.{command} {shape}"
+            for (collection, command, shape), plan in self._plans.items()
+            if plan != PENDING and "COLLSCAN" in plan
+        )
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "commands": self.commands,
+            "slow": self.slow,
+            "errors": self.errors,
+            "slow_threshold_ms": self.slow_threshold * 1000,
+            "shapes": len(self._plans),
+            "collscan": self.collscan_shapes(),
+        }
@@ -0,0 +1,146 @@
+"""
+Async Resend API client for SeknuTo.cz
+
+Talks to the Resend REST API through one pooled keep-alive
+httpx.AsyncClient instead of running the synchronous SDK in worker
+threads, so concurrent emails share connections. Every call goes through
+a circuit breaker and an adaptive concurrency limit (see resilience.py)
+and is bounded by an overall timeout, so an unhealthy Resend fails calls
+fast instead of tying up requests.
+"""
+import asyncio
+from typing import Any, Dict, List, Optional
+
+import httpx
+
+from metrics import span
+from resilience import AIMDLimiter, CircuitBreaker
+
+DEFAULT_API_URL = "https://api.resend.com"
+
+
+class ResendAPIError(Exception):
+    """Non-2xx answer from the Resend API"""
+
+    def __init__(self, code: int, message: str, error_type: str = ""):
+        super().__init__(message)
+        self.code = code
+        self.message = message
+        self.error_type = error_type
+
+
+def _is_overload(status_code: int) -> bool:
+    return status_code == 429 or status_code >= 500
+
+
+class AsyncResendClient:
+    """Minimal async Resend client sharing one connection pool"""
+
+    def __init__(
+        self,
+        api_key: str,
+        base_url: str = DEFAULT_API_URL,
+        *,
+        max_connections: int = 10,
+        max_keepalive_connections: int = 10,
+        keepalive_expiry: float = 30.0,
+        timeout: float = 10.0,
+        connect_timeout: float = 5.0,
+        call_timeout: float = 15.0,
+        failure_threshold: int = 5,
+        reset_timeout: float = 30.0,
+    ):
+        self.api_key = api_key
+        self.base_url = base_url.rstrip("/")
+        self.limits = httpx.Limits(
+            max_connections=max_connections,
+            max_keepalive_connections=max_keepalive_connections,
+            keepalive_expiry=keepalive_expiry,
+        )
+        self.timeout = httpx.Timeout(timeout, connect=connect_timeout)
+        self.call_timeout = call_timeout
+        self._http: Optional[httpx.AsyncClient] = None
+        self.breaker = CircuitBreaker("resend", failure_threshold=failure_threshold, reset_timeout=reset_timeout)
+        # Queue callers here rather than inside httpcore, whose pool rescans
+        # every waiting request on each connection release; the limit adapts
+        # between 1 and the pool size
+        self.limiter = AIMDLimiter(initial=max_connections, max_limit=max_connections)
+
+    @property
+    def http(self) -> httpx.AsyncClient:
+        if self._http is None or self._http.is_closed:
+            self._http = httpx.AsyncClient(
+                base_url=self.base_url,
+                limits=self.limits,
+                timeout=self.timeout,
+                headers={
+                    "Authorization": f"Bearer {self.api_key}",
+                    "Accept": "application/json",
+                    "User-Agent": "seknuto-backend",
+                },
+            )
+        return self._http
+
+    async def close(self) -> None:
+        if self._http is not None:
+            await self._http.aclose()
+            self._http = None
+
+    async def _post(self, operation: str, path: str, payload: Any, headers: Optional[Dict[str, str]] = None) -> Any:
+        self.breaker.before_call()
+        try:
+            await self.limiter.acquire()
+        except BaseException:
+            self.breaker.record_cancelled()
+            raise
+        healthy = None
+        try:
+            with span(f"resend.{operation}"):
+                response = await asyncio.wait_for(self.http.post(path, json=payload, headers=headers), self.call_timeout)
+            # Rate limiting and 5xx mean Resend is struggling; other 4xx are our problem
+            healthy = not _is_overload(response.status_code)
+        except (httpx.TransportError, asyncio.TimeoutError):
+            healthy = False
+            raise
+        finally:
+            self.limiter.release(healthy)
+            if healthy is None:
+                self.breaker.record_cancelled()
+            elif healthy:
+                self.breaker.record_success()
+            else:
+                self.breaker.record_failure()
+        if response.status_code >= 400:
+            try:
+                body = response.json()
+            except ValueError:
+                body = {}
+            raise ResendAPIError(
+                response.status_code,
+                body.get("message") or response.text or response.reason_phrase,
+                body.get("name", ""),
+            )
+        return response.json()
+
+    async def send_email(self, params: Dict[str, Any]) -> Dict[str, Any]:
+        """POST /emails"""
+        return await self._post("send_email", "/emails", params)
+
+    async def send_batch(self, messages: List[Dict[str, Any]], *, permissive: bool = False) -> Dict[str, Any]:
+        """POST /emails/batch (up to 100 messages)
+
+        In permissive mode invalid messages are reported in `errors` by index
+        instead of rejecting the whole batch.
+        """
+        headers = {"x-batch-validation": "permissive"} if permissive else None
+        return await self._post("send_batch", "/emails/batch", messages, headers)
+
+    async def create_contact(self, params: Dict[str, Any]) -> Dict[str, Any]:
+        """POST /contacts, or the audience-scoped endpoint when audience_id is given"""
+        params = dict(params)
+        audience_id = params.pop("audience_id", None)
+        path = f"/audiences/{audience_id}/contacts" if audience_id else "/contacts"
+        return await self._post("create_contact", path, params)
+
+    def stats(self) -> Dict[str, Any]:
+        return {"circuit": self.breaker.stats(), "concurrency": self.limiter.stats()}
@@ -0,0 +1,156 @@
+"""
+Local stand-in for the Resend API
+
+Accepts the endpoints the backend uses, answers like Resend does and
+counts requests and TCP connections, so email throughput can be tested
+and benchmarked offline. Latency and error rate can be injected.
+
+    python resend_stub.py --port 8025 --latency 0.05
+    RESEND_API_URL=http://127.0.0.1:8025 uvicorn server:app
+"""
+import argparse
+import asyncio
+import random
+import socket
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from typing import Optional
+
+import uvicorn
+from starlette.applications import Starlette
+from starlette.requests import Request
+from starlette.responses import JSONResponse
+from starlette.routing import Route
+
+
+class StubState:
+    """Counters and fault injection settings shared by the stub routes"""
+
+    def __init__(self, latency: float = 0.0, error_rate: float = 0.0, error_status: int = 500):
+        self.latency = latency
+        self.error_rate = error_rate
+        self.error_status = error_status
+        self.requests = 0
+        self.emails = 0
+        self.batches = 0
+        self.contacts = 0
+        self.errors = 0
+        self.connections = set()
+        self.paths = []
+        self.contact_emails = set()
+
+    def stats(self) -> dict:
+        return {
+            "requests": self.requests,
+            "emails": self.emails,
+            "batches": self.batches,
+            "contacts": self.contacts,
+            "errors": self.errors,
+            "connections": len(self.connections),
+        }
+
+
+def create_stub_app(state: Optional[StubState] = None) -> Starlette:
+    state = state or StubState()
+
+    def endpoint(handler):
+        async def route(request: Request):
+            return await handle(request, handler)
+        return route
+
+    async def handle(request: Request, handler):
+        state.requests += 1
+        state.paths.append(request.url.path)
+        if request.client:
+            state.connections.add((request.client.host, request.client.port))
+        if not request.headers.get("authorization", "").startswith("Bearer "):
+            return JSONResponse({"statusCode": 401, "name": "missing_api_key", "message": "Missing API key"}, 401)
+        if state.latency:
+            await asyncio.sleep(state.latency)
+        if state.error_rate and random.random() < state.error_rate:
+            state.errors += 1
+            return JSONResponse(
+                {"statusCode": state.error_status, "name": "internal_server_error", "message": "Injected failure"},
+                state.error_status,
+            )
+        return await handler(await request.json(), request)
+
+    async def send_email(payload, request):
+        state.emails += 1
+        return JSONResponse({"id": str(uuid.uuid4())})
+
+    async def send_batch(payload, request):
+        permissive = request.headers.get("x-batch-validation") == "permissive"
+        data, errors = [], []
+        for index, message in enumerate(payload):
+            if not message.get("to"):
+                errors.append({"index": index, "message": "The `to` field is missing."})
+            else:
+                data.append({"id": str(uuid.uuid4())})
+        if errors and not permissive:
+            return JSONResponse({"statusCode": 422, "name": "validation_error", "message": errors[0]["message"]}, 422)
+        state.batches += 1
+        state.emails += len(data)
+        return JSONResponse({"data": data, "errors": errors} if permissive else {"data": data})
+
+    async def create_contact(payload, request):
+        email = payload.get("email", "")
+        if email in state.contact_emails:
+            return JSONResponse({"statusCode": 409, "name": "conflict", "message": "Contact already exists"}, 409)
+        state.contact_emails.add(email)
+        state.contacts += 1
+        return JSONResponse({"object": "contact", "id": str(uuid.uuid4())})
+
+    async def stats(request: Request):
+        return JSONResponse(state.stats())
+
+    app = Starlette(routes=[
+        Route("/emails", endpoint(send_email), methods=["POST"]),
+        Route("/emails/batch", endpoint(send_batch), methods=["POST"]),
+        Route("/contacts", endpoint(create_contact), methods=["POST"]),
+        Route("/audiences/{audience_id}/contacts", endpoint(create_contact), methods=["POST"]),
+        Route("/_stats", stats, methods=["GET"]),
+    ])
+    app.state.stub = state
+    return app
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+@contextmanager
+def run_stub(state: Optional[StubState] = None, port: Optional[int] = None):
+    """Serve the stub on a background thread; yields (base_url, state)"""
+    state = state or StubState()
+    port = port or _free_port()
+    config = uvicorn.Config(create_stub_app(state), host="127.0.0.1", port=port, log_level="warning")
+    server = uvicorn.Server(config)
+    thread = threading.Thread(target=server.run, daemon=True)
+    thread.start()
+    deadline = time.monotonic() + 10
+    while not server.started:
+        if time.monotonic() > deadline:
+            raise RuntimeError("Resend stub did not start")
+        time.sleep(0.01)
+    try:
+        yield f"http://127.0.0.1:{port}", state
+    finally:
+        server.should_exit = True
+        thread.join(timeout=5)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Local Resend API stub")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8025)
+    parser.add_argument("--latency", type=float, default=0.0, help="seconds added to every response")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="fraction of requests answered with an error")
+    parser.add_argument("--error-status", type=int, default=500)
+    args = parser.parse_args()
+    stub_state = StubState(args.latency, args.error_rate, args.error_status)
+    uvicorn.run(create_stub_app(stub_state), host=args.host, port=args.port)
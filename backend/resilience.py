@@ -0,0 +1,147 @@
+"""
+Failure isolation for outbound calls (Resend)
+
+CircuitBreaker stops calling a dependency that keeps failing: after
+`failure_threshold` consecutive failures it opens and rejects calls
+immediately, after `reset_timeout` it lets a few probe calls through
+(half-open) and closes again once one succeeds.
+
+AIMDLimiter caps concurrent calls with a limit that adapts like TCP
+congestion control: every success raises it additively (about +1 per
+`limit` successes), every timeout or overload error cuts it
+multiplicatively, so a slow dependency gets fewer parallel requests
+instead of a growing pile of waiting ones.
+"""
+import asyncio
+import time
+from collections import deque
+from typing import Deque, Dict, Optional
+
+STATE_CLOSED = "closed"
+STATE_OPEN = "open"
+STATE_HALF_OPEN = "half_open"
+
+
+class CircuitOpenError(Exception):
+    """Call rejected without being attempted because the circuit is open"""
+    code = 503
+
+    def __init__(self, name: str, retry_after: float):
+        super().__init__(f"Circuit '{name}' is open, retry in {retry_after:.1f}s")
+        self.retry_after = retry_after
+
+
+class CircuitBreaker:
+    """Consecutive-failure circuit breaker with half-open probing"""
+
+    def __init__(self, name: str, *, failure_threshold: int = 5, reset_timeout: float = 30.0, half_open_max_calls: int = 1):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.half_open_max_calls = half_open_max_calls
+        self.state = STATE_CLOSED
+        self._failures = 0
+        self._opened_at = 0.0
+        self._probes = 0
+        self.rejected = 0
+        self.opened = 0
+
+    def before_call(self) -> None:
+        """Raise CircuitOpenError unless a call may go through now"""
+        if self.state == STATE_OPEN:
+            retry_after = self._opened_at + self.reset_timeout - time.monotonic()
+            if retry_after > 0:
+                self.rejected += 1
+                raise CircuitOpenError(self.name, retry_after)
+            self.state = STATE_HALF_OPEN
+            self._probes = 0
+        if self.state == STATE_HALF_OPEN:
+            if self._probes >= self.half_open_max_calls:
+                self.rejected += 1
+                raise CircuitOpenError(self.name, 0.0)
+            self._probes += 1
+
+    def record_success(self) -> None:
+        self._failures = 0
+        self.state = STATE_CLOSED
+
+    def record_cancelled(self) -> None:
+        """The call was admitted but never completed; free its probe slot"""
+        if self.state == STATE_HALF_OPEN and self._probes:
+            self._probes -= 1
+
+    def record_failure(self) -> None:
+        self._failures += 1
+        if self.state == STATE_HALF_OPEN or self._failures >= self.failure_threshold:
+            if self.state != STATE_OPEN:
+                self.opened += 1
+            self.state = STATE_OPEN
+            self._opened_at = time.monotonic()
+
+    def stats(self) -> Dict[str, object]:
+        return {
+            "state": self.state,
+            "consecutive_failures": self._failures,
+            "opened": self.opened,
+            "rejected": self.rejected,
+        }
+
+
+class AIMDLimiter:
+    """Adaptive concurrency limit: additive increase, multiplicative decrease"""
+
+    def __init__(self, *, initial: int = 10, min_limit: int = 1, max_limit: int = 100, backoff_ratio: float = 0.5):
+        self.min_limit = min_limit
+        self.max_limit = max_limit
+        self.backoff_ratio = backoff_ratio
+        self._limit = float(min(max(initial, min_limit), max_limit))
+        self._inflight = 0
+        self._waiters: Deque[asyncio.Future] = deque()
+        self.successes = 0
+        self.drops = 0
+
+    @property
+    def limit(self) -> int:
+        return int(self._limit)
+
+    async def acquire(self) -> None:
+        if self._inflight < self.limit and not self._waiters:
+            self._inflight += 1
+            return
+        future = asyncio.get_running_loop().create_future()
+        self._waiters.append(future)
+        try:
+            await future
+        except asyncio.CancelledError:
+            if future.done() and not future.cancelled():
+                self._release_slot()  # woken and cancelled in the same step
+            else:
+                self._waiters.remove(future)
+            raise
+
+    def release(self, success: Optional[bool] = None) -> None:
+        """Free a slot; success=True grows the limit, False shrinks it, None leaves it"""
+        if success is True:
+            self.successes += 1
+            self._limit = min(self.max_limit, self._limit + 1 / self._limit)
+        elif success is False:
+            self.drops += 1
+            self._limit = max(self.min_limit, self._limit * self.backoff_ratio)
+        self._release_slot()
+
+    def _release_slot(self) -> None:
+        self._inflight -= 1
+        while self._waiters and self._inflight < self.limit:
+            future = self._waiters.popleft()
+            if not future.done():
+                self._inflight += 1
+                future.set_result(None)
+
+    def stats(self) -> Dict[str, object]:
+        return {
+            "limit": self.limit,
+            "inflight": self._inflight,
+            "waiting": len(self._waiters),
+            "successes": self.successes,
+            "drops": self.drops,
+        }
@@ -0,0 +1,37 @@
+"""
+Retry scheduling for the Mongo-backed background queues
+
+The email outbox and the Resend contact registry both lease an entry,
+attempt it and, on failure, either put it back as pending after an
+exponential backoff with jitter or give up on it once it has used all
+its attempts. RetryPolicy holds that bookkeeping so both queues behave
+the same way.
+"""
+import random
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict
+
+STATUS_PENDING = "pending"
+STATUS_FAILED = "failed"
+
+
+class RetryPolicy:
+    def __init__(self, *, max_attempts: int = 6, base_delay: float = 2.0, max_delay: float = 300.0):
+        self.max_attempts = max_attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+
+    def backoff(self, attempts: int) -> float:
+        """Exponential backoff with jitter, capped at max_delay"""
+        delay = min(self.max_delay, self.base_delay * (2 ** (attempts - 1)))
+        return random.uniform(delay / 2, delay)
+
+    def failure_update(self, attempts: int, error: Exception, permanent: bool = False) -> Dict[str, Any]:
+        """$set for an entry whose `attempts`-th attempt failed: rescheduled, or failed when out of attempts"""
+        update: Dict[str, Any] = {"lease_expires_at": None, "last_error": str(error)}
+        if permanent or attempts >= self.max_attempts:
+            update["status"] = STATUS_FAILED
+        else:
+            update["status"] = STATUS_PENDING
+            update["next_attempt_at"] = datetime.now(timezone.utc) + timedelta(seconds=self.backoff(attempts))
+        return update
@@ -1,47 +1,183 @@
-from fastapi import FastAPI, APIRouter, HTTPException
+from fastapi import FastAPI, APIRouter, Depends, Header, HTTPException, Query, Response
+from fastapi.responses import ORJSONResponse
 from dotenv import load_dotenv
 from starlette.middleware.cors import CORSMiddleware
+from starlette.responses import StreamingResponse
 from motor.motor_asyncio import AsyncIOMotorClient
 import os
+import base64
+import binascii
+import hmac
+import json
 import logging
-import asyncio
 from pathlib import Path
 from pydantic import BaseModel, Field, EmailStr
 from typing import List, Optional
 import uuid
-from datetime import datetime, timezone
+from datetime import date, datetime, timedelta, timezone
+
+from db_indexes import check_query_plans, ensure_indexes
+from exports import EXPORT_FIELDS, stream_csv, stream_ndjson
+from availability import AvailabilityCache, bookable_dates
+from capacity import CapacityLimits, SlotCapacity, SlotFullError
+from coupons import CouponCache, CouponCodePool, CouponError, apply_discount, normalize_code, redeem_coupon, restore_coupon
+import transactions
+from subscriptions import SubscriptionStore
+from idempotency import IdempotencyStore
+from contacts import ContactRegistry, split_name
+from executors import BoundedExecutor, ExecutorSaturatedError
+from log_pipeline import LogPipeline
+from metrics import CONTENT_TYPE as METRICS_CONTENT_TYPE, REGISTRY as metrics_registry, MetricsMiddleware, span
+from profiling import Profiler, ProfilingMiddleware
+from query_monitor import CommandMonitor
+from pricing import MAX_BATCH_PROPERTY_SIZE, PricingEngine, calculate_quotes_batch
+from outbox import EmailOutbox, OutboxSweeper, PermanentDeliveryError, outbox_entry
+from resend_client import DEFAULT_API_URL, AsyncResendClient
+from email_batcher import EmailBatcher
+from email_templates import BookingEmailContext, ContactEmailContext, CouponEmailContext, EmailTemplates
 
 ROOT_DIR = Path(__file__).parent
 load_dotenv(ROOT_DIR / '.env')
 
-# MongoDB connection
+# MongoDB connection; every command is timed and slow ones are logged
+MONGO_SLOW_QUERY_MS = float(os.environ.get('MONGO_SLOW_QUERY_MS', '100'))
+MONGO_EXPLAIN_SHAPES = os.environ.get('MONGO_EXPLAIN_SHAPES', 'true').lower() == 'true'
+command_monitor = CommandMonitor(
+    slow_threshold=MONGO_SLOW_QUERY_MS / 1000,
+    explain_shapes=MONGO_EXPLAIN_SHAPES,
+    registry=metrics_registry,
+)
 mongo_url = os.environ['MONGO_URL']
-client = AsyncIOMotorClient(mongo_url)
+client = AsyncIOMotorClient(mongo_url, event_listeners=[command_monitor])
 db = client[os.environ['DB_NAME']]
+INDEX_PLAN_CHECK = os.environ.get('INDEX_PLAN_CHECK', 'true').lower() == 'true'
+BOOKINGS_PAGE_SIZE = int(os.environ.get('BOOKINGS_PAGE_SIZE', '100'))
+BOOKINGS_PAGE_MAX = int(os.environ.get('BOOKINGS_PAGE_MAX', '500'))
+EXPORT_BATCH_SIZE = int(os.environ.get('EXPORT_BATCH_SIZE', '1000'))
+EXPORT_BATCH_MAX = int(os.environ.get('EXPORT_BATCH_MAX', '10000'))
+PRICING_BATCH_MAX = int(os.environ.get('PRICING_BATCH_MAX', '5000'))
+PRICING_CACHE_SIZE = int(os.environ.get('PRICING_CACHE_SIZE', '4096'))
+CAPACITY_PER_DAY = int(os.environ.get('CAPACITY_PER_DAY', '6'))
+CAPACITY_PER_HALF_DAY = int(os.environ.get('CAPACITY_PER_HALF_DAY', '3'))
+AVAILABILITY_DAYS = int(os.environ.get('AVAILABILITY_DAYS', '30'))
+COUPON_POOL_SIZE = int(os.environ.get('COUPON_POOL_SIZE', '500'))
+COUPON_POOL_LOW_WATERMARK = int(os.environ.get('COUPON_POOL_LOW_WATERMARK', '100'))
+COUPON_CACHE_SIZE = int(os.environ.get('COUPON_CACHE_SIZE', '10000'))
+COUPON_CACHE_TTL = float(os.environ.get('COUPON_CACHE_TTL', '60'))  # sekundy
+COUPON_CACHE_NEGATIVE_TTL = float(os.environ.get('COUPON_CACHE_NEGATIVE_TTL', '10'))  # sekundy
+AVAILABILITY_MAX_AGE = int(os.environ.get('AVAILABILITY_MAX_AGE', '30'))  # sekundy
+IDEMPOTENCY_TTL = float(os.environ.get('IDEMPOTENCY_TTL', '86400'))  # sekundy
+PRICING_WORKERS = int(os.environ.get('PRICING_WORKERS', '2'))
+PRICING_QUEUE = int(os.environ.get('PRICING_QUEUE', '8'))
+IDEMPOTENCY_WAIT_TIMEOUT = float(os.environ.get('IDEMPOTENCY_WAIT_TIMEOUT', '10'))  # sekundy
+
+pricing_engine = PricingEngine(cache_size=PRICING_CACHE_SIZE)
+coupon_pool = CouponCodePool(db.coupons, size=COUPON_POOL_SIZE, low_watermark=COUPON_POOL_LOW_WATERMARK)
+subscriptions = SubscriptionStore(client, db, coupon_pool)
+coupon_cache = CouponCache(
+    max_size=COUPON_CACHE_SIZE,
+    ttl=COUPON_CACHE_TTL,
+    negative_ttl=COUPON_CACHE_NEGATIVE_TTL,
+)
+availability_cache = AvailabilityCache(ttl=AVAILABILITY_MAX_AGE)
+# Blocking work runs on dedicated bounded pools, not the loop's default executor.
+# Email templates render inline: a render takes tens of µs and would hold the GIL in a thread anyway.
+pricing_executor = BoundedExecutor("pricing", max_workers=PRICING_WORKERS, max_queue=PRICING_QUEUE)
+executors = (pricing_executor,)
+metrics_registry.gauge(
+    "seknuto_executor_pending", "Calls queued or running per executor", ("executor",),
+    collect=lambda: {(executor.name,): executor.stats()["pending"] for executor in executors},
+)
+idempotency = IdempotencyStore(db.idempotency_keys, ttl=IDEMPOTENCY_TTL, wait_timeout=IDEMPOTENCY_WAIT_TIMEOUT)
+slot_capacity = SlotCapacity(
+    db.slot_capacity,
+    CapacityLimits(per_day=CAPACITY_PER_DAY, per_half_day=CAPACITY_PER_HALF_DAY),
+    on_change=availability_cache.invalidate,
+)
 
 # Resend setup
-try:
-    import resend
-    RESEND_API_KEY = os.environ.get('RESEND_API_KEY', '')
-    if RESEND_API_KEY:
-        resend.api_key = RESEND_API_KEY
-except ImportError:
-    resend = None
+RESEND_API_KEY = os.environ.get('RESEND_API_KEY', '')
+RESEND_API_URL = os.environ.get('RESEND_API_URL', DEFAULT_API_URL)
+RESEND_MAX_CONNECTIONS = int(os.environ.get('RESEND_MAX_CONNECTIONS', '10'))
+RESEND_MAX_KEEPALIVE = int(os.environ.get('RESEND_MAX_KEEPALIVE', '10'))
+RESEND_TIMEOUT = float(os.environ.get('RESEND_TIMEOUT', '10'))
+RESEND_CALL_TIMEOUT = float(os.environ.get('RESEND_CALL_TIMEOUT', '15'))  # sekundy, celé volání
+RESEND_BREAKER_THRESHOLD = int(os.environ.get('RESEND_BREAKER_THRESHOLD', '5'))
+RESEND_BREAKER_RESET = float(os.environ.get('RESEND_BREAKER_RESET', '30'))  # sekundy
+EMAIL_BATCH_SIZE = int(os.environ.get('EMAIL_BATCH_SIZE', '50'))
+
+resend_client = AsyncResendClient(
+    RESEND_API_KEY,
+    RESEND_API_URL,
+    max_connections=RESEND_MAX_CONNECTIONS,
+    max_keepalive_connections=RESEND_MAX_KEEPALIVE,
+    timeout=RESEND_TIMEOUT,
+    call_timeout=RESEND_CALL_TIMEOUT,
+    failure_threshold=RESEND_BREAKER_THRESHOLD,
+    reset_timeout=RESEND_BREAKER_RESET,
+) if RESEND_API_KEY else None
+if resend_client:
+    metrics_registry.gauge(
+        "seknuto_resend_circuit_open", "1 while the Resend circuit breaker rejects calls",
+        collect=lambda: {(): int(resend_client.breaker.state != "closed")},
+    )
+    metrics_registry.gauge(
+        "seknuto_resend_concurrency_limit", "Current adaptive concurrency limit for Resend calls",
+        collect=lambda: {(): resend_client.limiter.limit},
+    )
+email_batcher = EmailBatcher(resend_client, max_batch=EMAIL_BATCH_SIZE) if resend_client else None
 
 SENDER_EMAIL = os.environ.get('SENDER_EMAIL', 'onboarding@resend.dev')
 ADMIN_EMAIL = os.environ.get('ADMIN_EMAIL', '')
 RESEND_AUDIENCE_ID = os.environ.get('RESEND_AUDIENCE_ID', '')  # Pro newsletter kontakty
 
-# Create the main app
-app = FastAPI()
+# Email outbox dispatcher
+OUTBOX_MAX_ATTEMPTS = int(os.environ.get('OUTBOX_MAX_ATTEMPTS', '6'))
+OUTBOX_POLL_INTERVAL = float(os.environ.get('OUTBOX_POLL_INTERVAL', '5'))
+OUTBOX_SWEEP_INTERVAL = float(os.environ.get('OUTBOX_SWEEP_INTERVAL', '60'))  # sekundy
+
+# Resend contact sync (deduplicated, batched in the background)
+CONTACT_SYNC_INTERVAL = float(os.environ.get('CONTACT_SYNC_INTERVAL', '30'))  # sekundy
+CONTACT_SYNC_BATCH = int(os.environ.get('CONTACT_SYNC_BATCH', '100'))
+
+# Admin-only endpoints and the opt-in sampling profiler
+ADMIN_API_TOKEN = os.environ.get('ADMIN_API_TOKEN', '')
+PROFILE_ENABLED = os.environ.get('PROFILE_ENABLED', 'false').lower() == 'true'  # X-Profile na vyžádání
+PROFILE_INTERVAL = float(os.environ.get('PROFILE_INTERVAL', '0.005'))  # sekundy mezi vzorky
+PROFILE_CONTINUOUS_RATE = float(os.environ.get('PROFILE_CONTINUOUS_RATE', '0'))  # podíl profilovaných požadavků
+PROFILE_ROUTES = [
+    route.strip() for route in
+    os.environ.get('PROFILE_ROUTES', 'POST /api/bookings,POST /api/pricing/calculate,POST /api/subscribe').split(',')
+    if route.strip()
+]
+PROFILE_MAX_STORED = int(os.environ.get('PROFILE_MAX_STORED', '50'))
+profiler = Profiler(
+    admin_token=ADMIN_API_TOKEN,
+    on_demand=PROFILE_ENABLED,
+    interval=PROFILE_INTERVAL,
+    continuous_rate=PROFILE_CONTINUOUS_RATE,
+    continuous_routes=PROFILE_ROUTES,
+    max_profiles=PROFILE_MAX_STORED,
+)
+
+# Create the main app; responses are serialized with orjson
+app = FastAPI(default_response_class=ORJSONResponse)
 
 # Create a router with the /api prefix
 api_router = APIRouter(prefix="/api")
 
-# Configure logging
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+# Configure logging: records go through a bounded queue to a writer thread
+LOG_LEVEL = os.environ.get('LOG_LEVEL', 'INFO').upper()
+LOG_FORMAT = os.environ.get('LOG_FORMAT', 'json')  # json | text
+LOG_QUEUE_SIZE = int(os.environ.get('LOG_QUEUE_SIZE', '10000'))
+log_pipeline = LogPipeline(
+    level=LOG_LEVEL,
+    json_format=LOG_FORMAT == 'json',
+    queue_size=LOG_QUEUE_SIZE,
+).install()
+metrics_registry.counter(
+    "seknuto_log_records_dropped_total", "Log records dropped because the log queue was full",
+    collect=lambda: {(): log_pipeline.handler.dropped},
 )
 logger = logging.getLogger(__name__)
 
@@ -91,6 +227,18 @@ class PriceCalculation(BaseModel):
     condition: str
     additional_services: List[str] = []
 
+class SizeRange(BaseModel):
+    service: str
+    condition: str = "normal"
+    additional_services: List[str] = []
+    size_from: int = Field(ge=0)
+    size_to: int = Field(ge=0)
+    step: int = Field(1, ge=1)
+
+class PriceBatchCalculation(BaseModel):
+    items: Optional[List[PriceCalculation]] = None
+    size_range: Optional[SizeRange] = None
+
 class ContactForm(BaseModel):
     name: str
     email: EmailStr
@@ -107,84 +255,7 @@ class CouponValidation(BaseModel):
 
 VALID_COUPONS = {}  # Will be populated dynamically
 
-def generate_coupon_code():
-    """Generate a unique coupon code"""
-    import random
-    import string
-    return 'SEKNU' + ''.join(random.choices(string.ascii_uppercase + string.digits, k=5))
-
-# ============== PRICING CONFIG ==============
-
-SERVICE_PRICES = {
-    # Sekání trávy (základní služby)
-    "lawn_mowing": 2,              # Kč/m² - bez hnojení
-    "lawn_with_fertilizer": 3.33,  # Kč/m² - s hnojením
-    "overgrown": 3.5,              # Kč/m² - přerostlá tráva (3-4 Kč)
-    
-    # Fixní ceny
-    "garden_work": 350,            # Zahradnické práce - 300-450 Kč/hod (průměr)
-    "debris_hourly": 400,          # Odvoz odpadu - 400 Kč/hod
-    
-    "other": 0
-}
-
-# Odstupňované ceny balíčků podle velikosti plochy
-PACKAGE_TIERED_PRICING = {
-    "spring_package": {  # Jarní balíček
-        "small": 12,     # do 200 m²
-        "medium": 10,    # 200-500 m²
-        "large": 8.5,    # 500+ m²
-    },
-    "summer_package": {  # Letní balíček (měsíčně)
-        "small": 4,
-        "medium": 3.5,
-        "large": 3,
-    },
-    "autumn_package": {  # Podzimní balíček
-        "small": 14,
-        "medium": 12,
-        "large": 10,
-    },
-    "winter_snow": {     # Zimní balíček
-        "small": 10,
-        "medium": 8,
-        "large": 8,
-    },
-    "vip_annual": {      # Celoroční VIP (roční cena za m²)
-        "small": 22,
-        "medium": 20,
-        "large": 18,
-    },
-}
-
-def get_size_tier(size):
-    """Determine pricing tier based on property size"""
-    if size <= 200:
-        return "small"
-    elif size <= 500:
-        return "medium"
-    else:
-        return "large"
-
-CONDITION_MULTIPLIERS = {
-    "normal": 1.0,
-    "overgrown": 1.5,
-    "very_neglected": 2.0
-}
-
-# Příplatky za m²
-ADDITIONAL_SERVICE_PRICES_PER_M2 = {
-    "mulching": 0.5,               # Mulčování +0,5 Kč/m²
-    "salting": 0.5,                # Solení +0,5 Kč/m²
-    "snow_clearing": 2,            # Dočištění sněhu 2 Kč/m²
-}
-
-# Fixní příplatky
-ADDITIONAL_SERVICE_PRICES = {
-    "debris_removal": 400,         # Odvoz odpadu - 400 Kč/hod
-    "vertikutace": 500,            # Vertikutace extra
-    "hnojeni": 200,                # Hnojení extra
-}
+# ============== SERVICE NAMES ==============
 
 SERVICE_NAMES_CZ = {
     "lawn_mowing": "Sekání trávy (bez hnojení)",
@@ -208,101 +279,128 @@ TIME_NAMES_CZ = {
 
 # ============== EMAIL TEMPLATES ==============
 
+email_templates = EmailTemplates()
+
 def get_customer_email_html(booking: Booking) -> str:
-    service_name = SERVICE_NAMES_CZ.get(booking.service, booking.service)
-    time_name = TIME_NAMES_CZ.get(booking.preferred_time, booking.preferred_time)
-    
-    return f"""
-    <!DOCTYPE html>
-    <html>
-    <head>
-        <meta charset="UTF-8">
-    </head>
-    <body style="font-family: Arial, sans-serif; line-height: 1.6; color: #222222; max-width: 600px; margin: 0 auto; padding: 20px;">
-        <div style="background: linear-gradient(135deg, #3FA34D, #2d7a38); padding: 30px; text-align: center; border-radius: 10px 10px 0 0;">
-            <h1 style="color: white; margin: 0; font-size: 28px;">✓ Potvrzení rezervace</h1>
-            <p style="color: rgba(255,255,255,0.9); margin: 10px 0 0;">SeknuTo.cz</p>
-        </div>
-        
-        <div style="background: #f8fff9; padding: 30px; border: 1px solid #e5e7eb; border-top: none;">
-            <p style="font-size: 16px;">Dobrý den <strong>{booking.customer_name}</strong>,</p>
-            <p>Děkujeme za rezervaci! Vaše objednávka byla úspěšně přijata.</p>
-            
-            <div style="background: white; padding: 20px; border-radius: 8px; margin: 20px 0; border: 1px solid #e5e7eb;">
-                <h3 style="color: #3FA34D; margin-top: 0;">📋 Detaily rezervace</h3>
-                <table style="width: 100%; border-collapse: collapse;">
-                    <tr><td style="padding: 8px 0; border-bottom: 1px solid #eee;"><strong>Služba:</strong></td><td style="padding: 8px 0; border-bottom: 1px solid #eee;">{service_name}</td></tr>
-                    <tr><td style="padding: 8px 0; border-bottom: 1px solid #eee;"><strong>Datum:</strong></td><td style="padding: 8px 0; border-bottom: 1px solid #eee;">{booking.preferred_date}</td></tr>
-                    <tr><td style="padding: 8px 0; border-bottom: 1px solid #eee;"><strong>Čas:</strong></td><td style="padding: 8px 0; border-bottom: 1px solid #eee;">{time_name}</td></tr>
-                    <tr><td style="padding: 8px 0; border-bottom: 1px solid #eee;"><strong>Adresa:</strong></td><td style="padding: 8px 0; border-bottom: 1px solid #eee;">{booking.property_address}</td></tr>
-                    <tr><td style="padding: 8px 0;"><strong>Odhadovaná cena:</strong></td><td style="padding: 8px 0; color: #3FA34D; font-weight: bold;">{booking.estimated_price} Kč</td></tr>
-                </table>
-            </div>
-            
-            <div style="background: #F0FDF4; padding: 15px; border-radius: 8px; margin: 20px 0;">
-                <h4 style="color: #166534; margin: 0 0 10px;">📞 Co dál?</h4>
-                <p style="margin: 0; color: #166534;">Brzy vás budeme kontaktovat na tel. <strong>{booking.customer_phone}</strong> pro finální potvrzení termínu.</p>
-            </div>
-            
-            <p style="margin-top: 20px;">Máte dotaz? Napište nám:</p>
-            <p>💬 WhatsApp: <a href="https://wa.me/420730588372" style="color: #3FA34D;">730 588 372</a><br>
-            📧 Email: info@seknuto.cz</p>
-        </div>
-        
-        <div style="background: #222222; padding: 20px; text-align: center; border-radius: 0 0 10px 10px;">
-            <p style="color: white; margin: 0;">S pozdravem,<br><strong>Tým SeknuTo.cz</strong></p>
-            <p style="color: #3FA34D; margin: 10px 0 0;">🌱 Trávník bez starostí!</p>
-        </div>
-    </body>
-    </html>
-    """
+    context = BookingEmailContext.from_booking(booking, SERVICE_NAMES_CZ, TIME_NAMES_CZ)
+    return email_templates.render("booking_customer", context)
 
 def get_admin_email_html(booking: Booking) -> str:
-    service_name = SERVICE_NAMES_CZ.get(booking.service, booking.service)
-    time_name = TIME_NAMES_CZ.get(booking.preferred_time, booking.preferred_time)
-    additional = ", ".join(booking.additional_services) if booking.additional_services else "Žádné"
+    context = BookingEmailContext.from_booking(booking, SERVICE_NAMES_CZ, TIME_NAMES_CZ)
+    return email_templates.render("booking_admin", context)
+
+# ============== EMAIL OUTBOX ==============
+
+def _is_permanent_resend_error(error: Exception) -> bool:
+    """4xx errors other than rate limiting will not succeed on retry"""
+    try:
+        code = int(getattr(error, "code", 0))
+    except (TypeError, ValueError):
+        return False
+    return 400 <= code < 500 and code != 429
+
+async def deliver_outbox_batch(entries: List[dict]) -> List[Optional[Exception]]:
+    """Deliver claimed outbox entries through Resend batch requests"""
+    if not resend_client:
+        raise RuntimeError("Resend is not configured")
     
-    return f"""
-    <!DOCTYPE html>
-    <html>
-    <head>
-        <meta charset="UTF-8">
-    </head>
-    <body style="font-family: Arial, sans-serif; line-height: 1.6; color: #222222; max-width: 600px; margin: 0 auto; padding: 20px;">
-        <div style="background: #FF6B35; padding: 20px; text-align: center; border-radius: 10px 10px 0 0;">
-            <h1 style="color: white; margin: 0;">🆕 NOVÁ REZERVACE!</h1>
-        </div>
-        
-        <div style="background: #fff; padding: 25px; border: 2px solid #FF6B35; border-top: none; border-radius: 0 0 10px 10px;">
-            <h2 style="color: #222; margin-top: 0;">Zákazník: {booking.customer_name}</h2>
-            
-            <table style="width: 100%; border-collapse: collapse; margin: 20px 0;">
-                <tr style="background: #f8f9fa;"><td style="padding: 12px; border: 1px solid #dee2e6;"><strong>📞 Telefon:</strong></td><td style="padding: 12px; border: 1px solid #dee2e6;"><a href="tel:{booking.customer_phone}">{booking.customer_phone}</a></td></tr>
-                <tr><td style="padding: 12px; border: 1px solid #dee2e6;"><strong>📧 Email:</strong></td><td style="padding: 12px; border: 1px solid #dee2e6;"><a href="mailto:{booking.customer_email}">{booking.customer_email}</a></td></tr>
-                <tr style="background: #f8f9fa;"><td style="padding: 12px; border: 1px solid #dee2e6;"><strong>📍 Adresa:</strong></td><td style="padding: 12px; border: 1px solid #dee2e6;">{booking.property_address}</td></tr>
-            </table>
-            
-            <h3 style="color: #3FA34D;">Detaily objednávky</h3>
-            <table style="width: 100%; border-collapse: collapse;">
-                <tr><td style="padding: 8px; border-bottom: 1px solid #eee;"><strong>Služba:</strong></td><td style="padding: 8px; border-bottom: 1px solid #eee;">{service_name}</td></tr>
-                <tr><td style="padding: 8px; border-bottom: 1px solid #eee;"><strong>Velikost:</strong></td><td style="padding: 8px; border-bottom: 1px solid #eee;">{booking.property_size} m²</td></tr>
-                <tr><td style="padding: 8px; border-bottom: 1px solid #eee;"><strong>Stav:</strong></td><td style="padding: 8px; border-bottom: 1px solid #eee;">{booking.condition}</td></tr>
-                <tr><td style="padding: 8px; border-bottom: 1px solid #eee;"><strong>Termín:</strong></td><td style="padding: 8px; border-bottom: 1px solid #eee;">{booking.preferred_date} - {time_name}</td></tr>
-                <tr><td style="padding: 8px; border-bottom: 1px solid #eee;"><strong>Doplňkové:</strong></td><td style="padding: 8px; border-bottom: 1px solid #eee;">{additional}</td></tr>
-                <tr><td style="padding: 8px;"><strong>Cena:</strong></td><td style="padding: 8px; color: #3FA34D; font-size: 18px; font-weight: bold;">~{booking.estimated_price} Kč</td></tr>
-            </table>
-            
-            {f'<div style="background: #FFF3CD; padding: 15px; border-radius: 8px; margin: 20px 0;"><strong>📝 Poznámka od zákazníka:</strong><br>{booking.notes}</div>' if booking.notes else ''}
-            
-            <div style="background: #D4EDDA; padding: 15px; border-radius: 8px; margin: 20px 0; text-align: center;">
-                <strong>⚡ AKCE POTŘEBNÁ:</strong><br>
-                → Zavolat zákazníkovi pro potvrzení<br>
-                → Zapsat do kalendáře
-            </div>
-        </div>
-    </body>
-    </html>
-    """
+    emails = [entry["payload"] for entry in entries if entry["kind"] == "email"]
+    results = iter(await email_batcher.send_many(emails))
+    errors: List[Optional[Exception]] = []
+    for entry in entries:
+        if entry["kind"] != "email":
+            errors.append(PermanentDeliveryError(f"Unknown outbox entry kind: {entry['kind']}"))
+            continue
+        result = next(results)
+        if not isinstance(result, Exception):
+            logger.info("Email '%s' sent to %s", entry["payload"]["subject"], ", ".join(entry["payload"]["to"]))
+            errors.append(None)
+        elif _is_permanent_resend_error(result):
+            errors.append(PermanentDeliveryError(str(result)))
+        else:
+            errors.append(result)
+    return errors
+
+email_outbox = EmailOutbox(
+    db.email_outbox,
+    deliver_outbox_batch,
+    batch_size=EMAIL_BATCH_SIZE,
+    max_attempts=OUTBOX_MAX_ATTEMPTS,
+    poll_interval=OUTBOX_POLL_INTERVAL,
+)
+# Without transactions a booking's emails are queued after the booking is
+# stored; the sweeper queues them for any booking where that write was lost
+outbox_sweeper = OutboxSweeper(
+    email_outbox,
+    db.bookings,
+    lambda doc: get_booking_outbox_entries(Booking.model_construct(**doc)),
+    interval=OUTBOX_SWEEP_INTERVAL,
+)
+
+async def sync_contact(payload: dict):
+    """Create one contact in Resend; an existing contact counts as synced"""
+    try:
+        await resend_client.create_contact(payload)
+        logger.info("Contact added to Resend: %s", payload["email"])
+    except Exception as contact_error:
+        if not _is_permanent_resend_error(contact_error):
+            raise
+        logger.warning("Could not add contact to Resend (may already exist): %s", contact_error)
+
+contact_registry = ContactRegistry(
+    db.contacts_synced,
+    sync_contact,
+    interval=CONTACT_SYNC_INTERVAL,
+    batch_size=CONTACT_SYNC_BATCH,
+)
+
+async def register_contact(email: str, name: str = ""):
+    """Queue a Resend contact unless it is already known; never fails the request"""
+    try:
+        with span("mongo.register_contact"):
+            await contact_registry.register(email, **split_name(name))
+    except Exception as e:
+        logger.warning("Could not queue Resend contact %s: %s", email, e)
+
+def get_booking_outbox_entries(booking: Booking) -> List[dict]:
+    """Customer confirmation and admin notification for a new booking"""
+    entries = [
+        outbox_entry("email", {
+            "from": SENDER_EMAIL,
+            "to": [booking.customer_email],
+            "subject": "✓ Potvrzení rezervace - SeknuTo.cz",
+            "html": get_customer_email_html(booking)
+        }, ref=booking.id, entry_id=f"{booking.id}:customer"),
+    ]
+    if ADMIN_EMAIL:
+        entries.append(outbox_entry("email", {
+            "from": SENDER_EMAIL,
+            "to": [ADMIN_EMAIL],
+            "subject": f"🆕 Nová rezervace - {booking.customer_name}",
+            "html": get_admin_email_html(booking)
+        }, ref=booking.id, entry_id=f"{booking.id}:admin"))
+    return entries
+
+# ============== PAGINATION ==============
+
+def encode_cursor(doc: dict) -> str:
+    """Opaque keyset cursor pointing just past `doc` in (created_at, id) order"""
+    raw = json.dumps([doc["created_at"], doc["id"]], separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+def decode_cursor(cursor: str) -> dict:
+    """Mongo filter for documents after the cursor (newest first)"""
+    try:
+        created_at, doc_id = json.loads(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))
+    except (binascii.Error, ValueError, TypeError):
+        raise HTTPException(status_code=400, detail="Neplatný kurzor")
+    # Both values go straight into the filter: anything but strings could smuggle in query operators
+    if not isinstance(created_at, str) or not isinstance(doc_id, str):
+        raise HTTPException(status_code=400, detail="Neplatný kurzor")
+    return {"$or": [
+        {"created_at": {"$lt": created_at}},
+        {"created_at": created_at, "id": {"$lt": doc_id}},
+    ]}
 
 # ============== API ENDPOINTS ==============
 
@@ -310,133 +408,267 @@ def get_admin_email_html(booking: Booking) -> str:
 async def root():
     return {"message": "SeknuTo.cz API", "status": "running"}
 
+@api_router.get("/stats")
+async def get_stats():
+    """In-process counters for monitoring"""
+    return {
+        "pricing_cache": pricing_engine.cache_info(),
+        "availability_cache": availability_cache.stats(),
+        "coupon_cache": coupon_cache.stats(),
+        "coupon_pool": coupon_pool.stats(),
+        "idempotency": idempotency.stats(),
+        "contact_sync": contact_registry.stats(),
+        "resend": resend_client.stats() if resend_client else None,
+        "executors": {executor.name: executor.stats() for executor in executors},
+        "logging": log_pipeline.stats(),
+        "profiling": profiler.stats(),
+        "mongo": command_monitor.stats(),
+    }
+
+@api_router.get("/metrics")
+async def get_metrics():
+    """Request latency histograms, spans and component gauges in Prometheus text format"""
+    return Response(metrics_registry.render(), media_type=METRICS_CONTENT_TYPE)
+
 @api_router.post("/bookings", response_model=Booking)
-async def create_booking(booking_data: BookingCreate):
-    booking = Booking(**booking_data.model_dump())
-    doc = booking.model_dump()
+async def create_booking(booking_data: BookingCreate, idempotency_key: Optional[str] = Header(None)):
+    return await idempotency.run(
+        idempotency_key, "bookings", booking_data.model_dump(mode="json"), lambda: _create_booking(booking_data)
+    )
+
+async def _create_booking(booking_data: BookingCreate):
+    # booking_data is already validated; build the stored document directly
+    # instead of round-tripping through the Booking model
+    doc = booking_data.model_dump(exclude={"gdpr_consent"})
+    # Prices are computed here; the client's estimate is only a display value
+    estimated_price = pricing_engine.quote(
+        doc["service"], doc["property_size"], doc["condition"], doc["additional_services"]
+    )["estimated_price"]
+    doc.update(
+        id=str(uuid.uuid4()),
+        estimated_price=estimated_price,
+        final_price=estimated_price,
+        discount_applied=0,
+        coupon_code=normalize_code(doc["coupon_code"]) if doc.get("coupon_code") else None,
+        status="pending",
+        created_at=datetime.now(timezone.utc).isoformat(),
+    )
     
-    await db.bookings.insert_one(doc)
-    logger.info(f"New booking created: {booking.id} for {booking.customer_name}")
+    try:
+        with span("mongo.reserve_slot"):
+            await slot_capacity.reserve(doc["preferred_date"], doc["preferred_time"])
+    except SlotFullError:
+        raise HTTPException(status_code=409, detail="Vybraný termín je již plně obsazen, zvolte prosím jiný")
+    try:
+        if doc["coupon_code"]:
+            with span("mongo.redeem_coupon"):
+                coupon = await redeem_coupon(db.coupons, doc["coupon_code"], doc["id"])
+            coupon_cache.invalidate(doc["coupon_code"])
+            doc["final_price"] = apply_discount(estimated_price, coupon.get("discount_percent", 5))
+            doc["discount_applied"] = estimated_price - doc["final_price"]  # Kč
+    except CouponError as e:
+        await slot_capacity.release(doc["preferred_date"], doc["preferred_time"])
+        raise HTTPException(status_code=e.status_code, detail=e.detail)
+    try:
+        entries = []
+        if resend_client:
+            with span("render.booking_emails"):
+                entries = get_booking_outbox_entries(Booking.model_construct(**doc))
+        with span("mongo.insert_booking"):
+            await insert_booking(doc, entries)
+    except Exception:
+        await slot_capacity.release(doc["preferred_date"], doc["preferred_time"])
+        if doc["coupon_code"]:
+            await restore_coupon(db.coupons, doc["coupon_code"], doc["id"])
+            coupon_cache.invalidate(doc["coupon_code"])
+        raise
+    doc.pop("_id", None)
+    logger.info("New booking created: %s for %s", doc["id"], doc["customer_name"])
     
-    # Add booking email to Resend Contacts (independent of email sending)
-    if resend and RESEND_API_KEY:
-        try:
-            contact_params = {
-                "email": booking.customer_email,
-                "first_name": booking.customer_name.split()[0] if booking.customer_name else "",
-                "last_name": " ".join(booking.customer_name.split()[1:]) if len(booking.customer_name.split()) > 1 else "",
-                "unsubscribed": False
-            }
-            await asyncio.to_thread(resend.Contacts.create, contact_params)
-            logger.info(f"Contact added to Resend: {booking.customer_email}")
-        except Exception as contact_error:
-            logger.warning(f"Could not add contact to Resend (may already exist): {str(contact_error)}")
-        
-        # Send customer confirmation email
+    # Emails are delivered in the background by the outbox dispatcher,
+    # new contacts by the contact registry's periodic sync
+    if resend_client:
+        await register_contact(doc["customer_email"], doc["customer_name"])
+    
+    return ORJSONResponse(doc)
+
+async def insert_booking(doc: dict, entries: List[dict]):
+    """Store a booking with its outbox entries, in one transaction when the deployment supports it"""
+    if entries and transactions.enabled:
+        async def write(session):
+            await db.bookings.insert_one(doc, session=session)
+            await email_outbox.enqueue(entries, session=session)
+
+        async with await client.start_session() as session:
+            await session.with_transaction(write)
+        return
+    await db.bookings.insert_one(doc)
+    if entries:
         try:
-            customer_params = {
-                "from": SENDER_EMAIL,
-                "to": [booking.customer_email],
-                "subject": "✓ Potvrzení rezervace - SeknuTo.cz",
-                "html": get_customer_email_html(booking)
-            }
-            await asyncio.to_thread(resend.Emails.send, customer_params)
-            logger.info(f"Customer confirmation email sent to {booking.customer_email}")
+            with span("mongo.enqueue_outbox"):
+                await email_outbox.enqueue(entries)
         except Exception as e:
-            logger.error(f"Failed to send customer email: {str(e)}")
-        
-        # Send admin notification email (separate try block)
-        if ADMIN_EMAIL:
-            try:
-                admin_params = {
-                    "from": SENDER_EMAIL,
-                    "to": [ADMIN_EMAIL],
-                    "subject": f"🆕 Nová rezervace - {booking.customer_name}",
-                    "html": get_admin_email_html(booking)
-                }
-                await asyncio.to_thread(resend.Emails.send, admin_params)
-                logger.info(f"Admin notification email sent to {ADMIN_EMAIL}")
-            except Exception as e:
-                logger.error(f"Failed to send admin email: {str(e)}")
-    
-    return booking
+            # The booking is stored: failing the request would only invite a duplicate retry
+            logger.error("Could not queue emails for booking %s, the outbox sweeper will retry: %s", doc["id"], e)
 
 @api_router.get("/bookings/{booking_id}", response_model=Booking)
 async def get_booking(booking_id: str):
     booking = await db.bookings.find_one({"id": booking_id}, {"_id": 0})
     if not booking:
         raise HTTPException(status_code=404, detail="Booking not found")
-    return booking
+    # Stored documents were validated on write; skip response_model re-validation
+    return ORJSONResponse(booking)
 
 @api_router.get("/bookings", response_model=List[Booking])
-async def get_all_bookings():
-    bookings = await db.bookings.find({}, {"_id": 0}).to_list(1000)
-    return bookings
+async def get_all_bookings(
+    cursor: Optional[str] = None,
+    limit: int = Query(BOOKINGS_PAGE_SIZE, ge=1),
+    status: Optional[str] = None,
+    service: Optional[str] = None,
+    customer_email: Optional[str] = None,
+    date_from: Optional[date] = None,
+    date_to: Optional[date] = None,
+):
+    """Bookings newest first, one page at a time
+
+    The next page's cursor is returned in the X-Next-Cursor header (absent on the last page).
+    """
+    limit = min(limit, BOOKINGS_PAGE_MAX)
+    query = {}
+    if status:
+        query["status"] = status
+    if service:
+        query["service"] = service
+    if customer_email:
+        query["customer_email"] = customer_email
+    if date_from or date_to:
+        query["preferred_date"] = {}
+        if date_from:
+            query["preferred_date"]["$gte"] = date_from.isoformat()
+        if date_to:
+            query["preferred_date"]["$lte"] = date_to.isoformat()
+    if cursor:
+        query = {"$and": [query, decode_cursor(cursor)]} if query else decode_cursor(cursor)
+    
+    bookings = await db.bookings.find(query, {"_id": 0}) \
+        .sort([("created_at", -1), ("id", -1)]) \
+        .limit(limit + 1) \
+        .to_list(limit + 1)
+    response = ORJSONResponse(bookings[:limit])
+    if len(bookings) > limit:
+        response.headers["X-Next-Cursor"] = encode_cursor(bookings[limit - 1])
+    return response
+
+def require_admin(x_admin_token: Optional[str] = Header(None)):
+    if not (ADMIN_API_TOKEN and x_admin_token and hmac.compare_digest(x_admin_token.encode(), ADMIN_API_TOKEN.encode())):
+        raise HTTPException(status_code=403, detail="Forbidden")
+
+@api_router.get("/export/{collection}", dependencies=[Depends(require_admin)])
+async def export_collection(
+    collection: str,
+    export_format: str = Query("ndjson", alias="format", pattern="^(ndjson|csv)$"),
+    fields: Optional[str] = None,
+    date_from: Optional[date] = None,
+    date_to: Optional[date] = None,
+    batch_size: int = Query(EXPORT_BATCH_SIZE, ge=1),
+):
+    """Stream bookings or contact messages as NDJSON or CSV, filtered by created_at"""
+    if collection not in EXPORT_FIELDS:
+        raise HTTPException(status_code=404, detail="Neznámá kolekce")
+    
+    columns = EXPORT_FIELDS[collection]
+    if fields:
+        requested = [f.strip() for f in fields.split(",") if f.strip()]
+        unknown = [f for f in requested if f not in columns]
+        if unknown:
+            raise HTTPException(status_code=400, detail=f"Neznámá pole: {', '.join(unknown)}")
+        columns = requested
+    
+    query = {}
+    if date_from or date_to:
+        query["created_at"] = {}
+        if date_from:
+            query["created_at"]["$gte"] = date_from.isoformat()
+        if date_to:
+            query["created_at"]["$lt"] = (date_to + timedelta(days=1)).isoformat()
+    
+    batch_size = min(batch_size, EXPORT_BATCH_MAX)
+    projection = {"_id": 0, **{field: 1 for field in columns}}
+    cursor = db[collection].find(query, projection).sort("created_at", 1).batch_size(batch_size)
+    
+    filename = f"{collection}-{datetime.now(timezone.utc):%Y%m%d}.{export_format}"
+    if export_format == "csv":
+        body, media_type = stream_csv(cursor, columns, batch_size), "text/csv; charset=utf-8"
+    else:
+        body, media_type = stream_ndjson(cursor, batch_size), "application/x-ndjson"
+    return StreamingResponse(
+        body,
+        media_type=media_type,
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'},
+    )
 
 @api_router.post("/pricing/calculate")
 async def calculate_price(data: PriceCalculation):
-    # Check if it's a tiered package
-    if data.service in PACKAGE_TIERED_PRICING:
-        tier = get_size_tier(data.property_size)
-        base_price = PACKAGE_TIERED_PRICING[data.service][tier]
-        total = int(base_price * data.property_size)
-    elif data.service in ["garden_work", "debris_hourly"]:
-        # Hodinová sazba × počet hodin (property_size = hodiny)
-        base_price = SERVICE_PRICES.get(data.service, 350)
-        total = int(base_price * max(data.property_size, 1))
-    elif data.service in SERVICE_PRICES:
-        base_price = SERVICE_PRICES.get(data.service, 2)
-        multiplier = CONDITION_MULTIPLIERS.get(data.condition, 1.0)
-        total = int(base_price * data.property_size * multiplier)
-    else:
-        base_price = 2
-        total = int(base_price * data.property_size)
-    
-    # Příplatky za m² (mulčování, solení)
-    additional_cost = 0
-    for service in data.additional_services:
-        if service in ADDITIONAL_SERVICE_PRICES_PER_M2:
-            additional_cost += int(ADDITIONAL_SERVICE_PRICES_PER_M2[service] * data.property_size)
-        elif service in ADDITIONAL_SERVICE_PRICES:
-            additional_cost += ADDITIONAL_SERVICE_PRICES[service]
+    return pricing_engine.quote(data.service, data.property_size, data.condition, data.additional_services)
+
+@api_router.post("/pricing/calculate-batch")
+async def calculate_price_batch(data: PriceBatchCalculation):
+    """Price many configurations (or one configuration over a size range) in one call"""
+    if (data.items is None) == (data.size_range is None):
+        raise HTTPException(status_code=422, detail="Zadejte buď items, nebo size_range")
     
-    total += additional_cost
+    if data.items is not None:
+        items = data.items
+        services = [item.service for item in items]
+        sizes = [item.property_size for item in items]
+        conditions = [item.condition for item in items]
+        additional = [item.additional_services for item in items]
+    else:
+        r = data.size_range
+        # Count the range before materializing it: size_to may be huge
+        sizes = range(r.size_from, r.size_to + 1, r.step)
     
-    # Get tier info for packages
-    tier_info = None
-    if data.service in PACKAGE_TIERED_PRICING:
-        tier = get_size_tier(data.property_size)
-        tier_info = {
-            "tier": tier,
-            "tier_label": "do 200 m²" if tier == "small" else ("200-500 m²" if tier == "medium" else "500+ m²"),
-            "price_per_m2": PACKAGE_TIERED_PRICING[data.service][tier]
-        }
+    if len(sizes) > PRICING_BATCH_MAX:
+        raise HTTPException(status_code=422, detail=f"Maximálně {PRICING_BATCH_MAX} položek v jednom požadavku")
+    if any(abs(size) > MAX_BATCH_PROPERTY_SIZE for size in sizes):
+        raise HTTPException(status_code=422, detail="Neplatná velikost plochy")
+    if data.size_range is not None:
+        sizes = list(sizes)
+        services = [r.service] * len(sizes)
+        conditions = [r.condition] * len(sizes)
+        additional = [r.additional_services] * len(sizes)
     
+    try:
+        results = await pricing_executor.run(calculate_quotes_batch, services, sizes, conditions, additional)
+    except ExecutorSaturatedError:
+        raise HTTPException(status_code=503, detail="Server je přetížen, zkuste to prosím za chvíli", headers={"Retry-After": "1"})
+    return {"results": results}
+
+async def build_availability() -> dict:
+    dates = bookable_dates(datetime.now(timezone.utc).date(), AVAILABILITY_DAYS)
+    slots = await slot_capacity.remaining(dates)
     return {
-        "estimated_price": total,
-        "base_price_per_unit": base_price,
-        "property_size": data.property_size,
-        "condition_multiplier": CONDITION_MULTIPLIERS.get(data.condition, 1.0),
-        "additional_services_cost": additional_cost,
-        "tier_info": tier_info
+        "available_dates": [day for day in dates if slots[day]["anytime"] > 0],
+        "slots": slots,
     }
 
 @api_router.get("/availability")
-async def get_availability():
-    # Return available dates (next 30 days, excluding Sundays)
-    from datetime import timedelta
-    today = datetime.now(timezone.utc).date()
-    available_dates = []
-    
-    for i in range(1, 31):
-        date = today + timedelta(days=i)
-        if date.weekday() != 6:  # Exclude Sundays
-            available_dates.append(date.isoformat())
-    
-    return {"available_dates": available_dates}
+async def get_availability(if_none_match: Optional[str] = Header(None)):
+    """Bookable dates (next AVAILABILITY_DAYS days, excluding Sundays) with remaining places per slot"""
+    cached = await availability_cache.get(datetime.now(timezone.utc).date(), build_availability)
+    headers = {
+        "ETag": cached.etag,
+        "Cache-Control": f"public, max-age={AVAILABILITY_MAX_AGE}, stale-while-revalidate={AVAILABILITY_MAX_AGE}",
+    }
+    if cached.matches(if_none_match):
+        return Response(status_code=304, headers=headers)
+    return Response(cached.body, media_type="application/json", headers=headers)
 
 @api_router.post("/contact")
-async def submit_contact_form(form: ContactForm):
+async def submit_contact_form(form: ContactForm, idempotency_key: Optional[str] = Header(None)):
+    return await idempotency.run(idempotency_key, "contact", form.model_dump(mode="json"), lambda: _submit_contact_form(form))
+
+async def _submit_contact_form(form: ContactForm):
     doc = {
         "id": str(uuid.uuid4()),
         "name": form.name,
@@ -447,137 +679,98 @@ async def submit_contact_form(form: ContactForm):
         "status": "new"
     }
     
-    await db.contact_messages.insert_one(doc)
-    logger.info(f"Contact form submitted by {form.name}")
+    with span("mongo.insert_contact_message"):
+        await db.contact_messages.insert_one(doc)
+    logger.info("Contact form submitted by %s", form.name)
     
-    # Send email notification if configured
-    if resend and RESEND_API_KEY and ADMIN_EMAIL:
+    # Queue email notification if configured
+    if resend_client and ADMIN_EMAIL:
         try:
+            with span("render.contact_email"):
+                html = email_templates.render("contact_admin", ContactEmailContext(
+                    name=form.name, email=form.email, phone=form.phone, message=form.message
+                ))
             params = {
                 "from": SENDER_EMAIL,
                 "to": [ADMIN_EMAIL],
                 "subject": f"📬 Nová zpráva od {form.name} - SeknuTo.cz",
-                "html": f"""
-                <h2>Nová zpráva z kontaktního formuláře</h2>
-                <p><strong>Jméno:</strong> {form.name}</p>
-                <p><strong>Email:</strong> {form.email}</p>
-                <p><strong>Telefon:</strong> {form.phone or 'Neuvedeno'}</p>
-                <p><strong>Zpráva:</strong></p>
-                <p>{form.message}</p>
-                """
+                "html": html
             }
-            await asyncio.to_thread(resend.Emails.send, params)
+            with span("mongo.enqueue_outbox"):
+                await email_outbox.enqueue([outbox_entry("email", params, ref=doc["id"], entry_id=f"{doc['id']}:admin")])
         except Exception as e:
-            logger.error(f"Failed to send contact notification: {str(e)}")
+            logger.error("Failed to queue contact notification: %s", e)
     
     return {"message": "Děkujeme za zprávu! Brzy se vám ozveme.", "id": doc["id"]}
 
 @api_router.post("/subscribe")
-async def subscribe_email(data: EmailSubscription):
+async def subscribe_email(data: EmailSubscription, idempotency_key: Optional[str] = Header(None)):
     """Subscribe to newsletter and get 5% discount coupon"""
-    # Check if already subscribed
-    existing = await db.subscribers.find_one({"email": data.email}, {"_id": 0})
-    if existing:
+    return await idempotency.run(idempotency_key, "subscribe", data.model_dump(mode="json"), lambda: _subscribe_email(data))
+
+async def _subscribe_email(data: EmailSubscription):
+    with span("mongo.subscribe"):
+        subscriber, created = await subscriptions.subscribe(data.email)
+    if not created:
         return {
             "message": "Tento email je již přihlášen",
-            "coupon_code": existing.get("coupon_code", "SEKNU5OFF"),
+            "coupon_code": subscriber.get("coupon_code", "SEKNU5OFF"),
             "already_subscribed": True
         }
+    coupon_code = subscriber["coupon_code"]
+    coupon_cache.invalidate(coupon_code)
     
-    # Generate unique coupon
-    coupon_code = generate_coupon_code()
-    
-    doc = {
-        "id": str(uuid.uuid4()),
-        "email": data.email,
-        "coupon_code": coupon_code,
-        "discount_percent": 5,
-        "used": False,
-        "created_at": datetime.now(timezone.utc).isoformat()
-    }
-    
-    await db.subscribers.insert_one(doc)
-    await db.coupons.insert_one({
-        "code": coupon_code,
-        "discount_percent": 5,
-        "email": data.email,
-        "used": False,
-        "created_at": datetime.now(timezone.utc).isoformat()
-    })
-    logger.info(f"New subscriber: {data.email}, coupon: {coupon_code}")
+    logger.info("New subscriber: %s, coupon: %s", data.email, coupon_code)
     
     # Add contact to Resend Contacts (no audience needed)
-    if resend and RESEND_API_KEY:
-        try:
-            contact_params = {
-                "email": data.email,
-                "unsubscribed": False
-            }
-            await asyncio.to_thread(resend.Contacts.create, contact_params)
-            logger.info(f"Contact added to Resend Contacts: {data.email}")
-        except Exception as e:
-            logger.warning(f"Could not add contact to Resend (may already exist): {str(e)}")
+    if resend_client:
+        await register_contact(data.email)
     
-    # Send coupon email
-    if resend and RESEND_API_KEY:
+    # Queue coupon email
+    if resend_client:
         try:
+            with span("render.coupon_email"):
+                html = email_templates.render("coupon", CouponEmailContext(coupon_code=coupon_code))
             params = {
                 "from": SENDER_EMAIL,
                 "to": [data.email],
                 "subject": "🎁 Váš slevový kupón 5% - SeknuTo.cz",
-                "html": f"""
-                <!DOCTYPE html>
-                <html>
-                <head><meta charset="UTF-8"></head>
-                <body style="font-family: Arial, sans-serif; max-width: 600px; margin: 0 auto; padding: 20px;">
-                    <div style="background: linear-gradient(135deg, #3FA34D, #2d7a38); padding: 40px; text-align: center; border-radius: 16px 16px 0 0;">
-                        <h1 style="color: white; margin: 0; font-size: 28px;">🎁 Děkujeme za přihlášení!</h1>
-                    </div>
-                    
-                    <div style="background: #f8fff9; padding: 40px; border: 1px solid #e5e7eb; border-top: none; border-radius: 0 0 16px 16px;">
-                        <p style="text-align: center; font-size: 16px; color: #4B5563;">
-                            Jako poděkování za přihlášení k odběru novinek máte nárok na slevu <strong>5%</strong> na vaši první objednávku!
-                        </p>
-                        
-                        <div style="background: white; padding: 30px; border-radius: 12px; text-align: center; margin: 30px 0; border: 2px dashed #3FA34D;">
-                            <p style="color: #9CA3AF; margin: 0 0 10px;">Váš slevový kód:</p>
-                            <p style="font-size: 36px; font-weight: bold; color: #3FA34D; margin: 0; letter-spacing: 3px;">
-                                {coupon_code}
-                            </p>
-                        </div>
-                        
-                        <p style="text-align: center; color: #4B5563;">
-                            Zadejte tento kód při objednávce a získejte slevu 5%.
-                        </p>
-                        
-                        <div style="text-align: center; margin-top: 30px;">
-                            <a href="https://seknuto.cz/rezervace" style="display: inline-block; background: #3FA34D; color: white; padding: 16px 32px; border-radius: 50px; text-decoration: none; font-weight: bold;">
-                                Objednat se slevou
-                            </a>
-                        </div>
-                    </div>
-                    
-                    <p style="text-align: center; color: #9CA3AF; font-size: 12px; margin-top: 20px;">
-                        SeknuTo.cz | Trávník bez starostí!
-                    </p>
-                </body>
-                </html>
-                """
+                "html": html
             }
-            await asyncio.to_thread(resend.Emails.send, params)
-            logger.info(f"Coupon email sent to {data.email}")
+            with span("mongo.enqueue_outbox"):
+                await email_outbox.enqueue([outbox_entry("email", params, ref=subscriber["id"], entry_id=f"{subscriber['id']}:coupon")])
+            logger.info("Coupon email queued for %s", data.email)
         except Exception as e:
-            logger.error(f"Failed to send coupon email: {str(e)}")
+            logger.error("Failed to queue coupon email: %s", e)
     
     return {
         "message": "Úspěšně přihlášeno! Slevový kupón byl odeslán na váš email.",
         "coupon_code": coupon_code
     }
 
+@api_router.get("/admin/profiles", dependencies=[Depends(require_admin)])
+async def list_profiles():
+    """Stored per-request profiles and the continuous per-route aggregates"""
+    return profiler.summaries()
+
+@api_router.get("/admin/profiles/{profile_id}", dependencies=[Depends(require_admin)])
+async def get_profile(profile_id: str):
+    """Folded stacks ("frame;frame count" lines) for flamegraph.pl / speedscope"""
+    profile = profiler.get(profile_id)
+    if not profile:
+        raise HTTPException(status_code=404, detail="Profile not found")
+    return Response(profile.folded(), media_type="text/plain; charset=utf-8")
+
+async def load_coupon(code: str) -> Optional[dict]:
+    # Reserved pool codes are not coupons yet
+    return await db.coupons.find_one(
+        {"code": code, "reserved": {"$ne": True}}, {"_id": 0, "used": 1, "discount_percent": 1}
+    )
+
 @api_router.post("/coupons/validate")
 async def validate_coupon(data: CouponValidation):
     """Validate a coupon code"""
-    coupon = await db.coupons.find_one({"code": data.code.upper()}, {"_id": 0})
+    coupon = await coupon_cache.get(normalize_code(data.code), load_coupon)
     
     if not coupon:
         raise HTTPException(status_code=404, detail="Neplatný slevový kód")
@@ -594,6 +787,12 @@ async def validate_coupon(data: CouponValidation):
 # Include the router in the main app
 app.include_router(api_router)
 
+# Only installed when profiling is configured, so it costs nothing otherwise
+if profiler.enabled:
+    app.add_middleware(ProfilingMiddleware, profiler=profiler)
+
+app.add_middleware(MetricsMiddleware)
+
 app.add_middleware(
     CORSMiddleware,
     allow_credentials=True,
@@ -602,6 +801,83 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+@app.on_event("startup")
+async def ensure_db_indexes():
+    try:
+        await ensure_indexes(db)
+        if INDEX_PLAN_CHECK:
+            await check_query_plans(db)
+    except Exception as e:
+        logger.error("Index provisioning failed: %s", e)
+
+@app.on_event("startup")
+async def start_command_monitor():
+    # After index provisioning, so new filter shapes are explained against the final indexes
+    command_monitor.start(db)
+
+@app.on_event("startup")
+async def detect_transactions():
+    try:
+        await transactions.detect(client)
+    except Exception as e:
+        logger.warning("Could not detect MongoDB transaction support: %s", e)
+    logger.info("MongoDB transactions: %s", "enabled" if transactions.enabled else "unavailable")
+
+@app.on_event("startup")
+async def fill_coupon_pool():
+    try:
+        await coupon_pool.refill()
+    except Exception as e:
+        logger.error("Coupon code pool refill failed: %s", e)
+
+@app.on_event("startup")
+async def start_executors():
+    for executor in executors:
+        executor.start()
+
+@app.on_event("startup")
+async def start_email_outbox():
+    email_outbox.start()
+    if resend_client:
+        outbox_sweeper.start()
+
+@app.on_event("startup")
+async def start_contact_sync():
+    if not resend_client:
+        return
+    try:
+        logger.info("Contact registry warmed with %d emails", await contact_registry.warm())
+    except Exception as e:
+        logger.error("Contact registry warm-up failed: %s", e)
+    contact_registry.start()
+
+@app.on_event("shutdown")
+async def stop_email_outbox():
+    await outbox_sweeper.stop()
+    await email_outbox.stop()
+
+@app.on_event("shutdown")
+async def stop_contact_sync():
+    await contact_registry.stop()
+
+@app.on_event("shutdown")
+async def close_resend_client():
+    if resend_client:
+        await resend_client.close()
+
+@app.on_event("shutdown")
+async def stop_executors():
+    for executor in executors:
+        executor.shutdown(wait=True)
+
 @app.on_event("shutdown")
 async def shutdown_db_client():
     client.close()
+
+@app.on_event("shutdown")
+async def stop_profiler():
+    profiler.sampler.stop()
+
+@app.on_event("shutdown")
+async def flush_logs():
+    log_pipeline.stop()
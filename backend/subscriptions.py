@@ -0,0 +1,111 @@
+"""
+Newsletter subscriptions for SeknuTo.cz
+
+A subscription is one upsert on subscribers.email (unique index) with
+$setOnInsert: the document returned from before the update tells a
+returning subscriber (existing document) from a new one (None), so
+duplicates cost one write and concurrent signups for the same email
+cannot both insert. A new subscriber's coupon code comes from the code
+pool and its placeholder is activated next to the upsert, inside a
+transaction when the deployment supports them (see transactions.py).
+"""
+import uuid
+from datetime import datetime, timezone
+from typing import Any, Dict, Optional, Tuple
+
+from pymongo.errors import DuplicateKeyError
+
+import transactions
+from coupons import CouponCodePool
+
+
+class _PlaceholderGone(Exception):
+    pass
+
+
+class SubscriptionStore:
+    """Idempotent subscriber + coupon creation"""
+
+    def __init__(self, client, db, pool: CouponCodePool, *, use_transactions: Optional[bool] = None):
+        self.client = client
+        self.db = db
+        self.pool = pool
+        self._use_transactions = use_transactions
+
+    @property
+    def use_transactions(self) -> bool:
+        """The explicit setting, or the process-wide one detected at startup"""
+        if self._use_transactions is None:
+            return transactions.enabled
+        return self._use_transactions
+
+    async def subscribe(self, email: str, discount_percent: int = 5) -> Tuple[Dict[str, Any], bool]:
+        """Return (subscriber document, created)"""
+        now = datetime.now(timezone.utc).isoformat()
+        coupon_fields = {"discount_percent": discount_percent, "email": email, "used": False, "created_at": now}
+
+        while True:
+            code = await self.pool.take()
+            subscriber = {
+                "id": str(uuid.uuid4()),
+                "email": email,
+                "coupon_code": code,
+                "discount_percent": discount_percent,
+                "used": False,
+                "created_at": now,
+            }
+            try:
+                if self.use_transactions:
+                    existing = await self._subscribe_in_transaction(subscriber, coupon_fields)
+                else:
+                    existing = await self._subscribe(subscriber, coupon_fields)
+            except _PlaceholderGone:
+                continue  # transaction rolled back; try the next code
+            except DuplicateKeyError:
+                # Concurrent insert inside a transaction; the retry sees the existing subscriber
+                self.pool.give_back(code)
+                continue
+            except Exception:
+                if self.use_transactions:
+                    self.pool.give_back(code)
+                raise
+
+            if existing is not None:
+                self.pool.give_back(code)
+                return existing, False
+            return subscriber, True
+
+    async def _upsert(self, subscriber: Dict[str, Any], session=None) -> Optional[Dict[str, Any]]:
+        """Insert unless the email exists; returns the existing document or None"""
+        query = {"email": subscriber["email"]}
+        try:
+            existing = await self.db.subscribers.find_one_and_update(
+                query, {"$setOnInsert": subscriber}, upsert=True, session=session
+            )
+        except DuplicateKeyError:
+            if session is not None:
+                raise  # the transaction is aborted; subscribe() retries it
+            # Lost an insert race the server did not retry for us
+            existing = await self.db.subscribers.find_one(query)
+        if existing is not None:
+            existing.pop("_id", None)
+        return existing
+
+    async def _subscribe_in_transaction(self, subscriber, coupon_fields) -> Optional[Dict[str, Any]]:
+        async def callback(session):
+            existing = await self._upsert(subscriber, session)
+            if existing is None and not await self.pool.activate(subscriber["coupon_code"], coupon_fields, session):
+                raise _PlaceholderGone()
+            return existing
+
+        async with await self.client.start_session() as session:
+            return await session.with_transaction(callback)
+
+    async def _subscribe(self, subscriber, coupon_fields) -> Optional[Dict[str, Any]]:
+        existing = await self._upsert(subscriber)
+        if existing is None and not await self.pool.activate(subscriber["coupon_code"], coupon_fields):
+            # Rare: the placeholder vanished after the upsert; repoint the subscriber
+            code = await self.pool.issue(coupon_fields)
+            await self.db.subscribers.update_one({"email": subscriber["email"]}, {"$set": {"coupon_code": code}})
+            subscriber["coupon_code"] = code
+        return existing
@@ -0,0 +1,110 @@
+"""
+Shared fixtures for the SeknuTo.cz backend tests
+"""
+import asyncio
+import os
+import sys
+import uuid
+from contextlib import asynccontextmanager
+from functools import lru_cache
+from pathlib import Path
+
+import pytest
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+if str(BACKEND_DIR) not in sys.path:
+    sys.path.insert(0, str(BACKEND_DIR))
+
+TEST_MONGO_URL = os.environ.get('TEST_MONGO_URL', 'mongodb://localhost:27017')
+
+# server.py reads these at import time; the Motor client connects lazily
+os.environ.setdefault('MONGO_URL', TEST_MONGO_URL)
+os.environ.setdefault('DB_NAME', 'test_database')
+
+
+@lru_cache(maxsize=None)
+def mongod_reachable() -> bool:
+    from pymongo import MongoClient
+    from pymongo.errors import PyMongoError
+
+    sync_client = MongoClient(TEST_MONGO_URL, serverSelectionTimeoutMS=500)
+    try:
+        sync_client.admin.command("ping")
+        return True
+    except PyMongoError:
+        return False
+    finally:
+        sync_client.close()
+
+
+@pytest.fixture
+def mongo_db():
+    """Factory for a throwaway Motor database
+
+    Uses the local mongod when one is reachable and an in-memory
+    mongomock-motor database otherwise. Call it inside the test's event
+    loop so the Motor client binds to that loop.
+    """
+    name = f"test_seknuto_{uuid.uuid4().hex[:8]}"
+    if not mongod_reachable():
+        from mongomock_motor import AsyncMongoMockClient
+
+        client = AsyncMongoMockClient()
+        yield lambda: client[name]
+        return
+
+    from motor.motor_asyncio import AsyncIOMotorClient
+    from pymongo import MongoClient
+
+    yield lambda: AsyncIOMotorClient(TEST_MONGO_URL)[name]
+    sync_client = MongoClient(TEST_MONGO_URL)
+    sync_client.drop_database(name)
+    sync_client.close()
+
+
+@pytest.fixture
+def mongod_db(mongo_db):
+    """mongo_db for tests that need a real server: query plans, transactions, command events"""
+    if not mongod_reachable():
+        pytest.skip(f"No MongoDB reachable at {TEST_MONGO_URL}")
+    return mongo_db
+
+
+@pytest.fixture
+def run_db(mongo_db):
+    """Run `scenario(db)` on a fresh event loop, with the indexes of the given collections in place"""
+    from db_indexes import REQUIRED_INDEXES, ensure_indexes
+
+    def run(scenario, indexes=()):
+        async def wrapper():
+            db = mongo_db()
+            await ensure_indexes(db, [spec for spec in REQUIRED_INDEXES if spec.collection in indexes])
+            return await scenario(db)
+
+        return asyncio.run(wrapper())
+
+    return run
+
+
+@pytest.fixture
+def api_client():
+    """Async context manager: an httpx client on server.app with server.db and other globals swapped"""
+    import httpx
+
+    import server
+
+    @asynccontextmanager
+    async def client(db, **overrides):
+        overrides["db"] = db
+        originals = {name: getattr(server, name) for name in overrides}
+        for name, value in overrides.items():
+            setattr(server, name, value)
+        try:
+            transport = httpx.ASGITransport(app=server.app)
+            async with httpx.AsyncClient(transport=transport, base_url="http://test") as http:
+                yield http
+        finally:
+            for name, value in originals.items():
+                setattr(server, name, value)
+
+    return client
@@ -0,0 +1,112 @@
+"""
+Availability cache and conditional GET tests
+"""
+import asyncio
+from datetime import date
+
+import server
+from availability import AvailabilityCache, CachedResponse, bookable_dates
+from capacity import CapacityLimits, SlotCapacity
+
+
+class _Builder:
+    def __init__(self, delay=0.0):
+        self.calls = 0
+        self.delay = delay
+
+    async def __call__(self):
+        self.calls += 1
+        await asyncio.sleep(self.delay)
+        return {"available_dates": [], "build": self.calls}
+
+
+class TestAvailabilityCache:
+    """Keying, invalidation and single-flight rebuilds"""
+
+    def test_bookable_dates_skip_sundays(self):
+        # 2026-05-02 is a Saturday
+        assert bookable_dates(date(2026, 5, 1), 3) == ["2026-05-02", "2026-05-04"]
+
+    def test_hit_rollover_and_invalidation(self):
+        async def scenario():
+            cache, build = AvailabilityCache(ttl=60), _Builder()
+            first = await cache.get(date(2026, 5, 1), build)
+            assert await cache.get(date(2026, 5, 1), build) is first
+            rolled = await cache.get(date(2026, 5, 2), build)
+            cache.invalidate()
+            invalidated = await cache.get(date(2026, 5, 2), build)
+            return first, rolled, invalidated, build.calls, cache.stats()
+
+        first, rolled, invalidated, calls, stats = asyncio.run(scenario())
+        assert calls == 3
+        assert len({first.etag, rolled.etag, invalidated.etag}) == 3
+        assert stats == {"hits": 1, "misses": 3}
+
+    def test_expired_entries_are_rebuilt(self):
+        async def scenario():
+            cache, build = AvailabilityCache(ttl=0), _Builder()
+            await cache.get(date(2026, 5, 1), build)
+            await cache.get(date(2026, 5, 1), build)
+            return build.calls
+
+        assert asyncio.run(scenario()) == 2
+
+    def test_concurrent_misses_share_one_build(self):
+        async def scenario():
+            cache, build = AvailabilityCache(ttl=60), _Builder(delay=0.01)
+            results = await asyncio.gather(*[cache.get(date(2026, 5, 1), build) for _ in range(20)])
+            return results, build.calls
+
+        results, calls = asyncio.run(scenario())
+        assert calls == 1
+        assert len({id(result) for result in results}) == 1
+
+    def test_change_during_build_is_not_cached(self):
+        async def scenario():
+            cache, build = AvailabilityCache(ttl=60), _Builder(delay=0.01)
+            pending = asyncio.ensure_future(cache.get(date(2026, 5, 1), build))
+            await asyncio.sleep(0)
+            cache.invalidate()
+            await pending
+            await cache.get(date(2026, 5, 1), build)
+            return build.calls
+
+        assert asyncio.run(scenario()) == 2
+
+    def test_if_none_match(self):
+        response = CachedResponse.render({"available_dates": ["2026-05-02"]})
+        assert response.etag.startswith('"') and response.etag.endswith('"')
+        assert response.matches(response.etag)
+        assert response.matches(f'"other", W/{response.etag}')
+        assert response.matches("*")
+        assert not response.matches('"other"')
+        assert not response.matches(None)
+
+
+class TestAvailabilityEndpoint:
+    """GET /api/availability"""
+
+    def test_etag_304_and_invalidation_on_booking(self, run_db, api_client):
+        async def scenario(db):
+            capacity = SlotCapacity(
+                db.slot_capacity, CapacityLimits(per_day=2, per_half_day=1), on_change=server.availability_cache.invalidate
+            )
+            server.availability_cache.invalidate()
+            async with api_client(db, slot_capacity=capacity) as client:
+                first = await client.get("/api/availability")
+                etag = first.headers["etag"]
+                not_modified = await client.get("/api/availability", headers={"If-None-Match": etag})
+                await capacity.reserve(first.json()["available_dates"][0], "morning")
+                changed = await client.get("/api/availability", headers={"If-None-Match": etag})
+                return first, not_modified, changed
+
+        first, not_modified, changed = run_db(scenario, indexes=("slot_capacity",))
+        assert first.status_code == 200
+        assert "max-age=" in first.headers["cache-control"]
+        assert not_modified.status_code == 304
+        assert not_modified.content == b""
+        assert not_modified.headers["etag"] == first.headers["etag"]
+        assert changed.status_code == 200
+        assert changed.headers["etag"] != first.headers["etag"]
+        day = first.json()["available_dates"][0]
+        assert changed.json()["slots"][day] == {"morning": 0, "afternoon": 1, "anytime": 1}
@@ -0,0 +1,107 @@
+"""
+GET /api/bookings keyset pagination tests
+"""
+import base64
+import json
+from datetime import datetime, timedelta, timezone
+
+import server
+
+
+def _booking_doc(i, **overrides):
+    created = datetime(2026, 3, 1, tzinfo=timezone.utc) + timedelta(minutes=i // 2)
+    doc = {
+        "id": f"booking-{i:03d}",
+        "service": "lawn_mowing" if i % 2 else "spring_package",
+        "property_size": 100,
+        "condition": "normal",
+        "additional_services": [],
+        "preferred_date": f"2026-04-{i % 28 + 1:02d}",
+        "preferred_time": "morning",
+        "customer_name": f"TEST_{i}",
+        "customer_phone": "+420123456789",
+        "customer_email": f"zakaznik{i % 3}@example.com",
+        "property_address": "Testovací 1",
+        "notes": "",
+        "estimated_price": 200,
+        "status": "confirmed" if i % 5 == 0 else "pending",
+        # Pairs of bookings share a timestamp so the id tie-breaker matters
+        "created_at": created.isoformat(),
+    }
+    doc.update(overrides)
+    return doc
+
+
+def _with_bookings(run_db, api_client, scenario):
+    async def with_client(db):
+        await db.bookings.insert_many([_booking_doc(i) for i in range(25)])
+        async with api_client(db) as client:
+            return await scenario(client)
+
+    return run_db(with_client)
+
+
+async def _collect_pages(client, **params):
+    pages, cursor = [], None
+    while True:
+        query = dict(params, **({"cursor": cursor} if cursor else {}))
+        response = await client.get("/api/bookings", params=query)
+        assert response.status_code == 200
+        pages.append(response.json())
+        cursor = response.headers.get("X-Next-Cursor")
+        if not cursor:
+            return pages
+
+
+class TestBookingsPagination:
+    """Cursor walk, filters and cursor validation"""
+
+    def test_walks_all_bookings_newest_first(self, run_db, api_client):
+        pages = _with_bookings(run_db, api_client, lambda client: _collect_pages(client, limit=10))
+
+        assert [len(page) for page in pages] == [10, 10, 5]
+        ids = [b["id"] for page in pages for b in page]
+        assert len(set(ids)) == 25
+        keys = [(b["created_at"], b["id"]) for page in pages for b in page]
+        assert keys == sorted(keys, reverse=True)
+
+    def test_filters_apply_across_pages(self, run_db, api_client):
+        pages = _with_bookings(run_db, api_client, lambda client: _collect_pages(
+            client, limit=2, status="pending", customer_email="zakaznik1@example.com"
+        ))
+
+        bookings = [b for page in pages for b in page]
+        expected = [i for i in range(25) if i % 5 and i % 3 == 1]
+        assert sorted(b["id"] for b in bookings) == [f"booking-{i:03d}" for i in expected]
+
+    def test_date_range_filter(self, run_db, api_client):
+        async def scenario(client):
+            response = await client.get("/api/bookings", params={"date_from": "2026-04-05", "date_to": "2026-04-07"})
+            return response.json()
+
+        bookings = _with_bookings(run_db, api_client, scenario)
+        assert {b["preferred_date"] for b in bookings} == {"2026-04-05", "2026-04-06", "2026-04-07"}
+
+    def test_invalid_cursor_is_rejected(self, run_db, api_client):
+        async def scenario(client):
+            return await client.get("/api/bookings", params={"cursor": "not-a-cursor"})
+
+        assert _with_bookings(run_db, api_client, scenario).status_code == 400
+
+    def test_cursor_with_query_operators_is_rejected(self, run_db, api_client):
+        forged = base64.urlsafe_b64encode(json.dumps([{"$gt": ""}, "x"]).encode()).decode()
+
+        async def scenario(client):
+            return await client.get("/api/bookings", params={"cursor": forged})
+
+        response = _with_bookings(run_db, api_client, scenario)
+        assert response.status_code == 400
+        assert response.json()["detail"] == "Neplatný kurzor"
+
+
+def test_cursor_round_trip():
+    cursor = server.encode_cursor({"created_at": "2026-03-01T10:00:00+00:00", "id": "abc"})
+    assert server.decode_cursor(cursor) == {"$or": [
+        {"created_at": {"$lt": "2026-03-01T10:00:00+00:00"}},
+        {"created_at": "2026-03-01T10:00:00+00:00", "id": {"$lt": "abc"}},
+    ]}
@@ -0,0 +1,108 @@
+"""
+Slot capacity tests
+"""
+import asyncio
+from datetime import datetime, timedelta, timezone
+
+import server
+from capacity import CapacityLimits, SlotCapacity, SlotFullError
+
+LIMITS = CapacityLimits(per_day=4, per_half_day=2)
+
+
+class TestCapacityLimits:
+    """Remaining places from a counter document"""
+
+    def test_half_day_slots_are_capped_by_the_day(self):
+        limits = CapacityLimits(per_day=4, per_half_day=3)
+        assert limits.remaining({}) == {"morning": 3, "afternoon": 3, "anytime": 4}
+        assert limits.remaining({"morning": 1, "anytime": 2, "total": 3}) == {"morning": 1, "afternoon": 1, "anytime": 1}
+        assert limits.remaining({"morning": 3, "afternoon": 3, "total": 6}) == {"morning": 0, "afternoon": 0, "anytime": 0}
+
+
+class TestSlotCapacity:
+    """Atomic reservations"""
+
+    def test_concurrent_reservations_never_overbook(self, run_db):
+        async def scenario(db):
+            capacity = SlotCapacity(db.slot_capacity, LIMITS)
+
+            async def attempt(slot):
+                try:
+                    await capacity.reserve("2026-05-04", slot)
+                    return True
+                except SlotFullError:
+                    return False
+
+            results = await asyncio.gather(*[attempt("morning") for _ in range(6)], *[attempt("anytime") for _ in range(6)])
+            return results[:6].count(True), results.count(True), await capacity.remaining(["2026-05-04"])
+
+        morning_ok, total_ok, remaining = run_db(scenario, indexes=("slot_capacity",))
+        assert morning_ok == 2
+        assert total_ok == 4
+        assert remaining == {"2026-05-04": {"morning": 0, "afternoon": 0, "anytime": 0}}
+
+    def test_other_slots_stay_bookable_after_the_first_booking_of_a_day(self, run_db):
+        async def scenario(db):
+            capacity = SlotCapacity(db.slot_capacity, LIMITS)
+            await capacity.reserve("2026-05-04", "afternoon")
+            await capacity.reserve("2026-05-04", "morning")
+            await capacity.reserve("2026-05-05", "anytime")
+            await capacity.reserve("2026-05-05", "morning")
+            await capacity.reserve("2026-05-05", "afternoon")
+            return await capacity.remaining(["2026-05-04", "2026-05-05"])
+
+        assert run_db(scenario, indexes=("slot_capacity",)) == {
+            "2026-05-04": {"morning": 1, "afternoon": 1, "anytime": 2},
+            "2026-05-05": {"morning": 1, "afternoon": 1, "anytime": 1},
+        }
+
+    def test_release_and_range_read(self, run_db):
+        async def scenario(db):
+            capacity = SlotCapacity(db.slot_capacity, LIMITS)
+            await capacity.reserve("2026-05-04", "afternoon")
+            await capacity.reserve("2026-05-06", "unknown-slot")  # counted as anytime
+            await capacity.release("2026-05-04", "afternoon")
+            await capacity.release("2026-05-05", "afternoon")  # nothing to release
+            return await capacity.remaining(["2026-05-06", "2026-05-04", "2026-05-05"])
+
+        assert run_db(scenario, indexes=("slot_capacity",)) == {
+            "2026-05-04": {"morning": 2, "afternoon": 2, "anytime": 4},
+            "2026-05-05": {"morning": 2, "afternoon": 2, "anytime": 4},
+            "2026-05-06": {"morning": 2, "afternoon": 2, "anytime": 3},
+        }
+
+
+class TestBookingCapacity:
+    """POST /api/bookings and GET /api/availability share the counters"""
+
+    def test_full_slot_is_rejected_and_hidden(self, run_db, api_client):
+        tomorrow = (datetime.now(timezone.utc).date() + timedelta(days=1))
+        if tomorrow.weekday() == 6:
+            tomorrow += timedelta(days=1)
+        booking = {
+            "service": "lawn_mowing", "property_size": 100, "condition": "normal",
+            "preferred_date": tomorrow.isoformat(), "preferred_time": "anytime",
+            "customer_name": "TEST Kapacita", "customer_phone": "+420123456789",
+            "customer_email": "kapacita@example.com", "property_address": "Testovací 1",
+            "estimated_price": 200,
+        }
+
+        async def scenario(db):
+            capacity = SlotCapacity(
+                db.slot_capacity, CapacityLimits(per_day=1, per_half_day=1), on_change=server.availability_cache.invalidate
+            )
+            server.availability_cache.invalidate()
+            async with api_client(db, slot_capacity=capacity) as client:
+                first = await client.post("/api/bookings", json=booking)
+                second = await client.post("/api/bookings", json=booking)
+                availability = await client.get("/api/availability")
+                return first, second, availability, await db.bookings.count_documents({})
+
+        first, second, availability, stored = run_db(scenario, indexes=("slot_capacity",))
+        assert first.status_code == 200
+        assert second.status_code == 409
+        assert stored == 1
+        data = availability.json()
+        assert tomorrow.isoformat() not in data["available_dates"]
+        assert data["slots"][tomorrow.isoformat()] == {"morning": 0, "afternoon": 0, "anytime": 0}
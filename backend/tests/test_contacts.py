@@ -0,0 +1,129 @@
+"""
+Resend contact registry tests
+"""
+import asyncio
+from datetime import datetime
+
+from contacts import ContactRegistry, split_name
+
+
+class _FakeResend:
+    def __init__(self, fail=()):
+        self.fail = set(fail)
+        self.created = []
+
+    async def __call__(self, payload):
+        if payload["email"] in self.fail:
+            raise RuntimeError("503 Service Unavailable")
+        self.created.append(payload["email"])
+
+
+def _with_registry(run_db, scenario, resend=None, **options):
+    async def with_registry(db):
+        fake = resend or _FakeResend()
+        return await scenario(db, ContactRegistry(db.contacts_synced, fake, **options), fake)
+
+    return run_db(with_registry, indexes=("contacts_synced",))
+
+
+class TestContactRegistry:
+    """Deduplication and batched sync"""
+
+    def test_split_name(self):
+        assert split_name("Jan Novák Starší") == {"first_name": "Jan", "last_name": "Novák Starší"}
+        assert split_name("") == {"first_name": "", "last_name": ""}
+
+    def test_repeat_customers_cost_no_calls(self, run_db):
+        async def scenario(db, registry, resend):
+            first = await registry.register("Jan@Example.com", "Jan", "Novák")
+            await registry.sync_pending()
+            repeats = [await registry.register("jan@example.com") for _ in range(5)]
+            await registry.sync_pending()
+            stored = await db.contacts_synced.find({}, {"_id": 0}).to_list(None)
+            return first, repeats, resend.created, stored, registry.stats()
+
+        first, repeats, created, stored, stats = _with_registry(run_db, scenario)
+        assert first is True and repeats == [False] * 5
+        assert created == ["jan@example.com"]
+        assert len(stored) == 1
+        assert stored[0]["status"] == "synced"
+        assert stored[0]["payload"]["first_name"] == "Jan"
+        assert stats["queued"] == 1 and stats["skipped"] == 5 and stats["synced"] == 1
+
+    def test_warm_up_skips_contacts_from_other_workers(self, run_db):
+        async def scenario(db, registry, resend):
+            other = ContactRegistry(db.contacts_synced, resend)
+            await other.register("eva@example.com")
+            await other.register("petr@example.com")
+            warmed = await registry.warm()
+            queued = await registry.register("eva@example.com")
+            # Not yet in memory but already in Mongo: the upsert matches, nothing is queued twice
+            late = ContactRegistry(db.contacts_synced, resend)
+            queued_late = await late.register("petr@example.com")
+            return warmed, queued, queued_late, await db.contacts_synced.count_documents({})
+
+        assert _with_registry(run_db, scenario) == (2, False, False, 2)
+
+    def test_failures_back_off_then_give_up(self, run_db):
+        async def scenario(db, registry, resend):
+            await registry.register("ok@example.com")
+            await registry.register("down@example.com")
+            processed = [await registry.sync_pending()]
+            for _ in range(2):
+                await db.contacts_synced.update_many({"status": "pending"}, {"$set": {"next_attempt_at": datetime(2000, 1, 1)}})
+                processed.append(await registry.sync_pending())
+            down = await db.contacts_synced.find_one({"email": "down@example.com"}, {"_id": 0})
+            return processed, resend.created, down, registry.stats()
+
+        processed, created, down, stats = _with_registry(
+            run_db, scenario, _FakeResend(fail={"down@example.com"}), max_attempts=2, base_delay=60
+        )
+        # Second pass retries only the failed contact; after that it is given up on
+        assert processed == [2, 1, 0]
+        assert created == ["ok@example.com"]
+        assert down["status"] == "failed" and down["attempts"] == 2
+        assert stats["failed"] == 1
+
+    def test_background_sync_batches(self, run_db):
+        async def scenario(db, registry, resend):
+            for i in range(7):
+                await registry.register(f"{i}@example.com")
+            registry.start()
+            for _ in range(100):
+                if len(resend.created) == 7:
+                    break
+                await asyncio.sleep(0.01)
+            await registry.stop()
+            return sorted(resend.created), await db.contacts_synced.count_documents({"status": "synced"})
+
+        created, synced = _with_registry(run_db, scenario, batch_size=3, interval=60)
+        assert created == sorted(f"{i}@example.com" for i in range(7))
+        assert synced == 7
+
+    def test_concurrent_syncs_push_each_contact_once(self, run_db):
+        async def scenario(db, registry, resend):
+            for i in range(10):
+                await registry.register(f"{i}@example.com")
+            other = ContactRegistry(db.contacts_synced, resend, batch_size=4)
+            processed = await asyncio.gather(registry.sync_pending(), other.sync_pending(), registry.sync_pending())
+            return processed, resend.created, await db.contacts_synced.count_documents({"status": "synced"})
+
+        processed, created, synced = _with_registry(run_db, scenario, batch_size=4, concurrency=3)
+        assert sorted(created) == sorted(f"{i}@example.com" for i in range(10))
+        assert sum(processed) == 10 and max(processed) <= 4
+        assert synced == 10
+
+    def test_expired_leases_are_reclaimed(self, run_db):
+        async def scenario(db, registry, resend):
+            await registry.register("stuck@example.com")
+            # A worker claimed it and died before finishing
+            await db.contacts_synced.update_one(
+                {"email": "stuck@example.com"},
+                {"$set": {"status": "syncing", "attempts": 1, "lease_expires_at": datetime(2000, 1, 1)}},
+            )
+            processed = await registry.sync_pending()
+            return processed, resend.created, await db.contacts_synced.find_one({}, {"_id": 0})
+
+        processed, created, stored = _with_registry(run_db, scenario)
+        assert processed == 1 and created == ["stuck@example.com"]
+        assert stored["status"] == "synced" and stored["attempts"] == 2 and stored["lease_expires_at"] is None
@@ -0,0 +1,234 @@
+"""
+Coupon redemption, lookup cache and code pool tests
+"""
+import asyncio
+
+import server
+from capacity import CapacityLimits, SlotCapacity
+import coupons
+from coupons import (
+    CouponCache, CouponCodePool, CouponNotFoundError, CouponUsedError, apply_discount, generate_codes,
+    normalize_code, redeem_coupon,
+)
+
+BOOKING = {
+    "service": "spring_package",
+    "property_size": 300,
+    "condition": "normal",
+    "additional_services": ["mulching"],
+    "preferred_date": "2026-06-02",
+    "preferred_time": "anytime",
+    "customer_name": "TEST_Marie Coupon",
+    "customer_phone": "+420111222333",
+    "customer_email": "kupon@example.com",
+    "property_address": "Slevová 789, Ostrava",
+    "estimated_price": 1,  # ignored, the server prices the booking
+    "gdpr_consent": True,
+}
+
+
+class TestDiscount:
+    """Price arithmetic"""
+
+    def test_rounds_half_up(self):
+        assert apply_discount(3150, 5) == 2993  # 2992.5
+        assert apply_discount(200, 5) == 190
+        assert apply_discount(333, 5) == 316  # 316.35
+        assert apply_discount(0, 5) == 0
+
+    def test_normalize_code(self):
+        assert normalize_code("  seknuab12c ") == "SEKNUAB12C"
+
+
+class _Loader:
+    def __init__(self, coupons, delay=0.0):
+        self.coupons = coupons
+        self.delay = delay
+        self.calls = []
+
+    async def __call__(self, code):
+        self.calls.append(code)
+        await asyncio.sleep(self.delay)
+        return self.coupons.get(code)
+
+
+class TestCouponCache:
+    """TTL + LRU lookup cache"""
+
+    def test_hits_and_negative_hits(self):
+        async def scenario():
+            cache, load = CouponCache(), _Loader({"SEKNU1": {"used": False}})
+            for code in ("SEKNU1", "SEKNU1", "NOPE", "NOPE", "NOPE"):
+                await cache.get(code, load)
+            return cache.stats(), load.calls
+
+        stats, calls = asyncio.run(scenario())
+        assert calls == ["SEKNU1", "NOPE"]
+        assert stats["hits"] == 1 and stats["negative_hits"] == 2 and stats["misses"] == 2
+        assert stats["hit_rate"] == 0.6
+
+    def test_ttls_lru_bound_and_invalidation(self):
+        async def scenario():
+            cache, load = CouponCache(max_size=2, ttl=60, negative_ttl=0), _Loader({"A": {}, "B": {}, "C": {}})
+            await cache.get("NOPE", load)
+            await cache.get("NOPE", load)  # negative entries expire on their own TTL
+            await cache.get("A", load)
+            await cache.get("B", load)
+            await cache.get("A", load)  # A becomes most recent
+            await cache.get("C", load)  # evicts NOPE, then B
+            await cache.get("A", load)
+            cache.invalidate("A")
+            await cache.get("A", load)
+            return cache.stats(), load.calls
+
+        stats, calls = asyncio.run(scenario())
+        assert calls == ["NOPE", "NOPE", "A", "B", "C", "A"]
+        assert stats["size"] == 2
+        assert stats["evictions"] == 2
+
+    def test_invalidation_during_load_is_not_cached(self):
+        async def scenario():
+            cache, load = CouponCache(), _Loader({"A": {"used": False}}, delay=0.01)
+            pending = asyncio.ensure_future(cache.get("A", load))
+            await asyncio.sleep(0)
+            cache.invalidate("A")
+            await pending
+            await cache.get("A", load)
+            return load.calls
+
+        assert asyncio.run(scenario()) == ["A", "A"]
+
+
+class TestRedemption:
+    """Atomic redemption"""
+
+    @staticmethod
+    def _with_coupon(run_db, api_client, scenario):
+        async def with_client(db):
+            await db.coupons.insert_one({"code": "SEKNUTEST1", "discount_percent": 5, "used": False})
+            capacity = SlotCapacity(db.slot_capacity, CapacityLimits(per_day=100, per_half_day=100))
+            async with api_client(db, slot_capacity=capacity, coupon_cache=CouponCache()) as client:
+                return await scenario(db, client)
+
+        return run_db(with_client, indexes=("coupons", "slot_capacity"))
+
+    def test_parallel_bookings_redeem_once(self, run_db, api_client):
+        async def scenario(db, client):
+            responses = await asyncio.gather(*[
+                client.post("/api/bookings", json=dict(BOOKING, coupon_code="seknutest1")) for _ in range(20)
+            ])
+            coupon = await db.coupons.find_one({"code": "SEKNUTEST1"}, {"_id": 0})
+            stored = await db.bookings.find({}, {"_id": 0}).to_list(None)
+            slots = await db.slot_capacity.find_one({"date": BOOKING["preferred_date"]}, {"_id": 0})
+            return responses, coupon, stored, slots
+
+        responses, coupon, stored, slots = self._with_coupon(run_db, api_client, scenario)
+        winners = [r for r in responses if r.status_code == 200]
+        assert len(winners) == 1
+        assert sorted({r.status_code for r in responses}) == [200, 400]
+
+        booking = winners[0].json()
+        assert booking["coupon_code"] == "SEKNUTEST1"
+        assert booking["estimated_price"] == 3150
+        assert booking["final_price"] == 2993
+        assert booking["discount_applied"] == 157
+        assert coupon["used"] is True
+        assert coupon["booking_id"] == booking["id"]
+        # Losers were not stored and gave their slot back
+        assert [doc["id"] for doc in stored] == [booking["id"]]
+        assert slots["total"] == 1
+
+    def test_booking_without_coupon_and_unknown_code(self, run_db, api_client):
+        async def scenario(db, client):
+            plain = await client.post("/api/bookings", json=BOOKING)
+            unknown = await client.post("/api/bookings", json=dict(BOOKING, coupon_code="NEEXISTUJE"))
+            return plain, unknown
+
+        plain, unknown = self._with_coupon(run_db, api_client, scenario)
+        assert plain.json()["final_price"] == plain.json()["estimated_price"] == 3150
+        assert plain.json()["coupon_code"] is None
+        assert unknown.status_code == 404
+
+    def test_validation_sees_redemption(self, run_db, api_client):
+        async def scenario(db, client):
+            before = await client.post("/api/coupons/validate", json={"code": "seknutest1"})
+            await client.post("/api/bookings", json=dict(BOOKING, coupon_code="SEKNUTEST1"))
+            after = await client.post("/api/coupons/validate", json={"code": "SEKNUTEST1"})
+            return before, after
+
+        before, after = self._with_coupon(run_db, api_client, scenario)
+        assert before.status_code == 200
+        assert after.status_code == 400
+
+    def test_redeem_errors(self, run_db, api_client):
+        async def scenario(db, client):
+            await redeem_coupon(db.coupons, "SEKNUTEST1", "b1")
+            errors = []
+            for code in ("SEKNUTEST1", "SEKNUNOPE"):
+                try:
+                    await redeem_coupon(db.coupons, code, "b2")
+                except Exception as e:
+                    errors.append(type(e))
+            return errors
+
+        assert self._with_coupon(run_db, api_client, scenario) == [CouponUsedError, CouponNotFoundError]
+
+
+class TestCouponCodePool:
+    """Pre-reserved code allocation"""
+
+    def test_generated_codes(self):
+        codes = generate_codes(2000)
+        assert len(set(codes)) == 2000
+        assert all(len(code) == 10 and code.startswith("SEKNU") and code.isalnum() and code.isupper() for code in codes)
+
+    def test_issue_refills_in_background(self, run_db):
+        async def scenario(db):
+            pool = CouponCodePool(db.coupons, size=10, low_watermark=5)
+            issued = [await pool.issue({"email": f"{i}@example.com", "used": False}) for i in range(8)]
+            await pool._refill_task
+            placeholders = await db.coupons.count_documents({"reserved": True})
+            real = await db.coupons.find({"reserved": {"$exists": False}}, {"_id": 0}).to_list(None)
+            return issued, pool.stats(), placeholders, real
+
+        issued, stats, placeholders, real = run_db(scenario, indexes=("coupons",))
+        assert len(set(issued)) == 8
+        assert sorted(doc["code"] for doc in real) == sorted(issued)
+        assert stats["available"] == placeholders == 10
+        assert stats["issued"] == 8
+        assert stats["refills"] == 2
+
+    def test_existing_codes_are_skipped(self, run_db, monkeypatch):
+        monkeypatch.setattr(coupons, "generate_codes", lambda count: ["SEKNUTAKEN", "SEKNUFREE1"][:count])
+
+        async def scenario(db):
+            await db.coupons.insert_one({"code": "SEKNUTAKEN", "email": "a@example.com", "used": False})
+            pool = CouponCodePool(db.coupons, size=2, low_watermark=0)
+            added = await pool.refill()
+            code = await pool.issue({"email": "b@example.com", "used": False})
+            taken = await db.coupons.find_one({"code": "SEKNUTAKEN"}, {"_id": 0})
+            return added, code, pool.stats(), taken
+
+        added, code, stats, taken = run_db(scenario, indexes=("coupons",))
+        assert added == 1
+        assert code == "SEKNUFREE1"
+        assert stats["collisions"] == 1
+        assert taken["email"] == "a@example.com"
+
+    def test_placeholders_are_not_valid_coupons(self, run_db):
+        async def scenario(db):
+            pool = CouponCodePool(db.coupons, size=1, low_watermark=0)
+            await pool.refill()
+            (code,) = pool._codes
+            original_db, server.db = server.db, db
+            try:
+                loaded = await server.load_coupon(code)
+            finally:
+                server.db = original_db
+            try:
+                await redeem_coupon(db.coupons, code, "b1")
+            except CouponNotFoundError:
+                return loaded, "not found"
+            return loaded, "redeemed"
+
+        assert run_db(scenario, indexes=("coupons",)) == (None, "not found")
@@ -0,0 +1,52 @@
+"""
+Index provisioning tests
+"""
+import asyncio
+
+from db_indexes import HOT_QUERIES, REQUIRED_INDEXES, IndexSpec, check_query_plans, ensure_indexes
+
+
+class TestIndexProvisioning:
+    """Idempotent reconciliation and query plans"""
+
+    def test_ensure_indexes_is_idempotent(self, mongo_db):
+        async def scenario():
+            db = mongo_db()
+            first = await ensure_indexes(db)
+            second = await ensure_indexes(db)
+            return first, second
+
+        first, second = asyncio.run(scenario())
+        assert set(first.values()) == {"created"}
+        assert set(second.values()) == {"ok"}
+        assert len(first) == len(REQUIRED_INDEXES)
+
+    def test_changed_definition_is_rebuilt(self, mongo_db):
+        async def scenario():
+            db = mongo_db()
+            await db.coupons.create_index([("code", 1)], name="coupons_code_unique")
+            report = await ensure_indexes(db, [IndexSpec("coupons", (("code", 1),), "coupons_code_unique", unique=True)])
+            return report, await db.coupons.index_information()
+
+        report, info = asyncio.run(scenario())
+        assert report == {"coupons_code_unique": "rebuilt"}
+        assert info["coupons_code_unique"]["unique"] is True
+
+    def test_hot_queries_do_not_collscan(self, mongod_db):
+        """get_booking, subscribe_email and validate_coupon lookups are index-backed (requires a local mongod)"""
+        async def scenario():
+            db = mongod_db()
+            # Plans are only meaningful on non-empty collections
+            await db.bookings.insert_many([
+                {"id": f"b{i}", "preferred_date": f"2026-05-{i % 28 + 1:02d}", "status": "pending"} for i in range(50)
+            ])
+            await db.subscribers.insert_many([{"email": f"s{i}@example.com"} for i in range(50)])
+            await db.coupons.insert_many([{"code": f"SEKNU{i:05d}"} for i in range(50)])
+            await ensure_indexes(db)
+            return await check_query_plans(db)
+
+        plans = asyncio.run(scenario())
+        assert set(plans) == {description for description, _, _ in HOT_QUERIES}
+        for description, stages in plans.items():
+            assert "COLLSCAN" not in stages, f"{description}: {stages}"
+            assert "IXSCAN" in stages or "EXPRESS_IXSCAN" in stages or "IDHACK" in stages
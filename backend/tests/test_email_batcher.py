@@ -0,0 +1,61 @@
+"""
+Email batching tests against the local Resend stub
+"""
+import asyncio
+
+from email_batcher import EmailBatcher
+from resend_client import AsyncResendClient, ResendAPIError
+from resend_stub import StubState, run_stub
+
+
+def _message(to="zakaznik@example.com"):
+    return {"from": "rezervace@seknuto.cz", "to": [to] if to else [], "subject": "Test", "html": "<p>x</p>"}
+
+
+def _send_many(url, messages, **batcher_options):
+    async def scenario():
+        client = AsyncResendClient("re_test", url)
+        try:
+            return await EmailBatcher(client, **batcher_options).send_many(messages)
+        finally:
+            await client.close()
+
+    return asyncio.run(scenario())
+
+
+class TestEmailBatcher:
+    """Chunked batch requests with per-message results"""
+
+    def test_messages_share_one_request(self):
+        """Customer and admin emails sent together go out as one batch call"""
+        with run_stub() as (url, state):
+            results = _send_many(url, [_message(), _message("admin@seknuto.cz")])
+
+        assert state.paths == ["/emails/batch"]
+        assert state.emails == 2
+        assert results[0]["id"] != results[1]["id"]
+
+    def test_large_lists_are_split_at_max_batch(self):
+        """Chunks of max_batch; a lone leftover message goes out as a plain send"""
+        with run_stub() as (url, state):
+            results = _send_many(url, [_message() for _ in range(7)], max_batch=3)
+
+        assert len(results) == 7
+        assert state.paths == ["/emails/batch", "/emails/batch", "/emails"]
+        assert state.emails == 7
+
+    def test_invalid_message_fails_only_itself(self):
+        """A message rejected by validation does not fail the rest of the batch"""
+        with run_stub() as (url, state):
+            results = _send_many(url, [_message(), _message(to=None), _message()])
+
+        assert "id" in results[0] and "id" in results[2]
+        assert isinstance(results[1], ResendAPIError)
+        assert results[1].code == 422
+
+    def test_request_failure_fails_every_message(self):
+        """A failed batch request is the result of every message in it"""
+        with run_stub(StubState(error_rate=1.0)) as (url, state):
+            results = _send_many(url, [_message() for _ in range(3)])
+
+        assert all(isinstance(r, ResendAPIError) and r.code == 500 for r in results)
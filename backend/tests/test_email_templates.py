@@ -0,0 +1,71 @@
+"""
+Email template engine tests
+"""
+from email_templates import ContactEmailContext, CouponEmailContext
+from server import Booking, email_templates, get_admin_email_html, get_customer_email_html
+
+
+def _booking(**overrides):
+    data = {
+        "service": "spring_package",
+        "property_size": 300,
+        "condition": "normal",
+        "additional_services": ["mulching", "hnojeni"],
+        "preferred_date": "2026-04-10",
+        "preferred_time": "morning",
+        "customer_name": "Jan Novák",
+        "customer_phone": "+420777888999",
+        "customer_email": "jan@example.com",
+        "property_address": "Zahradní 123, Dvůr Králové",
+        "notes": "",
+        "estimated_price": 3150,
+    }
+    data.update(overrides)
+    return Booking(**data)
+
+
+class TestBookingEmails:
+    """Customer confirmation and admin notification"""
+
+    def test_customer_email_contains_booking_details(self):
+        html = get_customer_email_html(_booking())
+        assert html.lstrip().startswith("<!DOCTYPE html>")
+        assert html.rstrip().endswith("</html>")
+        assert "Jan Novák" in html
+        assert "🌸 Jarní balíček – Restart trávníku" in html
+        assert "Dopoledne (8-12h)" in html
+        assert "3150 Kč" in html
+
+    def test_user_input_is_escaped(self):
+        """Customer-supplied fields cannot inject markup"""
+        booking = _booking(customer_name="<script>alert(1)</script>", notes="<b>pozor</b>")
+        for html in (get_customer_email_html(booking), get_admin_email_html(booking)):
+            assert "<script>" not in html
+            assert "&lt;script&gt;" in html
+        assert "&lt;b&gt;pozor&lt;/b&gt;" in get_admin_email_html(booking)
+
+    def test_admin_email_notes_and_add_ons(self):
+        html = get_admin_email_html(_booking(notes="Pes na zahradě"))
+        assert "Poznámka od zákazníka" in html
+        assert "Pes na zahradě" in html
+        assert "mulching, hnojeni" in html
+
+        html = get_admin_email_html(_booking(additional_services=[]))
+        assert "Poznámka od zákazníka" not in html
+        assert "Žádné" in html
+
+
+class TestOtherEmails:
+    """Coupon and contact form emails"""
+
+    def test_coupon_email(self):
+        html = email_templates.render("coupon", CouponEmailContext(coupon_code="SEKNUAB12C"))
+        assert "SEKNUAB12C" in html
+        assert "Objednat se slevou" in html
+
+    def test_contact_email_defaults_missing_phone(self):
+        html = email_templates.render("contact_admin", ContactEmailContext(
+            name="Eva", email="eva@example.com", phone="", message="Dobrý den & díky"
+        ))
+        assert "Neuvedeno" in html
+        assert "Dobrý den &amp; díky" in html
@@ -0,0 +1,114 @@
+"""
+Bounded executor tests
+"""
+import asyncio
+import threading
+import time
+
+import httpx
+import pytest
+
+import server
+from executors import POLICY_CALLER_RUNS, BoundedExecutor, ExecutorSaturatedError
+
+
+def _blocking(seconds, started=None):
+    if started is not None:
+        started.append(threading.current_thread().name)
+    time.sleep(seconds)
+    return seconds
+
+
+class TestBoundedExecutor:
+    """Worker/queue bounds, load shedding and metrics"""
+
+    def test_runs_on_named_workers_and_tracks_wait_vs_execution(self):
+        async def scenario():
+            executor = BoundedExecutor("render", max_workers=2, max_queue=10)
+            threads = []
+            try:
+                results = await asyncio.gather(*[executor.run(_blocking, 0.02, threads) for _ in range(6)])
+            finally:
+                executor.shutdown()
+            return results, threads, executor.stats()
+
+        results, threads, stats = asyncio.run(scenario())
+        assert results == [0.02] * 6
+        assert {name.rsplit("_", 1)[0] for name in threads} == {"render"}
+        assert len(set(threads)) == 2
+        assert stats["completed"] == 6 and stats["pending"] == 0
+        # Six 20 ms calls on two workers: later calls queue for a while
+        assert stats["queue_wait"]["max_ms"] >= 30
+        assert 15 <= stats["execution"]["avg_ms"] < 100
+
+    def test_reject_policy_sheds_load(self):
+        async def scenario():
+            executor = BoundedExecutor("pricing", max_workers=1, max_queue=1)
+            try:
+                results = await asyncio.gather(*[executor.run(_blocking, 0.02) for _ in range(4)], return_exceptions=True)
+            finally:
+                executor.shutdown()
+            return results, executor.stats()
+
+        results, stats = asyncio.run(scenario())
+        assert results[:2] == [0.02, 0.02]
+        assert all(isinstance(result, ExecutorSaturatedError) for result in results[2:])
+        assert stats["rejected"] == 2
+
+    def test_caller_runs_policy_never_drops(self):
+        async def scenario():
+            executor = BoundedExecutor("email", max_workers=1, max_queue=0, policy=POLICY_CALLER_RUNS)
+            try:
+                results = await asyncio.gather(*[executor.run(_blocking, 0.01) for _ in range(3)])
+            finally:
+                executor.shutdown()
+            return results, executor.stats()
+
+        results, stats = asyncio.run(scenario())
+        assert results == [0.01] * 3
+        assert stats["ran_inline"] == 2 and stats["completed"] == 1
+
+    def test_errors_propagate_and_are_counted(self):
+        async def scenario():
+            executor = BoundedExecutor("x", max_workers=1)
+            try:
+                with pytest.raises(ZeroDivisionError):
+                    await executor.run(lambda: 1 / 0)
+            finally:
+                executor.shutdown()
+            return executor.stats()
+
+        stats = asyncio.run(scenario())
+        assert stats["failed"] == 1 and stats["pending"] == 0
+
+    def test_unknown_policy(self):
+        with pytest.raises(ValueError):
+            BoundedExecutor("x", policy="drop_oldest")
+
+
+class TestPricingBatchShedding:
+    """POST /api/pricing/calculate-batch answers 503 when the pricing pool is saturated"""
+
+    def test_saturated_pool_returns_503(self):
+        async def scenario():
+            original = server.pricing_executor
+            server.pricing_executor = BoundedExecutor("pricing", max_workers=1, max_queue=0)
+            try:
+                blocker = asyncio.ensure_future(server.pricing_executor.run(_blocking, 0.1))
+                await asyncio.sleep(0)
+                transport = httpx.ASGITransport(app=server.app)
+                async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+                    body = {"size_range": {"service": "lawn_mowing", "size_from": 100, "size_to": 110}}
+                    shed = await client.post("/api/pricing/calculate-batch", json=body)
+                    await blocker
+                    served = await client.post("/api/pricing/calculate-batch", json=body)
+                return shed, served
+            finally:
+                server.pricing_executor.shutdown()
+                server.pricing_executor = original
+
+        shed, served = asyncio.run(scenario())
+        assert shed.status_code == 503
+        assert shed.headers["Retry-After"] == "1"
+        assert served.status_code == 200
+        assert len(served.json()["results"]) == 11
@@ -0,0 +1,111 @@
+"""
+Streaming export tests
+"""
+import asyncio
+import csv
+import io
+import json
+
+from exports import stream_csv, stream_ndjson
+
+ADMIN = {"X-Admin-Token": "secret"}
+
+
+async def _docs(count):
+    for i in range(count):
+        yield {"id": f"m{i}", "name": f"Jméno {i}", "tags": ["a", "b"], "phone": None}
+
+
+async def _collect(chunks):
+    return [chunk async for chunk in chunks]
+
+
+class TestEncoders:
+    """Chunked NDJSON/CSV encoding"""
+
+    def test_ndjson_one_chunk_per_batch(self):
+        chunks = asyncio.run(_collect(stream_ndjson(_docs(25), batch_size=10)))
+        assert len(chunks) == 3
+        rows = [json.loads(line) for line in b"".join(chunks).decode().splitlines()]
+        assert [r["id"] for r in rows] == [f"m{i}" for i in range(25)]
+        assert rows[0]["name"] == "Jméno 0"
+
+    def test_csv_header_lists_and_nulls(self):
+        chunks = asyncio.run(_collect(stream_csv(_docs(3), ["id", "name", "tags", "phone"], batch_size=2)))
+        assert len(chunks) == 2
+        rows = list(csv.reader(io.StringIO(b"".join(chunks).decode("utf-8-sig"))))
+        assert rows[0] == ["id", "name", "tags", "phone"]
+        assert rows[1] == ["m0", "Jméno 0", "a;b", ""]
+        assert len(rows) == 4
+
+    def test_csv_escapes_formula_cells(self):
+        async def docs():
+            yield {"name": "=HYPERLINK(\"http://evil\")", "phone": "+1+cmd|' /C calc'!A0", "message": "\t=1", "tags": ["@a", "b"]}
+            yield {"name": "Jan", "phone": 420, "message": "a=b", "tags": []}
+            yield {"name": "-Jan", "phone": "\r-1", "message": "-(1)", "tags": ["+", "1"]}
+
+        chunks = asyncio.run(_collect(stream_csv(docs(), ["name", "phone", "message", "tags"], batch_size=10)))
+        rows = list(csv.reader(io.StringIO(b"".join(chunks).decode("utf-8-sig"), newline="")))
+        assert rows[1] == ["'=HYPERLINK(\"http://evil\")", "'+1+cmd|' /C calc'!A0", "'\t=1", "'@a;b"]
+        assert rows[2] == ["Jan", "420", "a=b", ""]
+        assert rows[3] == ["'-Jan", "'\r-1", "-(1)", "'+;1"]
+
+    def test_csv_keeps_phone_numbers_and_negative_numbers(self):
+        async def docs():
+            yield {"customer_phone": "+420 777 123 456", "notes": "-150", "address": "+420777123456"}
+
+        chunks = asyncio.run(_collect(stream_csv(docs(), ["customer_phone", "notes", "address"], batch_size=10)))
+        rows = list(csv.reader(io.StringIO(b"".join(chunks).decode("utf-8-sig"))))
+        assert rows[1] == ["+420 777 123 456", "-150", "+420777123456"]
+
+
+class TestExportEndpoint:
+    """GET /api/export/{collection}"""
+
+    @staticmethod
+    def _get(run_db, api_client, *requests):
+        async def scenario(db):
+            await db.contact_messages.insert_many([
+                {"id": f"c{i}", "name": f"TEST_{i}", "email": "a@example.com", "phone": "", "message": "x",
+                 "status": "new", "created_at": f"2026-03-{i + 1:02d}T10:00:00+00:00"}
+                for i in range(10)
+            ])
+            async with api_client(db, ADMIN_API_TOKEN="secret") as client:
+                return [await client.get(url, params=params, headers=headers) for url, params, headers in requests]
+
+        return run_db(scenario)
+
+    def test_requires_the_admin_token(self, run_db, api_client):
+        anonymous, wrong = self._get(
+            run_db, api_client,
+            ("/api/export/bookings", {}, {}),
+            ("/api/export/bookings", {}, {"X-Admin-Token": "wrong"}),
+        )
+        assert anonymous.status_code == 403
+        assert wrong.status_code == 403
+
+    def test_ndjson_with_projection_and_date_range(self, run_db, api_client):
+        (response,) = self._get(run_db, api_client, ("/api/export/contact_messages", {
+            "fields": "id,created_at", "date_from": "2026-03-03", "date_to": "2026-03-05", "batch_size": 2,
+        }, ADMIN))
+        assert response.status_code == 200
+        assert response.headers["content-type"].startswith("application/x-ndjson")
+        rows = [json.loads(line) for line in response.text.splitlines()]
+        assert [r["id"] for r in rows] == ["c2", "c3", "c4"]
+        assert set(rows[0]) == {"id", "created_at"}
+
+    def test_csv_export(self, run_db, api_client):
+        (response,) = self._get(run_db, api_client, ("/api/export/contact_messages", {"format": "csv", "fields": "id,name"}, ADMIN))
+        rows = list(csv.reader(io.StringIO(response.content.decode("utf-8-sig"))))
+        assert rows[0] == ["id", "name"]
+        assert len(rows) == 11
+        assert "attachment" in response.headers["content-disposition"]
+
+    def test_rejects_unknown_collection_and_fields(self, run_db, api_client):
+        unknown_collection, unknown_field = self._get(
+            run_db, api_client,
+            ("/api/export/subscribers", {}, ADMIN),
+            ("/api/export/bookings", {"fields": "id,password"}, ADMIN),
+        )
+        assert unknown_collection.status_code == 404
+        assert unknown_field.status_code == 400
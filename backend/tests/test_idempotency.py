@@ -0,0 +1,205 @@
+"""
+Idempotency-Key tests
+"""
+import asyncio
+from datetime import datetime, timedelta, timezone
+
+from capacity import CapacityLimits, SlotCapacity
+from idempotency import REPLAYED_HEADER, IdempotencyStore, fingerprint
+
+BOOKING = {
+    "service": "lawn_mowing",
+    "property_size": 300,
+    "condition": "normal",
+    "additional_services": [],
+    "preferred_date": "2026-06-03",
+    "preferred_time": "morning",
+    "customer_name": "TEST_Idempotence",
+    "customer_phone": "+420111222333",
+    "customer_email": "idem@example.com",
+    "property_address": "Opakovaná 1, Brno",
+    "estimated_price": 1,
+    "gdpr_consent": True,
+}
+
+
+class _Handler:
+    def __init__(self, result=None, delay=0.0, error=None):
+        self.result = result if result is not None else {"ok": True}
+        self.delay = delay
+        self.error = error
+        self.calls = 0
+
+    async def __call__(self):
+        self.calls += 1
+        await asyncio.sleep(self.delay)
+        if self.error is not None:
+            error, self.error = self.error, None  # fail once
+            raise error
+        return dict(self.result, call=self.calls)
+
+
+def _with_store(run_db, scenario):
+    async def with_store(db):
+        return await scenario(db, IdempotencyStore(db.idempotency_keys, poll_interval=0.01))
+
+    return run_db(with_store, indexes=("idempotency_keys",))
+
+
+class TestIdempotencyStore:
+    """Claim, replay and coalescing"""
+
+    def test_retry_replays_stored_response(self, run_db):
+        async def scenario(db, store):
+            handler = _Handler()
+            first = await store.run("k1", "bookings", {"a": 1}, handler)
+            again = await store.run("k1", "bookings", {"a": 1}, handler)
+            other_scope = await store.run("k1", "contact", {"a": 1}, handler)
+            record = await db.idempotency_keys.find_one({"_id": "bookings:k1"})
+            return first, again, other_scope, handler.calls, record
+
+        first, again, other_scope, calls, record = _with_store(run_db, scenario)
+        assert calls == 2
+        assert first.body == again.body == b'{"ok":true,"call":1}'
+        assert again.headers[REPLAYED_HEADER] == "true"
+        assert REPLAYED_HEADER not in first.headers
+        assert other_scope.body == b'{"ok":true,"call":2}'
+        assert record["status"] == "done"
+        assert record["expires_at"] > record["created_at"]
+
+    def test_concurrent_duplicates_wait_for_first(self, run_db):
+        async def scenario(db, store):
+            handler = _Handler(delay=0.05)
+            responses = await asyncio.gather(*[store.run("k", "bookings", {"a": 1}, handler) for _ in range(10)])
+            return responses, handler.calls, store.stats()
+
+        responses, calls, stats = _with_store(run_db, scenario)
+        assert calls == 1
+        assert {response.body for response in responses} == {b'{"ok":true,"call":1}'}
+        assert stats["coalesced"] == 9
+        assert stats["inflight"] == 0
+
+    def test_other_process_polls_until_done(self, run_db):
+        async def scenario(db, store):
+            # A second store stands in for another worker process
+            other = IdempotencyStore(db.idempotency_keys, poll_interval=0.01)
+            handler = _Handler(delay=0.05)
+            first = asyncio.ensure_future(store.run("k", "bookings", {"a": 1}, handler))
+            await asyncio.sleep(0.01)
+            second = await other.run("k", "bookings", {"a": 1}, handler)
+            return await first, second, handler.calls
+
+        first, second, calls = _with_store(run_db, scenario)
+        assert calls == 1
+        assert second.body == first.body
+        assert second.headers[REPLAYED_HEADER] == "true"
+
+    def test_key_reuse_with_other_payload_is_rejected(self, run_db):
+        async def scenario(db, store):
+            await store.run("k", "bookings", {"a": 1}, _Handler())
+            return await store.run("k", "bookings", {"a": 2}, _Handler())
+
+        assert _with_store(run_db, scenario).status_code == 422
+
+    def test_failures_release_the_key(self, run_db):
+        async def scenario(db, store):
+            handler = _Handler(error=RuntimeError("boom"))
+            try:
+                await store.run("k", "bookings", {"a": 1}, handler)
+            except RuntimeError:
+                pass
+            retried = await store.run("k", "bookings", {"a": 1}, handler)
+            return retried, handler.calls
+
+        retried, calls = _with_store(run_db, scenario)
+        assert calls == 2
+        assert retried.body == b'{"ok":true,"call":2}'
+
+    def test_abandoned_claim_is_taken_over(self, run_db):
+        async def scenario(db, store):
+            # Owner died mid-request: pending record with an expired lease
+            now = datetime.now(timezone.utc)
+            await db.idempotency_keys.insert_one({
+                "_id": "bookings:k", "status": "pending", "fingerprint": fingerprint({"a": 1}),
+                "lease_expires_at": now - timedelta(seconds=1), "created_at": now, "expires_at": now + timedelta(hours=1),
+            })
+            handler = _Handler()
+            response = await store.run("k", "bookings", {"a": 1}, handler)
+            return response, handler.calls
+
+        response, calls = _with_store(run_db, scenario)
+        assert calls == 1
+        assert response.status_code == 200
+
+    def test_slow_handler_keeps_its_lease(self, run_db):
+        """A handler running longer than the lease is not taken over by another process"""
+        async def scenario(db, store):
+            store.lease_seconds = 0.06
+            other = IdempotencyStore(db.idempotency_keys, lease_seconds=0.06, poll_interval=0.01)
+            handler = _Handler(delay=0.3)
+            first = asyncio.ensure_future(store.run("k", "bookings", {"a": 1}, handler))
+            await asyncio.sleep(0.15)
+            second = await other.run("k", "bookings", {"a": 1}, handler)
+            return await first, second, handler.calls
+
+        first, second, calls = _with_store(run_db, scenario)
+        assert calls == 1
+        assert second.body == first.body
+        assert second.headers[REPLAYED_HEADER] == "true"
+
+
+class TestIdempotentEndpoints:
+    """Idempotency-Key on the POST endpoints"""
+
+    @staticmethod
+    def _with_client(run_db, api_client, scenario):
+        async def with_client(db):
+            capacity = SlotCapacity(db.slot_capacity, CapacityLimits(per_day=100, per_half_day=100))
+            async with api_client(db, slot_capacity=capacity, idempotency=IdempotencyStore(db.idempotency_keys)) as client:
+                return await scenario(db, client)
+
+        return run_db(with_client, indexes=("slot_capacity", "idempotency_keys"))
+
+    def test_booking_retries_create_one_booking(self, run_db, api_client):
+        async def scenario(db, client):
+            headers = {"Idempotency-Key": "booking-1"}
+            responses = await asyncio.gather(*[client.post("/api/bookings", json=BOOKING, headers=headers) for _ in range(5)])
+            retry = await client.post("/api/bookings", json=BOOKING, headers=headers)
+            without_key = await client.post("/api/bookings", json=BOOKING)
+            stored = await db.bookings.count_documents({})
+            slots = await db.slot_capacity.find_one({"date": BOOKING["preferred_date"]}, {"_id": 0})
+            return responses + [retry], without_key, stored, slots
+
+        responses, without_key, stored, slots = self._with_client(run_db, api_client, scenario)
+        assert {response.status_code for response in responses} == {200}
+        assert len({response.json()["id"] for response in responses}) == 1
+        assert without_key.json()["id"] != responses[0].json()["id"]
+        assert stored == 2
+        assert slots["total"] == 2
+
+    def test_error_responses_are_replayed(self, run_db, api_client):
+        async def scenario(db, client):
+            headers = {"Idempotency-Key": "coupon-typo"}
+            booking = dict(BOOKING, coupon_code="NEEXISTUJE")
+            first = await client.post("/api/bookings", json=booking, headers=headers)
+            again = await client.post("/api/bookings", json=booking, headers=headers)
+            return first, again
+
+        first, again = self._with_client(run_db, api_client, scenario)
+        assert first.status_code == again.status_code == 404
+        assert again.json() == first.json() == {"detail": "Neplatný slevový kód"}
+        assert again.headers[REPLAYED_HEADER] == "true"
+
+    def test_contact_form(self, run_db, api_client):
+        async def scenario(db, client):
+            form = {"name": "Jan", "email": "jan@example.com", "phone": "", "message": "Dobrý den"}
+            headers = {"Idempotency-Key": "contact-1"}
+            first = await client.post("/api/contact", json=form, headers=headers)
+            again = await client.post("/api/contact", json=form, headers=headers)
+            too_long = await client.post("/api/contact", json=form, headers={"Idempotency-Key": "x" * 256})
+            return first, again, too_long, await db.contact_messages.count_documents({})
+
+        first, again, too_long, stored = self._with_client(run_db, api_client, scenario)
+        assert again.json() == first.json()
+        assert too_long.status_code == 400
+        assert stored == 1
@@ -0,0 +1,82 @@
+"""
+Queued JSON logging tests
+"""
+import io
+import json
+import logging
+import threading
+
+from log_pipeline import LogPipeline
+
+
+class _Recording:
+    """Argument whose str() records the thread that formatted it"""
+
+    def __init__(self):
+        self.formatted_on = None
+
+    def __str__(self):
+        self.formatted_on = threading.current_thread()
+        return "value"
+
+
+def _logger(name: str) -> logging.Logger:
+    logger = logging.Logger(name)
+    logger.propagate = False
+    return logger
+
+
+class TestLogPipeline:
+    """QueueHandler -> QueueListener pipeline"""
+
+    def test_records_are_json_with_extras_and_exc(self):
+        stream = io.StringIO()
+        pipeline = LogPipeline(stream=stream)
+        logger = _logger("test.json")
+        pipeline.install(logger)
+        try:
+            logger.info("Booking %s created", "b-1", extra={"booking_id": "b-1"})
+            try:
+                raise ValueError("boom")
+            except ValueError:
+                logger.exception("Send failed")
+        finally:
+            pipeline.stop()
+
+        first, second = [json.loads(line) for line in stream.getvalue().splitlines()]
+        assert first["message"] == "Booking b-1 created"
+        assert first["level"] == "INFO"
+        assert first["logger"] == "test.json"
+        assert first["booking_id"] == "b-1"
+        assert "exc" not in first
+        assert second["level"] == "ERROR"
+        assert "ValueError: boom" in second["exc"]
+
+    def test_arguments_are_formatted_on_the_listener_thread(self):
+        stream = io.StringIO()
+        pipeline = LogPipeline(stream=stream, json_format=False)
+        logger = _logger("test.lazy")
+        pipeline.install(logger)
+        value = _Recording()
+        try:
+            logger.info("lazy %s", value)
+        finally:
+            pipeline.stop()
+
+        assert "lazy value" in stream.getvalue()
+        assert value.formatted_on is not None
+        assert value.formatted_on is not threading.current_thread()
+
+    def test_full_queue_drops_instead_of_blocking(self):
+        stream = io.StringIO()
+        pipeline = LogPipeline(stream=stream, queue_size=2)
+        logger = _logger("test.drop")
+        logger.addHandler(pipeline.handler)  # listener not started: nothing drains the queue
+        logger.setLevel(logging.INFO)
+        for i in range(5):
+            logger.info("record %d", i)
+
+        assert pipeline.stats() == {"queued": 2, "max_queue": 2, "dropped": 3}
+        pipeline.start()
+        pipeline.stop()
+        assert [json.loads(line)["message"] for line in stream.getvalue().splitlines()] == ["record 0", "record 1"]
@@ -0,0 +1,88 @@
+"""
+Request metrics and Prometheus exposition tests
+"""
+import asyncio
+
+import httpx
+from fastapi import FastAPI
+
+import server
+from metrics import Counter, MetricsMiddleware, Registry, http_latency, http_requests, span, span_latency
+
+
+def _get(app, *paths):
+    async def scenario():
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            return [await client.get(path) for path in paths]
+
+    return asyncio.run(scenario())
+
+
+class TestPrometheusFormat:
+    """Text exposition format"""
+
+    def test_histogram_buckets_are_cumulative(self):
+        registry = Registry()
+        histogram = registry.histogram("t_seconds", "Test latency", ("route",), buckets=(0.1, 1.0))
+        for value in (0.05, 0.1, 0.5, 3.0):
+            histogram.observe(value, "/a")
+        lines = registry.render().splitlines()
+        assert lines[:2] == ["# HELP t_seconds Test latency", "# TYPE t_seconds histogram"]
+        assert 't_seconds_bucket{route="/a",le="0.1"} 2' in lines
+        assert 't_seconds_bucket{route="/a",le="1.0"} 3' in lines
+        assert 't_seconds_bucket{route="/a",le="+Inf"} 4' in lines
+        assert 't_seconds_count{route="/a"} 4' in lines
+        assert 't_seconds_sum{route="/a"} 3.65' in lines
+
+    def test_counter_labels_are_escaped(self):
+        counter = Counter("t_total", "Test", ("path",))
+        counter.inc('a"b\\c')
+        assert counter.render()[-1] == 't_total{path="a\\"b\\\\c"} 1'
+
+    def test_gauge_collect_and_duplicate_names(self):
+        registry = Registry()
+        registry.gauge("t_pending", "Pending", ("pool",), collect=lambda: {("email",): 3})
+        assert 't_pending{pool="email"} 3' in registry.render()
+        try:
+            registry.counter("t_pending", "again")
+        except ValueError:
+            pass
+        else:
+            raise AssertionError("duplicate metric name accepted")
+
+
+class TestMetricsMiddleware:
+    """Per-route latency, status counts and spans"""
+
+    def test_routes_are_labelled_by_template(self):
+        app = FastAPI()
+        app.add_middleware(MetricsMiddleware)
+
+        @app.get("/items/{item_id}")
+        async def item(item_id: str):
+            with span("test.lookup"):
+                await asyncio.sleep(0)
+            return {"id": item_id}
+
+        before = http_requests.value("/items/{item_id}", "GET", "200")
+        _get(app, "/items/1", "/items/2", "/missing")
+        assert http_requests.value("/items/{item_id}", "GET", "200") == before + 2
+        assert http_requests.value("unmatched", "GET", "404") >= 1
+        assert span_latency.count("/items/{item_id}", "test.lookup") >= 2
+
+    def test_spans_outside_requests_are_background(self):
+        before = span_latency.count("background", "test.job")
+        with span("test.job"):
+            pass
+        assert span_latency.count("background", "test.job") == before + 1
+
+    def test_metrics_endpoint(self):
+        (root, metrics) = _get(server.app, "/api/", "/api/metrics")
+        assert root.status_code == 200
+        assert metrics.headers["content-type"] == "text/plain; version=0.0.4; charset=utf-8"
+        body = metrics.text
+        assert 'seknuto_http_requests_total{route="/api/",method="GET",status="200"}' in body
+        assert 'seknuto_http_request_duration_seconds_bucket{route="/api/",method="GET",le="+Inf"}' in body
+        assert 'seknuto_executor_pending{executor="pricing"} 0' in body
+        assert http_latency.count("/api/", "GET") >= 1
@@ -0,0 +1,275 @@
+"""
+Email outbox dispatcher tests
+"""
+import asyncio
+from datetime import datetime, timedelta, timezone
+
+import server
+from capacity import CapacityLimits, SlotCapacity
+from email_batcher import EmailBatcher
+from outbox import EmailOutbox, OutboxSweeper, PermanentDeliveryError, outbox_entry
+from resend_client import AsyncResendClient
+from resend_stub import run_stub
+
+
+def _per_entry(deliver_one):
+    """Batch deliver function that hands each entry to `deliver_one(kind, payload)`"""
+    async def deliver(batch):
+        return await asyncio.gather(
+            *[deliver_one(entry["kind"], entry["payload"]) for entry in batch], return_exceptions=True
+        )
+
+    return deliver
+
+
+class TestEmailOutbox:
+    """Outbox delivery, retry and drain behaviour"""
+
+    def test_due_entries_are_claimed_and_delivered_in_batches(self, run_db):
+        async def scenario(db):
+            batches = []
+
+            async def deliver(batch):
+                batches.append(sorted(entry["payload"]["n"] for entry in batch))
+                return [None] * len(batch)
+
+            outbox = EmailOutbox(db.email_outbox, deliver, batch_size=10, poll_interval=10)
+            await outbox.enqueue([outbox_entry("email", {"n": n}) for n in range(25)])
+            outbox.start()
+            for _ in range(500):
+                if await db.email_outbox.count_documents({"status": "sent"}) == 25:
+                    break
+                await asyncio.sleep(0.01)
+            await outbox.stop(drain_timeout=5)
+            return batches, await db.email_outbox.count_documents({"status": "sent", "attempts": 1})
+
+        batches, sent = run_db(scenario, indexes=("email_outbox",))
+        assert [len(batch) for batch in batches] == [10, 10, 5]
+        assert sorted(n for batch in batches for n in batch) == list(range(25))
+        assert sent == 25
+
+    def test_delivers_and_retries_transient_failures(self, mongo_db):
+        """Transient errors are retried with backoff until delivery succeeds"""
+        async def scenario():
+            db = mongo_db()
+            calls = []
+
+            async def deliver(kind, payload):
+                calls.append(payload["n"])
+                if payload["n"] == 1 and calls.count(1) < 3:
+                    raise RuntimeError("temporary failure")
+
+            outbox = EmailOutbox(db.email_outbox, _per_entry(deliver), base_delay=0.01, max_delay=0.05, poll_interval=0.02)
+            outbox.start()
+            await outbox.enqueue([outbox_entry("email", {"n": n}) for n in range(3)])
+            for _ in range(200):
+                if await db.email_outbox.count_documents({"status": "sent"}) == 3:
+                    break
+                await asyncio.sleep(0.02)
+            await outbox.stop()
+
+            assert await db.email_outbox.count_documents({"status": "sent"}) == 3
+            retried = await db.email_outbox.find_one({"payload.n": 1})
+            assert retried["attempts"] == 3
+
+        asyncio.run(scenario())
+
+    def test_permanent_failure_is_not_retried(self, mongo_db):
+        """PermanentDeliveryError marks the entry failed after a single attempt"""
+        async def scenario():
+            db = mongo_db()
+
+            async def deliver(kind, payload):
+                raise PermanentDeliveryError("invalid recipient")
+
+            outbox = EmailOutbox(db.email_outbox, _per_entry(deliver), base_delay=0.01, poll_interval=0.02)
+            outbox.start()
+            await outbox.enqueue([outbox_entry("email", {"n": 0})])
+            await asyncio.sleep(0.2)
+            await outbox.stop()
+
+            entry = await db.email_outbox.find_one({})
+            assert entry["status"] == "failed"
+            assert entry["attempts"] == 1
+
+        asyncio.run(scenario())
+
+    def test_stop_finishes_the_batch_in_flight_and_claims_nothing_new(self, run_db):
+        """Shutdown waits for the current batch only; the backlog stays pending for the next process"""
+        async def scenario(db):
+            started = asyncio.Event()
+            delivered = []
+
+            async def deliver(batch):
+                started.set()
+                await asyncio.sleep(0.05)
+                delivered.extend(entry["payload"]["n"] for entry in batch)
+                return [None] * len(batch)
+
+            outbox = EmailOutbox(db.email_outbox, deliver, batch_size=2, poll_interval=10)
+            await outbox.enqueue([outbox_entry("email", {"n": n}) for n in range(5)])
+            outbox.start()
+            await started.wait()
+            await outbox.stop(drain_timeout=5)
+            return delivered, await db.email_outbox.count_documents({"status": "pending", "attempts": 0})
+
+        delivered, pending = run_db(scenario, indexes=("email_outbox",))
+        assert len(delivered) == 2
+        assert pending == 3
+
+    def test_deliveries_cancelled_by_the_drain_timeout_are_released(self, run_db):
+        """Cancelled entries are due again at once instead of waiting out their lease"""
+        async def scenario(db):
+            started = asyncio.Event()
+
+            async def deliver(batch):
+                started.set()
+                await asyncio.sleep(10)
+                return [None] * len(batch)
+
+            outbox = EmailOutbox(db.email_outbox, deliver, batch_size=2, poll_interval=10)
+            await outbox.enqueue([outbox_entry("email", {"n": n}) for n in range(2)])
+            outbox.start()
+            await started.wait()
+            await outbox.stop(drain_timeout=0.05)
+            return await db.email_outbox.find({}, {"_id": 0, "status": 1, "attempts": 1, "lease_expires_at": 1}).to_list(10)
+
+        entries = run_db(scenario, indexes=("email_outbox",))
+        assert entries == [{"status": "pending", "attempts": 0, "lease_expires_at": None}] * 2
+
+
+class TestOutboxSweeper:
+    """Re-enqueueing entries whose enqueue was lost"""
+
+    def test_sweep_queues_only_documents_without_entries(self, mongo_db):
+        async def scenario():
+            db = mongo_db()
+            now = datetime.now(timezone.utc)
+            await db.bookings.insert_many([
+                {"id": "lost", "created_at": (now - timedelta(minutes=10)).isoformat()},
+                {"id": "queued", "created_at": (now - timedelta(minutes=10)).isoformat()},
+                {"id": "in-flight", "created_at": now.isoformat()},
+            ])
+
+            async def deliver(batch):
+                return [None] * len(batch)
+
+            outbox = EmailOutbox(db.email_outbox, deliver)
+            await outbox.enqueue([outbox_entry("email", {"to": ["a@example.com"]}, ref="queued")])
+            sweeper = OutboxSweeper(
+                outbox, db.bookings, lambda doc: [outbox_entry("email", {"booking": doc["id"]}, ref=doc["id"])], grace=60
+            )
+            first = await sweeper.sweep()
+            second = await sweeper.sweep()
+            refs = sorted(await db.email_outbox.distinct("ref"))
+            return first, second, refs
+
+        assert asyncio.run(scenario()) == (1, 0, ["lost", "queued"])
+
+    def test_workers_sweeping_the_same_window_queue_each_email_once(self, run_db):
+        async def scenario(db):
+            created_at = (datetime.now(timezone.utc) - timedelta(minutes=10)).isoformat()
+            await db.bookings.insert_many([{"id": f"b{i}", "created_at": created_at} for i in range(3)])
+
+            async def deliver(batch):
+                return [None] * len(batch)
+
+            def build_entries(doc):
+                return [
+                    outbox_entry("email", {"to": [role]}, ref=doc["id"], entry_id=f"{doc['id']}:{role}")
+                    for role in ("customer", "admin")
+                ]
+
+            # Separate outboxes and sweepers stand in for worker processes (or a restart)
+            sweepers = [
+                OutboxSweeper(EmailOutbox(db.email_outbox, deliver), db.bookings, build_entries) for _ in range(3)
+            ]
+            swept = await asyncio.gather(*[sweeper.sweep() for sweeper in sweepers])
+            again = await sweepers[0].outbox.enqueue(build_entries({"id": "b0"}))
+            return sum(swept), again, await db.email_outbox.count_documents({})
+
+        swept, again, stored = run_db(scenario, indexes=("email_outbox",))
+        assert swept == 3
+        assert again == 0
+        assert stored == 6
+
+
+class _FailingOutbox:
+    async def enqueue(self, entries, session=None):
+        raise RuntimeError("connection reset")
+
+
+class TestBookingEmails:
+    """A stored booking is never reported as failed because its emails could not be queued"""
+
+    def test_enqueue_failure_still_returns_the_booking(self, run_db, api_client):
+        booking = {
+            "service": "lawn_mowing", "property_size": 300, "condition": "normal", "additional_services": [],
+            "preferred_date": "2026-06-10", "preferred_time": "morning", "customer_name": "TEST_Outbox",
+            "customer_phone": "+420111222333", "customer_email": "outbox@example.com",
+            "property_address": "Frontová 1, Brno", "estimated_price": 1, "gdpr_consent": True,
+        }
+
+        async def register_contact(email, name=""):
+            pass
+
+        async def scenario(db):
+            async with api_client(
+                db,
+                slot_capacity=SlotCapacity(db.slot_capacity, CapacityLimits(per_day=100, per_half_day=100)),
+                email_outbox=_FailingOutbox(),
+                resend_client=object(),
+                register_contact=register_contact,
+            ) as client:
+                response = await client.post("/api/bookings", json=booking)
+            return response, await db.bookings.count_documents({})
+
+        response, stored = run_db(scenario)
+        assert response.status_code == 200
+        assert response.json()["customer_name"] == "TEST_Outbox"
+        assert stored == 1
+
+
+class TestServerDelivery:
+    """Request handlers queue their emails; the dispatcher sends them in batch requests"""
+
+    def test_contact_notification_is_queued_not_sent(self, run_db, api_client):
+        async def scenario(db):
+            form = {"name": "Jan", "email": "jan@example.com", "phone": "", "message": "Dobrý den"}
+            outbox = EmailOutbox(db.email_outbox, server.deliver_outbox_batch)
+            async with api_client(db, email_outbox=outbox, resend_client=object(), ADMIN_EMAIL="admin@example.com") as client:
+                response = await client.post("/api/contact", json=form)
+            return response, await db.email_outbox.find_one({}, {"_id": 0})
+
+        response, entry = run_db(scenario)
+        assert response.status_code == 200
+        assert entry["ref"] == response.json()["id"]
+        assert entry["payload"]["to"] == ["admin@example.com"]
+        assert entry["status"] == "pending"
+
+    def test_batch_results_map_to_entries(self):
+        message = {"from": "rezervace@seknuto.cz", "to": ["a@example.com"], "subject": "Test", "html": "<p>x</p>"}
+        entries = [
+            outbox_entry("email", message),
+            outbox_entry("email", dict(message, to=[])),
+            outbox_entry("fax", message),
+            outbox_entry("email", message),
+        ]
+
+        async def scenario(url):
+            client = AsyncResendClient("re_test", url)
+            originals = server.resend_client, server.email_batcher
+            server.resend_client, server.email_batcher = client, EmailBatcher(client)
+            try:
+                return await server.deliver_outbox_batch(entries)
+            finally:
+                server.resend_client, server.email_batcher = originals
+                await client.close()
+
+        with run_stub() as (url, state):
+            errors = asyncio.run(scenario(url))
+
+        assert state.paths == ["/emails/batch"]
+        assert errors[0] is None and errors[3] is None
+        assert isinstance(errors[1], PermanentDeliveryError)
+        assert isinstance(errors[2], PermanentDeliveryError)
@@ -0,0 +1,158 @@
+"""
+Pricing rule tests: the compiled engine and the vectorized batch kernel must match
+the reference rules in calculate_quote exactly
+"""
+import asyncio
+import json
+import random
+import time
+
+import httpx
+from hypothesis import given, settings, strategies as st
+
+import server
+from pricing import (
+    ADDITIONAL_SERVICE_PRICES, ADDITIONAL_SERVICE_PRICES_PER_M2, CONDITION_MULTIPLIERS,
+    PACKAGE_TIERED_PRICING, SERVICE_PRICES, PricingEngine, calculate_quote, calculate_quotes_batch,
+)
+
+SERVICES = list(SERVICE_PRICES) + list(PACKAGE_TIERED_PRICING) + ["unknown_service"]
+CONDITIONS = list(CONDITION_MULTIPLIERS) + ["unknown_condition"]
+EXTRAS = list(ADDITIONAL_SERVICE_PRICES_PER_M2) + list(ADDITIONAL_SERVICE_PRICES) + ["unknown_extra"]
+EDGE_SIZES = [-7, 0, 1, 3, 199, 200, 201, 499, 500, 501, 1001, 12345, 10 ** 9]
+
+
+any_name = st.one_of(st.sampled_from(SERVICES + CONDITIONS + EXTRAS), st.text(max_size=12))
+any_size = st.one_of(st.sampled_from(EDGE_SIZES), st.integers(min_value=-10 ** 6, max_value=10 ** 9))
+
+
+def _assert_identical(cases):
+    services, sizes, conditions, additional = (list(column) for column in zip(*cases))
+    batch = calculate_quotes_batch(services, sizes, conditions, additional)
+    scalar = [calculate_quote(*case) for case in cases]
+    assert batch == scalar
+    # Same JSON too, so ints stay ints and floats stay floats
+    assert json.dumps(batch) == json.dumps(scalar)
+
+
+class TestBatchKernel:
+    """calculate_quotes_batch vs calculate_quote"""
+
+    def test_every_service_condition_and_edge_size(self):
+        cases = [
+            (service, size, condition, extras)
+            for service in SERVICES
+            for condition in CONDITIONS
+            for size in EDGE_SIZES
+            for extras in ([], ["mulching"], ["snow_clearing", "salting", "hnojeni"], ["mulching", "mulching"])
+        ]
+        _assert_identical(cases)
+
+    def test_random_configurations(self):
+        rng = random.Random(9)
+        cases = [
+            (
+                rng.choice(SERVICES),
+                rng.randint(0, 100_000),
+                rng.choice(CONDITIONS),
+                rng.sample(EXTRAS, rng.randint(0, len(EXTRAS))),
+            )
+            for _ in range(5000)
+        ]
+        _assert_identical(cases)
+
+    def test_empty_batch(self):
+        assert calculate_quotes_batch([], [], [], []) == []
+
+
+class TestPricingEngine:
+    """Compiled rule table + LRU cache vs calculate_quote"""
+
+    engine = PricingEngine(cache_size=256)
+
+    @settings(max_examples=2000, deadline=None)
+    @given(
+        service=st.one_of(st.sampled_from(SERVICES), any_name),
+        size=any_size,
+        condition=st.one_of(st.sampled_from(CONDITIONS), any_name),
+        extras=st.lists(st.one_of(st.sampled_from(EXTRAS), any_name), max_size=6),
+    )
+    def test_matches_reference_rules(self, service, size, condition, extras):
+        expected = calculate_quote(service, size, condition, extras)
+        # Twice, so the cached result is checked as well as the computed one
+        for _ in range(2):
+            quote = self.engine.quote(service, size, condition, extras)
+            assert quote == expected
+            assert json.dumps(quote) == json.dumps(expected)
+
+    def test_cache_counters_and_normalized_keys(self):
+        engine = PricingEngine(cache_size=2)
+        engine.quote("lawn_mowing", 100, "normal", ["mulching", "hnojeni"])
+        engine.quote("lawn_mowing", 100, "normal", ["hnojeni", "unknown_extra", "mulching"])
+        engine.quote("unknown_a", 100, "whatever", [])
+        engine.quote("unknown_b", 100, "normal", [])
+        assert engine.cache_info() == {"hits": 2, "misses": 2, "size": 2, "maxsize": 2}
+
+        engine.quote("spring_package", 300, "normal", [])
+        engine.quote("summer_package", 300, "normal", [])
+        engine.quote("lawn_mowing", 100, "normal", ["mulching", "hnojeni"])
+        assert engine.cache_info()["misses"] == 5
+        assert engine.cache_info()["size"] == 2
+
+    def test_callers_cannot_mutate_cached_quotes(self):
+        engine = PricingEngine()
+        first = engine.quote("spring_package", 300, "normal", [])
+        first["estimated_price"] = 0
+        first["tier_info"]["tier"] = "changed"
+        assert engine.quote("spring_package", 300, "normal", []) == calculate_quote("spring_package", 300, "normal", [])
+
+
+class TestBatchEndpoint:
+    """POST /api/pricing/calculate-batch"""
+
+    def _post(self, url, payload):
+        async def scenario():
+            transport = httpx.ASGITransport(app=server.app)
+            async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+                return await client.post(url, json=payload)
+
+        return asyncio.run(scenario())
+
+    def test_items_match_single_endpoint(self):
+        items = [
+            {"service": "spring_package", "property_size": 350, "condition": "normal", "additional_services": ["mulching"]},
+            {"service": "lawn_mowing", "property_size": 120, "condition": "overgrown", "additional_services": []},
+        ]
+        response = self._post("/api/pricing/calculate-batch", {"items": items})
+        assert response.status_code == 200
+        assert response.json()["results"] == [self._post("/api/pricing/calculate", item).json() for item in items]
+
+    def test_stats_expose_pricing_cache(self):
+        async def scenario():
+            transport = httpx.ASGITransport(app=server.app)
+            async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+                return await client.get("/api/stats")
+
+        assert set(asyncio.run(scenario()).json()["pricing_cache"]) == {"hits", "misses", "size", "maxsize"}
+
+    def test_size_range(self):
+        response = self._post("/api/pricing/calculate-batch", {
+            "size_range": {"service": "summer_package", "size_from": 190, "size_to": 210, "step": 5},
+        })
+        results = response.json()["results"]
+        assert [r["property_size"] for r in results] == [190, 195, 200, 205, 210]
+        assert [r["tier_info"]["tier"] for r in results] == ["small"] * 3 + ["medium"] * 2
+
+    def test_rejects_ambiguous_and_oversized_requests(self):
+        item = {"service": "lawn_mowing", "property_size": 100, "condition": "normal"}
+        size_range = {"service": "lawn_mowing", "size_from": 1, "size_to": 10}
+        assert self._post("/api/pricing/calculate-batch", {}).status_code == 422
+        assert self._post("/api/pricing/calculate-batch", {"items": [item], "size_range": size_range}).status_code == 422
+        too_many = dict(size_range, size_to=server.PRICING_BATCH_MAX + 1)
+        assert self._post("/api/pricing/calculate-batch", {"size_range": too_many}).status_code == 422
+
+    def test_huge_range_is_rejected_before_it_is_built(self):
+        huge = {"service": "lawn_mowing", "size_from": 0, "size_to": 10 ** 9}
+        started = time.perf_counter()
+        assert self._post("/api/pricing/calculate-batch", {"size_range": huge}).status_code == 422
+        assert time.perf_counter() - started < 1
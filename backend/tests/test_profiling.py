@@ -0,0 +1,117 @@
+"""
+Sampling profiler tests
+"""
+import asyncio
+import time
+
+import httpx
+from fastapi import FastAPI
+
+import server
+from profiling import AWAIT_FRAME, Profiler, ProfilingMiddleware
+
+
+def _spin(seconds: float) -> None:
+    deadline = time.perf_counter() + seconds
+    while time.perf_counter() < deadline:
+        pass
+
+
+def _profiled_app(profiler: Profiler) -> FastAPI:
+    app = FastAPI()
+    app.add_middleware(ProfilingMiddleware, profiler=profiler)
+
+    @app.post("/work")
+    async def work():
+        _spin(0.05)
+        await asyncio.sleep(0.05)
+        return {"ok": True}
+
+    return app
+
+
+def _post(app, *requests):
+    async def scenario():
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            return [await client.post(path, headers=headers) for path, headers in requests]
+
+    return asyncio.run(scenario())
+
+
+class TestProfiler:
+    """Per-request and continuous profiles"""
+
+    def test_admin_header_profiles_cpu_and_await_time(self):
+        profiler = Profiler(admin_token="secret", on_demand=True, interval=0.002)
+        try:
+            (response,) = _post(_profiled_app(profiler), ("/work", {"X-Profile": "1", "X-Admin-Token": "secret"}))
+        finally:
+            profiler.sampler.stop()
+
+        assert response.status_code == 200
+        profile = profiler.get(response.headers["x-profile-id"])
+        assert profile.requests == 1
+        folded = profile.folded()
+        assert "test_profiling.py:work;test_profiling.py:_spin " in folded
+        assert any(line.rsplit(" ", 1)[0].endswith(AWAIT_FRAME) for line in folded.splitlines())
+        assert all(int(line.rsplit(" ", 1)[1]) > 0 for line in folded.splitlines())
+
+    def test_requests_without_a_valid_token_are_not_profiled(self):
+        profiler = Profiler(admin_token="secret", on_demand=True, interval=0.002)
+        try:
+            responses = _post(
+                _profiled_app(profiler),
+                ("/work", {"X-Profile": "1", "X-Admin-Token": "wrong"}),
+                ("/work", {"X-Profile": "1"}),
+                ("/work", {}),
+            )
+        finally:
+            profiler.sampler.stop()
+
+        assert [r.status_code for r in responses] == [200, 200, 200]
+        assert all("x-profile-id" not in r.headers for r in responses)
+        assert profiler.summaries() == []
+        assert profiler.sampler.samples == 0
+
+    def test_continuous_mode_aggregates_per_route(self):
+        profiler = Profiler(interval=0.002, continuous_rate=1.0, continuous_routes=["POST /work"])
+        assert profiler.enabled
+        try:
+            responses = _post(_profiled_app(profiler), ("/work", {}), ("/work", {}))
+        finally:
+            profiler.sampler.stop()
+
+        assert all("x-profile-id" not in r.headers for r in responses)
+        (summary,) = profiler.summaries()
+        assert summary["id"] == "continuous-post-work"
+        assert summary["requests"] == 2
+        assert "_spin" in profiler.get("continuous-post-work").folded()
+
+    def test_disabled_by_default(self):
+        assert not Profiler().enabled
+        assert not Profiler(continuous_rate=0.5).enabled
+        # The admin token is also used by exports; on its own it must not wrap every request
+        assert not Profiler(admin_token="secret").enabled
+        assert Profiler(admin_token="secret", on_demand=True).enabled
+
+    def test_admin_endpoints_require_the_token(self):
+        async def scenario():
+            transport = httpx.ASGITransport(app=server.app)
+            async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+                return (
+                    await client.get("/api/admin/profiles"),
+                    await client.get("/api/admin/profiles", headers={"X-Admin-Token": "secret"}),
+                    await client.get("/api/admin/profiles/missing", headers={"X-Admin-Token": "secret"}),
+                )
+
+        original = server.ADMIN_API_TOKEN
+        server.ADMIN_API_TOKEN = "secret"
+        try:
+            anonymous, listed, missing = asyncio.run(scenario())
+        finally:
+            server.ADMIN_API_TOKEN = original
+        assert anonymous.status_code == 403
+        assert listed.status_code == 200
+        assert listed.json() == []
+        assert missing.status_code == 404
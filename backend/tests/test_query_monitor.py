@@ -0,0 +1,137 @@
+"""
+MongoDB command monitoring tests
+"""
+import asyncio
+import logging
+import threading
+from types import SimpleNamespace
+
+from metrics import Registry
+from query_monitor import CommandMonitor, filter_shape
+
+COLLSCAN_PLAN = {"queryPlanner": {"winningPlan": {"stage": "COLLSCAN"}}}
+IXSCAN_PLAN = {"queryPlanner": {"winningPlan": {"stage": "FETCH", "inputStage": {"stage": "IXSCAN"}}}}
+
+
+class _ExplainDb:
+    """Stands in for the Motor database: answers explain with a fixed plan"""
+
+    def __init__(self, plan):
+        self.plan = plan
+        self.explained = []
+
+    async def command(self, name, spec, **kwargs):
+        self.explained.append(spec)
+        return self.plan
+
+
+def _run_command(monitor, command_name, command, micros=500, request_id=1, failed=False):
+    started = SimpleNamespace(command_name=command_name, command=command, connection_id=("db", 27017), request_id=request_id)
+    monitor.started(started)
+    finished = SimpleNamespace(duration_micros=micros, connection_id=("db", 27017), request_id=request_id)
+    (monitor.failed if failed else monitor.succeeded)(finished)
+
+
+class TestFilterShape:
+    """Values are masked, structure is kept"""
+
+    def test_shapes(self):
+        assert filter_shape({"email": "jan@example.com"}) == {"email": "?"}
+        assert filter_shape({"date": {"$gte": "2026-01-01", "$lte": "2026-01-31"}}) == {"date": {"$gte": "?", "$lte": "?"}}
+        assert filter_shape({"id": {"$in": ["a", "b"]}}) == {"id": {"$in": "?"}}
+        assert filter_shape({"$or": [{"created_at": {"$lt": 1}}, {"id": 2}]}) == {
+            "$or": [{"created_at": {"$lt": "?"}}, {"id": "?"}]
+        }
+
+
+class TestCommandMonitor:
+    """Latency metrics, slow log and COLLSCAN flagging"""
+
+    def test_commands_are_timed_per_collection(self, caplog):
+        registry = Registry()
+        monitor = CommandMonitor(slow_threshold=0.01, registry=registry)
+        _run_command(monitor, "find", {"find": "bookings", "filter": {"id": "b1"}}, request_id=1)
+        _run_command(monitor, "insert", {"insert": "bookings", "documents": [{}]}, request_id=2)
+        _run_command(monitor, "update", {"update": "coupons", "updates": [{"q": {"code": "X"}, "u": {}}]},
+                     request_id=3, failed=True)
+        _run_command(monitor, "hello", {"hello": 1}, request_id=4)
+        with caplog.at_level(logging.WARNING, logger="query_monitor"):
+            _run_command(monitor, "find", {"find": "subscribers", "filter": {"email": "jan@example.com"}},
+                         micros=25000, request_id=5)
+
+        assert monitor.latency.count("bookings", "find") == 1
+        assert monitor.latency.count("bookings", "insert") == 1
+        assert monitor.failures.value("coupons", "update") == 1
+        assert monitor.slow_commands.value("subscribers", "find") == 1
+        assert monitor.stats()["commands"] == 4
+        assert 'filter {"email":"?"}' in caplog.text
+        assert "jan@example.com" not in caplog.text
+        assert "seknuto_mongo_command_duration_seconds_count" in registry.render()
+
+    def test_new_shapes_are_explained_once_and_collscans_flagged(self):
+        db = _ExplainDb(COLLSCAN_PLAN)
+        monitor = CommandMonitor()
+
+        async def scenario():
+            monitor.start(db)
+            for i in range(3):
+                _run_command(monitor, "find", {"find": "subscribers", "filter": {"email": f"s{i}@example.com"}},
+                             request_id=i)
+                await asyncio.sleep(0)
+
+        asyncio.run(scenario())
+        assert len(db.explained) == 1
+        assert monitor.collscan_shapes() == ['subscribers.find {"email":"?"}']
+        # Flagged when the explain finished and on every later execution
+        assert monitor.collscans.value("subscribers", "find") == 3
+
+    def test_indexed_shapes_are_not_flagged(self):
+        monitor = CommandMonitor()
+
+        async def scenario():
+            monitor.start(_ExplainDb(IXSCAN_PLAN))
+            _run_command(monitor, "find", {"find": "coupons", "filter": {"code": "SEKNU00001"}})
+            await asyncio.sleep(0)
+
+        asyncio.run(scenario())
+        assert monitor.collscan_shapes() == []
+        assert monitor.stats()["shapes"] == 1
+
+    def test_events_from_worker_threads_are_recorded_on_the_loop(self):
+        monitor = CommandMonitor(explain_shapes=False)
+        recorded_on = []
+        record = monitor.record
+        monitor.record = lambda *args: (recorded_on.append(threading.current_thread()), record(*args))
+
+        async def scenario():
+            monitor.start(None)
+            worker = threading.Thread(target=_run_command, args=(monitor, "find", {"find": "bookings", "filter": {}}))
+            worker.start()
+            worker.join()
+            await asyncio.sleep(0)
+
+        asyncio.run(scenario())
+        assert recorded_on == [threading.main_thread()]
+        assert monitor.latency.count("bookings", "find") == 1
+
+    def test_real_collscan_is_detected(self, mongod_db):
+        """An unindexed lookup is flagged on its first execution (requires a local mongod)"""
+        from motor.motor_asyncio import AsyncIOMotorClient
+
+        from conftest import TEST_MONGO_URL
+
+        monitor = CommandMonitor()
+
+        async def scenario():
+            name = mongod_db().name
+            db = AsyncIOMotorClient(TEST_MONGO_URL, event_listeners=[monitor])[name]
+            await db.subscribers.insert_many([{"email": f"s{i}@example.com"} for i in range(20)])
+            monitor.start(db)
+            await db.subscribers.find_one({"email": "s1@example.com"})
+            for _ in range(50):
+                if monitor.collscan_shapes():
+                    break
+                await asyncio.sleep(0.02)
+
+        asyncio.run(scenario())
+        assert monitor.collscan_shapes() == ['subscribers.find {"email":"?"}']
@@ -0,0 +1,66 @@
+"""
+Async Resend client tests against the local Resend stub
+"""
+import asyncio
+
+import pytest
+
+from resend_client import AsyncResendClient, ResendAPIError
+from resend_stub import StubState, run_stub
+
+
+class TestAsyncResendClient:
+    """Pooled httpx transport for Resend"""
+
+    def test_concurrent_sends_share_pooled_connections(self):
+        """Many concurrent emails reuse at most max_connections keep-alive connections"""
+        with run_stub(StubState(latency=0.01)) as (url, state):
+            async def scenario():
+                client = AsyncResendClient("re_test", url, max_connections=5, max_keepalive_connections=5)
+                try:
+                    results = await asyncio.gather(*[
+                        client.send_email({"from": "a@b.cz", "to": ["c@d.cz"], "subject": "s", "html": "x"})
+                        for _ in range(50)
+                    ])
+                finally:
+                    await client.close()
+                return results
+
+            results = asyncio.run(scenario())
+
+        assert all("id" in r for r in results)
+        assert state.emails == 50
+        assert state.connections and len(state.connections) <= 5
+
+    def test_error_responses_raise_with_status_code(self):
+        """A duplicate contact surfaces as ResendAPIError carrying the HTTP status"""
+        with run_stub() as (url, state):
+            async def scenario():
+                client = AsyncResendClient("re_test", url)
+                try:
+                    await client.create_contact({"email": "jan@example.com", "unsubscribed": False})
+                    with pytest.raises(ResendAPIError) as exc_info:
+                        await client.create_contact({"email": "jan@example.com", "unsubscribed": False})
+                    return exc_info.value
+                finally:
+                    await client.close()
+
+            error = asyncio.run(scenario())
+
+        assert error.code == 409
+        assert state.contacts == 1
+
+    def test_audience_contacts_use_audience_endpoint(self):
+        """audience_id selects the audience-scoped contacts endpoint and is not sent in the body"""
+        with run_stub() as (url, state):
+            async def scenario():
+                client = AsyncResendClient("re_test", url)
+                try:
+                    return await client.create_contact({"email": "eva@example.com", "audience_id": "aud_1"})
+                finally:
+                    await client.close()
+
+            result = asyncio.run(scenario())
+
+        assert result["object"] == "contact"
+        assert state.paths == ["/audiences/aud_1/contacts"]
@@ -0,0 +1,175 @@
+"""
+Circuit breaker and adaptive concurrency tests, end to end against the local Resend stub
+"""
+import asyncio
+import time
+
+import pytest
+
+from resend_client import AsyncResendClient, ResendAPIError
+from resend_stub import StubState, run_stub
+from resilience import AIMDLimiter, CircuitBreaker, CircuitOpenError
+
+EMAIL = {"from": "a@b.cz", "to": ["c@d.cz"], "subject": "s", "html": "x"}
+
+
+class TestCircuitBreaker:
+    """State machine"""
+
+    def test_opens_after_consecutive_failures_and_probes(self):
+        breaker = CircuitBreaker("t", failure_threshold=3, reset_timeout=0.05)
+        for _ in range(2):
+            breaker.before_call()
+            breaker.record_failure()
+        breaker.before_call()
+        breaker.record_success()  # a success resets the count
+        for _ in range(3):
+            breaker.before_call()
+            breaker.record_failure()
+        assert breaker.state == "open"
+        with pytest.raises(CircuitOpenError):
+            breaker.before_call()
+
+        time.sleep(0.06)
+        breaker.before_call()  # the probe
+        assert breaker.state == "half_open"
+        with pytest.raises(CircuitOpenError):
+            breaker.before_call()  # only one probe at a time
+        breaker.record_failure()
+        assert breaker.state == "open"
+
+        time.sleep(0.06)
+        breaker.before_call()
+        breaker.record_success()
+        assert breaker.state == "closed"
+        assert breaker.stats()["opened"] == 2
+        assert breaker.stats()["rejected"] == 2
+
+    def test_cancelled_probe_frees_its_slot(self):
+        breaker = CircuitBreaker("t", failure_threshold=1, reset_timeout=0)
+        breaker.before_call()
+        breaker.record_failure()
+        breaker.before_call()
+        breaker.record_cancelled()
+        breaker.before_call()
+        assert breaker.state == "half_open"
+
+
+class TestAIMDLimiter:
+    """Additive increase, multiplicative decrease"""
+
+    def test_limit_adapts(self):
+        limiter = AIMDLimiter(initial=8, max_limit=10)
+        limiter._inflight = 1
+        limiter.release(False)
+        assert limiter.limit == 4
+        for _ in range(4 + 5):
+            limiter._inflight = 1
+            limiter.release(True)
+        assert limiter.limit == 5
+        for _ in range(10):
+            limiter._inflight = 1
+            limiter.release(False)
+        assert limiter.limit == 1
+
+    def test_caps_concurrency(self):
+        async def scenario():
+            limiter = AIMDLimiter(initial=3, max_limit=3)
+            running, peak = 0, 0
+
+            async def call():
+                nonlocal running, peak
+                await limiter.acquire()
+                running += 1
+                peak = max(peak, running)
+                await asyncio.sleep(0.01)
+                running -= 1
+                limiter.release(None)
+
+            await asyncio.gather(*[call() for _ in range(20)])
+            return peak, limiter.stats()
+
+        peak, stats = asyncio.run(scenario())
+        assert peak == 3
+        assert stats["inflight"] == 0 and stats["waiting"] == 0
+
+    def test_cancelled_waiter_does_not_leak_a_slot(self):
+        async def scenario():
+            limiter = AIMDLimiter(initial=1, max_limit=1)
+            await limiter.acquire()
+            waiter = asyncio.ensure_future(limiter.acquire())
+            await asyncio.sleep(0)
+            waiter.cancel()
+            await asyncio.gather(waiter, return_exceptions=True)
+            limiter.release(None)
+            await asyncio.wait_for(limiter.acquire(), 1)
+            return limiter.stats()
+
+        assert asyncio.run(scenario())["inflight"] == 1
+
+
+class TestResendClientResilience:
+    """Fail fast against a slow or failing Resend"""
+
+    def test_breaker_opens_on_errors_and_recovers(self):
+        with run_stub(StubState(error_rate=1.0)) as (url, state):
+            async def scenario():
+                client = AsyncResendClient("re_test", url, failure_threshold=3, reset_timeout=0.2)
+                errors = []
+                try:
+                    for _ in range(6):
+                        try:
+                            await client.send_email(EMAIL)
+                        except Exception as e:
+                            errors.append(type(e))
+                    open_stats = client.stats()
+                    state.error_rate = 0.0
+                    await asyncio.sleep(0.25)
+                    await client.send_email(EMAIL)
+                    return errors, open_stats, client.stats()
+                finally:
+                    await client.close()
+
+            errors, open_stats, recovered = asyncio.run(scenario())
+
+        assert errors == [ResendAPIError] * 3 + [CircuitOpenError] * 3
+        assert state.requests == 4  # three failures + the successful probe
+        assert open_stats["circuit"]["state"] == "open"
+        assert open_stats["concurrency"]["limit"] == 1
+        assert recovered["circuit"]["state"] == "closed"
+
+    def test_client_errors_do_not_trip_the_breaker(self):
+        with run_stub() as (url, state):
+            async def scenario():
+                client = AsyncResendClient("re_test", url, failure_threshold=2)
+                try:
+                    await client.create_contact({"email": "dup@example.com"})
+                    for _ in range(4):
+                        with pytest.raises(ResendAPIError):
+                            await client.create_contact({"email": "dup@example.com"})  # 409
+                    return client.stats()
+                finally:
+                    await client.close()
+
+            stats = asyncio.run(scenario())
+
+        assert stats["circuit"]["state"] == "closed"
+        assert stats["concurrency"]["drops"] == 0
+
+    def test_slow_calls_time_out_and_shrink_concurrency(self):
+        with run_stub(StubState(latency=0.3)) as (url, state):
+            async def scenario():
+                client = AsyncResendClient("re_test", url, max_connections=8, call_timeout=0.05, failure_threshold=100)
+                try:
+                    started = time.monotonic()
+                    results = await asyncio.gather(*[client.send_email(EMAIL) for _ in range(8)], return_exceptions=True)
+                    return results, time.monotonic() - started, client.stats()
+                finally:
+                    await client.close()
+
+            results, elapsed, stats = asyncio.run(scenario())
+
+        assert all(isinstance(result, asyncio.TimeoutError) for result in results)
+        assert elapsed < 0.3
+        assert stats["concurrency"]["limit"] == 1
+        assert stats["concurrency"]["drops"] == 8
@@ -0,0 +1,59 @@
+"""
+Newsletter subscription tests
+"""
+import asyncio
+
+import pytest
+
+from coupons import CouponCodePool
+from subscriptions import SubscriptionStore
+from transactions import supports_transactions
+
+
+def _with_store(run_db, scenario, use_transactions=False):
+    async def with_store(db):
+        if use_transactions and not await supports_transactions(db.client):
+            pytest.skip("MongoDB deployment does not support transactions")
+        pool = CouponCodePool(db.coupons, size=50, low_watermark=0)
+        store = SubscriptionStore(db.client, db, pool, use_transactions=use_transactions)
+        return await scenario(db, pool, store)
+
+    return run_db(with_store, indexes=("coupons", "subscribers"))
+
+
+async def _burst(db, pool, store):
+    results = await asyncio.gather(*[store.subscribe("novinky@example.com") for _ in range(20)])
+    subscribers = await db.subscribers.count_documents({})
+    active = await db.coupons.find({"reserved": {"$exists": False}}, {"_id": 0}).to_list(None)
+    return results, subscribers, active, pool.stats()
+
+
+class TestSubscriptionStore:
+    """One upsert per request, no duplicates"""
+
+    @pytest.mark.parametrize("use_transactions", [False, True])
+    def test_concurrent_signups_create_one_subscriber(self, request, run_db, use_transactions):
+        if use_transactions:
+            request.getfixturevalue("mongod_db")  # mongomock has no transactions
+        results, subscribers, active, pool_stats = _with_store(run_db, _burst, use_transactions)
+        created = [doc for doc, is_new in results if is_new]
+        assert len(created) == 1
+        assert subscribers == 1
+        assert {doc["coupon_code"] for doc, _ in results} == {created[0]["coupon_code"]}
+        assert [coupon["code"] for coupon in active] == [created[0]["coupon_code"]]
+        assert active[0]["email"] == "novinky@example.com"
+        # Losers handed their codes back
+        assert pool_stats["available"] == 49
+
+    def test_returning_subscriber_keeps_coupon(self, run_db):
+        async def scenario(db, pool, store):
+            first, created = await store.subscribe("a@example.com")
+            again, created_again = await store.subscribe("a@example.com")
+            other, _ = await store.subscribe("b@example.com")
+            return first, created, again, created_again, other
+
+        first, created, again, created_again, other = _with_store(run_db, scenario)
+        assert created and not created_again
+        assert again["coupon_code"] == first["coupon_code"]
+        assert again["id"] == first["id"]
+        assert other["coupon_code"] != first["coupon_code"]
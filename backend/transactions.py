@@ -0,0 +1,28 @@
+"""
+MongoDB transaction support for SeknuTo.cz
+
+Multi-document transactions need a replica set or a sharded cluster.
+detect() runs once at startup and stores the answer in `enabled`; every
+writer that can group its writes in a transaction (bookings with their
+outbox entries, subscribers with their coupon) reads that one setting
+and falls back to ordered single writes when it is False.
+"""
+from pymongo.errors import OperationFailure
+
+enabled = False
+
+
+async def supports_transactions(client) -> bool:
+    """Whether the deployment behind `client` can run multi-document transactions"""
+    try:
+        hello = await client.admin.command("hello")
+    except OperationFailure:
+        return False
+    return "setName" in hello or hello.get("msg") == "isdbgrid"
+
+
+async def detect(client) -> bool:
+    """Probe the deployment and set `enabled` for the whole process"""
+    global enabled
+    enabled = await supports_transactions(client)
+    return enabled
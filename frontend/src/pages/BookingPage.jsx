@@ -26,6 +26,9 @@ import { cs } from 'date-fns/locale';
 const BACKEND_URL = process.env.REACT_APP_BACKEND_URL;
 const API = `${BACKEND_URL}/api`;
 
+// Sizes priced per request around the current value, so typing a new size reuses the table
+const PRICE_TABLE_RADIUS = 100;
+
 const BookingPage = () => {
   const navigate = useNavigate();
   const [currentStep, setCurrentStep] = useState(1);
@@ -36,6 +39,8 @@ const BookingPage = () => {
   const [couponDiscount, setCouponDiscount] = useState(0);
   const [isValidatingCoupon, setIsValidatingCoupon] = useState(false);
   const [tierInfo, setTierInfo] = useState(null);
+  const [priceTable, setPriceTable] = useState(null);
+  const [slotAvailability, setSlotAvailability] = useState({});
   
   // Collapsible sections state
   const [expandedSection, setExpandedSection] = useState('basic'); // 'basic', 'packages', 'other'
@@ -66,22 +71,45 @@ const BookingPage = () => {
     }
   }, []);
 
+  useEffect(() => {
+    axios.get(`${API}/availability`)
+      .then(response => setSlotAvailability(response.data.slots || {}))
+      .catch(error => console.error('Failed to load availability:', error));
+  }, []);
+
   useEffect(() => {
     calculatePrice();
   }, [formData.service, formData.property_size, formData.condition, formData.additional_services]);
 
   const calculatePrice = async () => {
     if (!formData.service || formData.property_size <= 0) return;
-    
+
+    const size = formData.property_size;
+    const key = JSON.stringify([formData.service, formData.condition, formData.additional_services]);
+    const applyQuote = (quote) => {
+      setFormData(prev => ({ ...prev, estimated_price: quote.estimated_price }));
+      setTierInfo(quote.tier_info);
+    };
+
+    if (priceTable && priceTable.key === key && size >= priceTable.from && size < priceTable.from + priceTable.results.length) {
+      applyQuote(priceTable.results[size - priceTable.from]);
+      return;
+    }
+
     try {
-      const response = await axios.post(`${API}/pricing/calculate`, {
-        service: formData.service,
-        property_size: formData.property_size,
-        condition: formData.condition,
-        additional_services: formData.additional_services,
+      const from = Math.max(1, size - PRICE_TABLE_RADIUS);
+      const response = await axios.post(`${API}/pricing/calculate-batch`, {
+        size_range: {
+          service: formData.service,
+          condition: formData.condition,
+          additional_services: formData.additional_services,
+          size_from: from,
+          size_to: size + PRICE_TABLE_RADIUS,
+        },
       });
-      setFormData(prev => ({ ...prev, estimated_price: response.data.estimated_price }));
-      setTierInfo(response.data.tier_info);
+      const results = response.data.results;
+      setPriceTable({ key, from, results });
+      applyQuote(results[size - from]);
     } catch (error) {
       console.error('Failed to calculate price:', error);
     }
@@ -216,7 +244,12 @@ const BookingPage = () => {
       toast.success('Rezervace odeslána!');
     } catch (error) {
       console.error('Booking failed:', error);
-      toast.error('Chyba při odesílání. Zkuste to znovu.');
+      const detail = error.response?.data?.detail;
+      if ([400, 404, 409].includes(error.response?.status) && typeof detail === 'string') {
+        toast.error(detail);
+      } else {
+        toast.error('Chyba při odesílání. Zkuste to znovu.');
+      }
     } finally {
       setIsSubmitting(false);
     }
@@ -578,7 +611,8 @@ const BookingPage = () => {
                     disabled={(date) => {
                       const today = new Date();
                       today.setHours(0, 0, 0, 0);
-                      return date < today || date.getDay() === 0;
+                      const slots = slotAvailability[date.toISOString().split('T')[0]];
+                      return date < today || date.getDay() === 0 || (slots && slots.anytime === 0);
                     }}
                     locale={cs}
                     className="rounded-xl border border-gray-200 bg-white shadow-sm"